@@ -9,8 +9,8 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, filedialog, font
 from tkinter.ttk import Notebook
 import threading
-import queue
 import logging
+import collections
 import importlib.util
 import traceback
 import requests
@@ -23,11 +23,19 @@ except ModuleNotFoundError:
     sys.exit(1)
 
 try:
-    from system_prompts import get_astra_siro_identity_context
+    from system_prompts import get_identity_context
 except ModuleNotFoundError:
     messagebox.showerror("모듈 오류", "system_prompts.py 파일을 찾을 수 없습니다. AstraUI.py와 같은 디렉토리에 있는지 확인하세요.")
     sys.exit(1)
 
+import ltm_snapshot
+from transcript_store import TranscriptStore, format_message
+import ui_events
+from ui_events import UIEventBus
+import metrics
+import tracing
+import log_pipeline
+
 # 동적으로 OllamaChatTest 모듈 임포트 시도
 try:
     spec = importlib.util.spec_from_file_location("OllamaChatTest", "OllamaChatTest.py")
@@ -57,16 +65,51 @@ except ImportError:
     REALTIME_STT_AVAILABLE = False
 
 
+LOG_LEVEL_TAGS = {
+    logging.CRITICAL: "error",
+    logging.ERROR: "error",
+    logging.WARNING: "warning",
+    logging.INFO: "info",
+    logging.DEBUG: "debug",
+}
+
+
 class LogHandler(logging.Handler):
-    """GUI 로그 핸들러 - 로그 메시지를 큐로 전달"""
-    def __init__(self, log_queue):
+    """
+    GUI 로그 핸들러 - 로그 메시지를 링 버퍼로 전달
+
+    레벨/모듈 필터와 포맷팅은 로그를 남기는 스레드에서 처리하므로 Tk 스레드는 삽입만 합니다.
+    버퍼(collections.deque)가 가득 차면 가장 오래된 메시지를 버리고 버린 개수를 셉니다.
+    """
+    def __init__(self, log_buffer, max_chars=config.LOG_CONSOLE_MAX_CHARS):
         super().__init__()
-        self.log_queue = log_queue
-        
+        self.log_buffer = log_buffer
+        self.max_chars = max_chars
+        self.modules = None  # None이면 전체, 아니면 표시할 로거 이름 집합
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()  # emit(로그 파이프라인 스레드)과 take_dropped(Tk 스레드) 사이
+
+    def set_modules(self, modules):
+        self.modules = set(modules) if modules else None
+
+    def take_dropped(self):
+        """마지막 호출 이후 버퍼 초과로 버린 메시지 수를 반환하고 0으로 되돌립니다."""
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        return dropped
+
     def emit(self, record):
+        if self.modules is not None and record.name.split('.')[0] not in self.modules:
+            return
         try:
             msg = self.format(record)
-            self.log_queue.put((record.levelname, msg))
+            # 전체 프롬프트 같은 긴 메시지는 로그 창에서 잘라서 표시 (파일 로그에는 그대로 남음)
+            if len(msg) > self.max_chars:
+                msg = f"{msg[:self.max_chars]} ... ({len(msg) - self.max_chars}자 생략)"
+            if len(self.log_buffer) == self.log_buffer.maxlen:
+                with self._dropped_lock:
+                    self.dropped += 1
+            self.log_buffer.append((LOG_LEVEL_TAGS.get(record.levelno, "info"), msg))
         except Exception:
             self.handleError(record)
 
@@ -83,7 +126,8 @@ class AstraUI(tk.Tk):
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
         
         # 로깅 설정
-        self.log_queue = queue.Queue()
+        self.log_buffer = collections.deque(maxlen=config.LOG_CONSOLE_BUFFER_SIZE)
+        self.log_drain_interval = config.LOG_CONSOLE_MIN_INTERVAL_MS
         self.setup_logging()
         
         # 상태 변수
@@ -92,6 +136,18 @@ class AstraUI(tk.Tk):
         self.assistant = None
         self.assistant_thread = None
         
+        # UI 이벤트 버스 (작업 스레드는 이벤트만 발행, Tk 스레드가 모아서 반영)
+        self.ui_events = UIEventBus()
+        self.stream_frame_ms = max(1, int(1000 / config.UI_STREAM_FPS))
+        self.ui_event_interval = self.stream_frame_ms
+        self.streaming_seq = None
+        
+        # 대화 내역 저장소 (대화 창에는 최근 메시지만 표시)
+        self.transcript = TranscriptStore()
+        self.view_start_seq = 0  # 대화 창 맨 위 메시지 번호
+        self.history_floor_seq = 0  # 저장소에서 불러올 수 있는 가장 오래된 메시지 번호
+        self.loading_history = False
+        
         # 실행 디렉토리 확인
         if not os.path.isfile("config.py") or not os.path.isfile("system_prompts.py"):
             messagebox.showwarning("설정 파일 경고", 
@@ -102,8 +158,8 @@ class AstraUI(tk.Tk):
         self.create_main_frame()
         self.create_status_bar()
         
-        # UI 업데이트 타이머 시작
-        self.update_ui_timer()
+        # UI 이벤트 처리 시작
+        self.process_ui_events()
         
         # 설정 로드 및 어시스턴트 초기화
         self.load_config()
@@ -111,52 +167,59 @@ class AstraUI(tk.Tk):
 
     def setup_logging(self):
         """GUI 로깅 설정"""
-        # 루트 로거 구성
+        # 루트 로거 구성 (큐 기반 로그 파이프라인, OllamaChatTest 로딩 시 이미 설정되었으면 그대로 사용)
+        log_pipeline.setup(config.LOG_LEVEL, config.LOG_FORMAT)
         root_logger = logging.getLogger()
         root_logger.setLevel(getattr(logging, config.LOG_LEVEL, logging.INFO))
         
-        # GUI 로그 핸들러 추가
-        gui_handler = LogHandler(self.log_queue)
-        gui_handler.setFormatter(logging.Formatter(config.LOG_FORMAT))
-        root_logger.addHandler(gui_handler)
+        # GUI 로그 핸들러 추가 (포맷팅과 버퍼 추가는 로그 기록 스레드에서 실행)
+        self.gui_log_handler = LogHandler(self.log_buffer)
+        self.gui_log_handler.setFormatter(logging.Formatter(config.LOG_FORMAT))
+        self.gui_log_handler.setLevel(getattr(logging, config.LOG_LEVEL, logging.INFO))
+        log_pipeline.add_handler(self.gui_log_handler)
         
-        # 1초마다 로그 큐 처리
-        self.after(1000, self.process_log_queue)
+        # 로그 버퍼 처리 시작 (주기는 쌓이는 양에 따라 조절)
+        self.after(self.log_drain_interval, self.process_log_queue)
 
     def process_log_queue(self):
-        """로그 큐에서 메시지를 가져와 로그 창에 표시"""
+        """
+        로그 버퍼에서 메시지를 한 번에 최대 config.LOG_CONSOLE_BATCH_SIZE개 꺼내 로그 창에 한 번의 insert로 추가합니다.
+        로그 창은 config.LOG_CONSOLE_MAX_LINES줄을 넘으면 오래된 줄부터 지웁니다.
+        메시지가 계속 쌓이면 최소 주기로, 조용하면 최대 주기까지 점점 느리게 처리합니다.
+        """
+        drained = 0
         try:
-            while True:
-                level, message = self.log_queue.get_nowait()
-                
-                # 로그 레벨에 따른 색상 설정
-                tag = None
-                if level == "ERROR" or level == "CRITICAL":
-                    tag = "error"
-                elif level == "WARNING":
-                    tag = "warning"
-                elif level == "INFO":
-                    tag = "info"
-                elif level == "DEBUG":
-                    tag = "debug"
-                
-                # 로그 창에 메시지 추가
-                self.logs_text.insert(tk.END, message + "\n", tag)
-                self.logs_text.see(tk.END)
-                
-                # 태그 설정
-                if tag:
-                    self.logs_text.tag_config("error", foreground="red")
-                    self.logs_text.tag_config("warning", foreground="orange")
-                    self.logs_text.tag_config("info", foreground="green")
-                    self.logs_text.tag_config("debug", foreground="gray")
-                
-                self.log_queue.task_done()
-        except queue.Empty:
-            pass
+            chunks = []
+            dropped = self.gui_log_handler.take_dropped()
+            if dropped:
+                chunks.extend((f"... 로그 {dropped}개 생략 (버퍼 초과) ...\n", "warning"))
+            while drained < config.LOG_CONSOLE_BATCH_SIZE:
+                try:
+                    tag, message = self.log_buffer.popleft()
+                except IndexError:
+                    break
+                chunks.extend((message + "\n", tag))
+                drained += 1
+            if chunks:
+                follow = self.logs_text.yview()[1] >= 0.999
+                self.logs_text.config(state=tk.NORMAL)
+                self.logs_text.insert(tk.END, *chunks)
+                excess = int(self.logs_text.index("end-1c").split(".")[0]) - config.LOG_CONSOLE_MAX_LINES
+                if excess > 0:
+                    self.logs_text.delete("1.0", f"{excess + 1}.0")
+                self.logs_text.config(state=tk.DISABLED)
+                if follow:
+                    self.logs_text.see(tk.END)
+        except Exception as e:
+            # 로그 창 자체의 오류이므로 로깅을 거치지 않고 원래 stderr에 직접 기록 (콘솔이 없으면 생략)
+            if sys.__stderr__:
+                sys.__stderr__.write(f"로그 창 갱신 오류: {e}\n")
         finally:
-            # 재귀 호출로 계속 처리
-            self.after(1000, self.process_log_queue)
+            if drained:
+                self.log_drain_interval = config.LOG_CONSOLE_MIN_INTERVAL_MS
+            else:
+                self.log_drain_interval = min(self.log_drain_interval * 2, config.LOG_CONSOLE_MAX_INTERVAL_MS)
+            self.after(self.log_drain_interval, self.process_log_queue)
 
     def create_menu(self):
         """메뉴바 생성"""
@@ -226,6 +289,7 @@ class AstraUI(tk.Tk):
         )
         self.conversation_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         self.conversation_text.config(state=tk.DISABLED)  # 읽기 전용
+        self.conversation_text.configure(yscrollcommand=self.on_conversation_scroll)
         
         # 태그 설정
         self.conversation_text.tag_config("user", foreground="blue")
@@ -271,7 +335,7 @@ class AstraUI(tk.Tk):
         self.is_voice_active = False
 
     def setup_right_tabs(self):
-        """오른쪽 탭 패널 설정 (메모리, 로그)"""
+        """오른쪽 탭 패널 설정 (메모리, 설정, 로그, 성능)"""
         # 탭 컨트롤 생성
         self.tabs = ttk.Notebook(self.right_frame)
         self.tabs.pack(fill=tk.BOTH, expand=True)
@@ -345,6 +409,12 @@ class AstraUI(tk.Tk):
         self.logs_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         self.logs_text.config(state=tk.DISABLED)
         
+        # 로그 레벨 태그 (한 번만 설정)
+        self.logs_text.tag_config("error", foreground="red")
+        self.logs_text.tag_config("warning", foreground="orange")
+        self.logs_text.tag_config("info", foreground="green")
+        self.logs_text.tag_config("debug", foreground="gray")
+        
         # 로그 컨트롤 프레임
         logs_control_frame = ttk.Frame(self.logs_frame)
         logs_control_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -360,8 +430,113 @@ class AstraUI(tk.Tk):
         log_level_combo.pack(side=tk.LEFT, padx=5)
         log_level_combo.bind("<<ComboboxSelected>>", self.change_log_level)
         
+        # 모듈 필터 (로거 이름 기준, 필터링은 로그 핸들러에서 처리)
+        ttk.Label(logs_control_frame, text="모듈:").pack(side=tk.LEFT, padx=5)
+        
+        self.log_module_var = tk.StringVar(value="전체")
+        log_module_combo = ttk.Combobox(
+            logs_control_frame, textvariable=self.log_module_var, state="readonly", width=10,
+            values=["전체", "main", "stt", "llm", "stm", "ltm", "root"]
+        )
+        log_module_combo.pack(side=tk.LEFT, padx=5)
+        log_module_combo.bind("<<ComboboxSelected>>", self.change_log_module)
+        
         # 로그 지우기 버튼
         ttk.Button(logs_control_frame, text="로그 지우기", command=self.clear_logs).pack(side=tk.RIGHT, padx=5)
+        
+        # 탭 5: 성능
+        self.perf_frame = ttk.Frame(self.tabs)
+        self.tabs.add(self.perf_frame, text="성능")
+        self.setup_performance_tab(self.perf_frame)
+
+    def setup_performance_tab(self, parent_frame):
+        """성능 탭: 지표마다 최근 값 차트와 백분위 표시"""
+        self.perf_widgets = {}
+        self.perf_model_var = tk.StringVar(value="LLM 서버 시간: 데이터 없음")
+        ttk.Label(parent_frame, textvariable=self.perf_model_var, font=("Consolas", 9), justify=tk.LEFT).pack(anchor=tk.W, padx=5, pady=(5, 0))
+        
+        for name, (label, unit) in metrics.METRIC_INFO.items():
+            metric_frame = ttk.LabelFrame(parent_frame, text=f"{label} ({unit})")
+            metric_frame.pack(fill=tk.X, padx=5, pady=3)
+            
+            stats_var = tk.StringVar(value="데이터 없음")
+            ttk.Label(metric_frame, textvariable=stats_var, font=("Consolas", 9)).pack(anchor=tk.W, padx=5)
+            
+            chart = tk.Canvas(metric_frame, height=40, background="white", highlightthickness=0)
+            chart.pack(fill=tk.X, padx=5, pady=(0, 5))
+            self.perf_widgets[name] = (stats_var, chart)
+        
+        self.after(config.PERF_REFRESH_MS, self.refresh_performance_tab)
+        self._lag_probe_due = time.perf_counter() + config.PERF_LAG_PROBE_MS / 1000
+        self.after(config.PERF_LAG_PROBE_MS, self._probe_loop_lag)
+
+    def _probe_loop_lag(self):
+        """예약한 시각보다 얼마나 늦게 실행되었는지로 Tk 이벤트 루프 지연을 측정"""
+        now = time.perf_counter()
+        metrics.observe(metrics.TK_LOOP_LAG_MS, max(0.0, (now - self._lag_probe_due) * 1000))
+        self._lag_probe_due = now + config.PERF_LAG_PROBE_MS / 1000
+        self.after(config.PERF_LAG_PROBE_MS, self._probe_loop_lag)
+
+    def refresh_performance_tab(self):
+        """게이지를 샘플링하고, 성능 탭이 보이는 동안에만 차트를 다시 그림"""
+        try:
+            metrics.registry.sample_gauges()
+            if self.tabs.select() == str(self.perf_frame):
+                self.perf_model_var.set(self._format_generation_summary())
+                for name, (stats_var, chart) in self.perf_widgets.items():
+                    series = metrics.registry.series(name)
+                    summary = series.summary()
+                    if summary is None:
+                        stats_var.set("데이터 없음")
+                        chart.delete("all")
+                        continue
+                    stats_var.set(
+                        f"최근 {summary['last']:.1f}  p50 {summary['p50']:.1f}  p95 {summary['p95']:.1f}  "
+                        f"p99 {summary['p99']:.1f}  최대 {summary['max']:.1f}  (n={summary['n']})"
+                    )
+                    self._draw_sparkline(chart, series.values()[-config.PERF_CHART_POINTS:], summary['p95'])
+        except Exception as e:
+            logging.error(f"성능 탭 갱신 오류: {e}")
+        finally:
+            self.after(config.PERF_REFRESH_MS, self.refresh_performance_tab)
+
+    def _format_generation_summary(self):
+        """마지막 요청의 시간 분해와 모델별 서버 시간 평균"""
+        if not metrics.registry.generations:
+            return "LLM 서버 시간: 데이터 없음"
+        last = metrics.registry.generations[-1]
+        lines = [
+            f"마지막 요청 ({last['model']}{', 콜드 로드' if last['cold_load'] else ''}): 준비 {last['client_ms'] or 0:.0f}ms / "
+            f"서버 {last['total_ms'] or 0:.0f}ms (로드 {last['load_ms'] or 0:.0f}, 프롬프트 {last['prompt_eval_ms'] or 0:.0f}, "
+            f"생성 {last['eval_ms'] or 0:.0f}) / 네트워크 {last['network_ms'] or 0:.0f}ms"
+        ]
+        for model in sorted({record['model'] for record in list(metrics.registry.generations)}):
+            summary = metrics.registry.model_summary(model)
+            means = summary["means"]
+            lines.append(
+                f"{model}: 요청 {summary['requests']}회, 콜드 로드 {summary['cold_loads']}회, 평균 서버 "
+                f"{means[metrics.LLM_TOTAL_DURATION_MS]:.0f}ms (프롬프트 {means[metrics.LLM_PROMPT_EVAL_MS]:.0f}, "
+                f"생성 {means[metrics.LLM_EVAL_MS]:.0f})"
+            )
+        return "\n".join(lines)
+
+    def _draw_sparkline(self, chart, values, p95):
+        """최근 값 꺾은선과 p95 기준선(점선)을 그림"""
+        chart.delete("all")
+        width, height = max(chart.winfo_width(), 2), max(chart.winfo_height(), 2)
+        top = max(max(values), p95) or 1.0
+        
+        def y_of(value):
+            return height - 2 - (value / top) * (height - 4)
+        
+        chart.create_line(0, y_of(p95), width, y_of(p95), fill="orange", dash=(3, 3))
+        if len(values) < 2:
+            return
+        step = width / (len(values) - 1)
+        coords = []
+        for i, value in enumerate(values):
+            coords.extend((i * step, y_of(value)))
+        chart.create_line(*coords, fill="steelblue")
 
     def setup_settings_controls(self, parent_frame):
         """설정 탭 내부 컨트롤 설정"""
@@ -443,7 +618,7 @@ class AstraUI(tk.Tk):
         
         # STM 크기 설정
         ttk.Label(memory_frame, text="STM 크기:").grid(row=1, column=0, sticky="w", padx=5, pady=2)
-        self.stm_size_var = tk.IntVar(value=10)  # 기본값은 10
+        self.stm_size_var = tk.IntVar(value=config.STM_MAX_TURNS)
         ttk.Spinbox(
             memory_frame, from_=1, to=20, textvariable=self.stm_size_var, width=5
         ).grid(row=1, column=1, sticky="w", padx=5, pady=2)
@@ -508,61 +683,121 @@ class AstraUI(tk.Tk):
                     stt_model=config.STT_MODEL,
                     use_cuda=config.USE_CUDA
                 )
-                self.is_assistant_ready = True
-                self.update_status("준비 완료")
-                
-                # 어시스턴트 성공적으로 초기화됨
-                self.after(0, lambda: self.add_system_message("어시스턴트가 성공적으로 초기화되었습니다."))
-                
-                # 메모리 상태 업데이트
-                memory_status = "STM/LTM 활성화" if MEM0_AVAILABLE else "STM만 활성화 (LTM 없음)"
-                self.after(0, lambda: self.memory_label.config(text=f"메모리: {memory_status}"))
-                
-                # STM 탭 초기 업데이트
-                self.after(1000, self.update_stm_display)
-                
-                # 음성 인식 자동 시작 (RealtimeSTT 사용 가능한 경우)
-                if REALTIME_STT_AVAILABLE:
-                    self.after(1500, self.toggle_voice_recognition)
+                self.run_on_ui(self.on_assistant_ready)
                 
             except Exception as e:
                 logging.error(f"어시스턴트 초기화 오류: {e}")
                 self.is_assistant_ready = False
-                
-                # 오류 정보 표시
-                error_detail = traceback.format_exc()
-                self.after(0, lambda: messagebox.showerror("초기화 오류", 
-                                                          f"어시스턴트를 초기화하지 못했습니다.\n\n{e}\n\n자세한 내용은 로그 탭을 확인하세요."))
-                self.after(0, lambda: self.update_status("초기화 실패!"))
+                self.post_error(f"어시스턴트를 초기화하지 못했습니다.\n\n{e}\n\n자세한 내용은 로그 탭을 확인하세요.", popup=True)
+                self.update_status("초기화 실패!")
                 
                 # 로그 탭으로 전환
-                self.after(0, lambda: self.tabs.select(3))  # 로그 탭 인덱스
+                self.run_on_ui(lambda: self.tabs.select(3))  # 로그 탭 인덱스
 
         # 별도 스레드에서 초기화 실행
         self.assistant_thread = threading.Thread(target=initialize_worker)
         self.assistant_thread.daemon = True
         self.assistant_thread.start()
 
-    def update_ui_timer(self):
-        """주기적인 UI 업데이트를 위한 타이머"""
-        # STM 업데이트 (어시스턴트가 준비되었을 때)
-        if self.is_assistant_ready and hasattr(self.assistant, 'short_term_memory'):
-            self.update_stm_display()
-            
-        # 상태 표시 업데이트
-        if self.is_processing:
-            # 처리 중인 경우 프로그레스 바 애니메이션
-            if not self.progress_bar.winfo_ismapped():
-                self.progress_bar.pack(fill=tk.X, padx=5, pady=5)
-                self.progress_bar.start(10)
-        else:
-            # 처리 완료된 경우 프로그레스 바 숨김
-            if self.progress_bar.winfo_ismapped():
-                self.progress_bar.stop()
-                self.progress_bar.pack_forget()
+    def on_assistant_ready(self):
+        """어시스턴트 초기화 완료 처리 (UI 스레드)"""
+        self.is_assistant_ready = True
+        self.update_status("준비 완료")
+        self.add_system_message("어시스턴트가 성공적으로 초기화되었습니다.")
+        
+        # 메모리 상태 업데이트
+        memory_status = "STM/LTM 활성화" if MEM0_AVAILABLE else "STM만 활성화 (LTM 없음)"
+        self.memory_label.config(text=f"메모리: {memory_status}")
+        
+        # STM 탭: 창 크기는 STM 저널에서 복원된 값, 이후에는 STM이 바뀔 때만 다시 그림
+        stm = self.assistant.short_term_memory
+        self.stm_size_var.set(stm.maxlen)
+        stm.on_change = lambda: self.ui_events.publish(ui_events.STM_CHANGED)
+        self.update_stm_display()
         
-        # 타이머 재설정 (1초마다)
-        self.after(1000, self.update_ui_timer)
+        # 음성 인식 자동 시작 (RealtimeSTT 사용 가능한 경우)
+        if REALTIME_STT_AVAILABLE:
+            self.after(1500, self.toggle_voice_recognition)
+
+    # --- UI 이벤트 버스 ---
+    def update_status(self, message):
+        """상태 표시줄 업데이트 (어느 스레드에서나 호출 가능)"""
+        self.ui_events.publish(ui_events.STATUS, message)
+
+    def set_processing(self, processing):
+        """처리 중 상태를 바꾸고 프로그레스 바 표시를 요청합니다. (어느 스레드에서나 호출 가능)"""
+        self.is_processing = processing
+        self.ui_events.publish(ui_events.BUSY, processing)
+
+    def post_message(self, kind, text):
+        """대화 창에 사용자/시스템 메시지 추가를 요청합니다. (작업 스레드용)"""
+        self.ui_events.publish(ui_events.MESSAGE, (kind, text))
+
+    def post_error(self, message, popup=False):
+        """오류를 대화 창(과 팝업)에 표시하도록 요청합니다. (작업 스레드용)"""
+        self.ui_events.publish(ui_events.ERROR, (message, popup))
+
+    def run_on_ui(self, func):
+        """func를 Tk 스레드에서 실행하도록 요청합니다. (작업 스레드용)"""
+        self.ui_events.publish(ui_events.CALL, func)
+
+    def process_ui_events(self):
+        """
+        쌓인 UI 이벤트를 합쳐서 반영합니다.
+        이벤트가 있거나 응답을 스트리밍 중이면 프레임 주기(config.UI_STREAM_FPS)로, 조용하면
+        config.UI_EVENT_IDLE_INTERVAL_MS까지 점점 느리게 확인합니다.
+        """
+        events = []
+        try:
+            events = self.ui_events.drain()
+            for event in events:
+                try:
+                    self.handle_ui_event(event)
+                except Exception as e:
+                    logging.error(f"UI 이벤트 처리 오류 ({event.kind}): {e}", exc_info=True)
+        finally:
+            if events or self.streaming_seq is not None:
+                self.ui_event_interval = self.stream_frame_ms
+            else:
+                self.ui_event_interval = min(self.ui_event_interval * 2, config.UI_EVENT_IDLE_INTERVAL_MS)
+            self.after(self.ui_event_interval, self.process_ui_events)
+
+    def handle_ui_event(self, event):
+        kind, payload = event
+        if kind == ui_events.TOKEN:
+            self._insert_assistant_delta(payload)
+        elif kind == ui_events.STREAM_BEGIN:
+            self.begin_assistant_stream()
+        elif kind == ui_events.STREAM_END:
+            self.end_assistant_stream()
+        elif kind == ui_events.MESSAGE:
+            message_kind, text = payload
+            if message_kind == "user":
+                self.add_user_message(text)
+            else:
+                self.add_system_message(text)
+        elif kind == ui_events.ERROR:
+            message, popup = payload
+            self.add_system_message(message)
+            if popup:
+                messagebox.showerror("오류", message)
+        elif kind == ui_events.STATUS:
+            self.status_label.config(text=payload)
+        elif kind == ui_events.BUSY:
+            self._show_progress(payload)
+        elif kind == ui_events.STM_CHANGED:
+            self.update_stm_display()
+        elif kind == ui_events.CALL:
+            payload()
+
+    def _show_progress(self, busy):
+        """처리 중이면 프로그레스 바 애니메이션, 완료되면 숨김"""
+        if busy and not self.progress_bar.winfo_ismapped():
+            self.progress_bar.pack(fill=tk.X, padx=5, pady=5)
+            self.progress_bar.start(10)
+        elif not busy and self.progress_bar.winfo_ismapped():
+            self.progress_bar.stop()
+            self.progress_bar.pack_forget()
 
     def update_stm_display(self):
         """단기 기억 표시 업데이트"""
@@ -572,12 +807,18 @@ class AstraUI(tk.Tk):
         self.stm_text.config(state=tk.NORMAL)
         self.stm_text.delete(1.0, tk.END)
         
-        if not self.assistant.short_term_memory:
+        stm = self.assistant.short_term_memory
+        if stm.summary:
+            self.stm_text.insert(tk.END, "--- 이전 대화 요약 ---\n")
+            self.stm_text.insert(tk.END, f"{stm.summary}\n\n")
+        
+        turns = stm.turns()
+        if not turns and not stm.summary:
             self.stm_text.insert(tk.END, "아직 저장된 단기 기억이 없습니다.")
         else:
-            for i, memory in enumerate(self.assistant.short_term_memory, 1):
-                self.stm_text.insert(tk.END, f"--- 기억 #{i} ---\n")
-                self.stm_text.insert(tk.END, f"{memory}\n\n")
+            for i, turn in enumerate(turns, 1):
+                self.stm_text.insert(tk.END, f"--- 기억 #{i} (약 {turn['tokens']}토큰) ---\n")
+                self.stm_text.insert(tk.END, f"{turn['text']}\n\n")
         
         self.stm_text.config(state=tk.DISABLED)
 
@@ -598,7 +839,7 @@ class AstraUI(tk.Tk):
             # 검색 실행
             memories = self.assistant.long_term_memory.search(
                 query=query,
-                user_id=config.MEMORY_USER_ID,
+                user_id=self.assistant.search_partitions(),
                 limit=10
             )
             
@@ -614,8 +855,9 @@ class AstraUI(tk.Tk):
                 for i, mem in enumerate(memories, 1):
                     memory_text = mem.get('memory', '내용 없음')
                     score = mem.get('score', 'N/A')
+                    tier = mem.get('tier', 'hot')
                     
-                    self.ltm_text.insert(tk.END, f"--- 결과 #{i} (관련도: {score:.4f}) ---\n")
+                    self.ltm_text.insert(tk.END, f"--- 결과 #{i} (관련도: {score:.4f}, {tier}) ---\n")
                     self.ltm_text.insert(tk.END, f"{memory_text}\n\n")
             
             self.ltm_text.config(state=tk.DISABLED)
@@ -651,9 +893,9 @@ class AstraUI(tk.Tk):
     def continuous_voice_recognition(self):
         """연속적인 음성 인식 수행"""
         if not self.is_assistant_ready:
-            messagebox.showinfo("알림", "어시스턴트가 아직 준비되지 않았습니다.")
             self.is_voice_active = False
-            self.voice_button.config(text="음성 인식 시작")
+            self.run_on_ui(lambda: self.voice_button.config(text="음성 인식 시작"))
+            self.run_on_ui(lambda: messagebox.showinfo("알림", "어시스턴트가 아직 준비되지 않았습니다."))
             return
             
         self.update_status("🎤 음성 인식 활성화됨")
@@ -665,109 +907,84 @@ class AstraUI(tk.Tk):
                     time.sleep(1)
                     continue
                     
-                self.is_processing = True
+                self.set_processing(True)
                 
                 # 음성 변환 시작
                 self.update_status("🎤 음성 입력 대기 중...")
-                transcribed_text = self.assistant.recorder.text()
+                transcribed_text = self.assistant.transcribe()
                 
                 # 음성이 감지되지 않았거나 프로그램이 종료 중이면 계속
                 if not transcribed_text or transcribed_text.strip() == "" or not self.is_voice_active:
-                    self.is_processing = False
+                    self.set_processing(False)
                     continue
                     
                 # UI에 변환된 텍스트 표시
-                self.add_user_message(transcribed_text)
+                self.post_message("user", transcribed_text)
                 
                 # LLM에 전송
                 self.update_status("LLM에 전송 중...")
-                self.process_llm_response(transcribed_text)
+                self.process_llm_response(transcribed_text, trace=self.assistant.start_turn_trace())
                 
             except Exception as e:
                 logging.error(f"음성 입력 처리 오류: {e}")
-                self.add_system_message(f"음성 입력 처리 중 오류가 발생했습니다: {e}")
+                self.post_error(f"음성 입력 처리 중 오류가 발생했습니다: {e}")
             finally:
-                self.is_processing = False
+                self.set_processing(False)
                 
         self.update_status("음성 인식 중지됨")
 
     def process_text_input(self, text):
         """텍스트 입력 처리 (별도 스레드에서 실행)"""
         def text_worker():
-            self.is_processing = True
+            self.set_processing(True)
             try:
                 self.update_status("LLM에 전송 중...")
                 self.process_llm_response(text)
             except Exception as e:
                 logging.error(f"텍스트 입력 처리 오류: {e}")
-                self.add_system_message(f"오류가 발생했습니다: {e}")
+                self.post_error(f"오류가 발생했습니다: {e}")
             finally:
-                self.is_processing = False
+                self.set_processing(False)
                 
         threading.Thread(target=text_worker, daemon=True).start()
 
-    def process_llm_response(self, input_text):
-        """LLM 응답 처리 및 UI 업데이트"""
+    def process_llm_response(self, input_text, trace=None):
+        """LLM 응답 처리 및 UI 업데이트 (작업 스레드에서 실행, UI 반영은 이벤트로 요청). 단계별 시간은 턴 추적에 기록"""
+        trace = trace or tracing.start_trace("turn", model=self.assistant.model)
+        metrics.registry.count(metrics.TURNS, self.assistant.model)
+        log_started = log_pipeline.thread_time_ms()
+        with tracing.activate(trace):
+            try:
+                self._process_llm_response(input_text)
+            finally:
+                log_ms = log_pipeline.thread_time_ms() - log_started
+                metrics.observe(metrics.LOG_EMIT_MS, log_ms)
+                trace.end(log_ms=round(log_ms, 3))
+
+    def _process_llm_response(self, input_text):
+        turn_started = time.perf_counter()
         try:
-            # 임시 응답 텍스트 변수
-            self.current_response = ""
-            
-            # 콜백 정의
-            def response_callback(chunk):
-                self.current_response += chunk
-                # UI 스레드에서 텍스트 업데이트
-                self.after(0, lambda: self.update_assistant_message(self.current_response))
-            
-            # 응답 메시지 준비
-            self.add_assistant_message("")
+            # 응답 메시지 준비 (이후 청크는 TOKEN 이벤트로 이 메시지 끝에 이어 붙임)
+            self.ui_events.publish(ui_events.STREAM_BEGIN)
             
             # 수정된 send_to_llm 로직을 여기서 직접 구현
-            stm_context = "\n".join(self.assistant.short_term_memory) if hasattr(self.assistant, 'short_term_memory') and self.assistant.short_term_memory else "최근 대화 없음."
+            stm_context = self.assistant.short_term_memory.context() if hasattr(self.assistant, 'short_term_memory') else "최근 대화 없음."
             
-            # LTM 검색
+            # LTM 검색 (hot/cold 계층 검색은 어시스턴트에서 처리)
             ltm_context = "관련된 장기 기억 없음."
             if hasattr(self.assistant, 'long_term_memory') and self.assistant.long_term_memory:
-                try:
-                    ltm_search_response = self.assistant.long_term_memory.search(
-                        query=input_text,
-                        user_id=config.MEMORY_USER_ID,
-                        limit=3
-                    )
-                    
-                    memories_found = []
-                    if isinstance(ltm_search_response, list):
-                        memories_found = ltm_search_response
-
-                    if memories_found:
-                        ltm_context_lines = []
-                        for mem in memories_found:
-                            if isinstance(mem, dict):
-                                memory_text = mem.get('memory', '내용 없음')
-                                score = mem.get('score')
-                                if score is None:
-                                    ltm_context_lines.append(f"- {memory_text} (관련도: N/A)")
-                                else:
-                                    try:
-                                        ltm_context_lines.append(f"- {memory_text} (관련도: {float(score):.2f})")
-                                    except (ValueError, TypeError):
-                                        ltm_context_lines.append(f"- {memory_text} (관련도: {score})")
-                        if ltm_context_lines:
-                            ltm_context = "\n".join(ltm_context_lines)
-                except Exception as e:
-                    logging.error(f"LTM 검색 오류: {e}")
-                    ltm_context = "장기 기억 검색 중 오류 발생."
+                ltm_context = self.assistant.build_ltm_context(input_text)
             
             # 정체성 컨텍스트
-            dynamic_identity_context = get_astra_siro_identity_context()
+            with tracing.span("persona.build", mode=config.PERSONA_MODE):
+                dynamic_identity_context = get_identity_context(config.PERSONA_MODE)
             
-            # 최종 프롬프트 구성
-            from system_prompts import MAIN_PROMPT_TEMPLATE
-            prompt_with_context = MAIN_PROMPT_TEMPLATE.format(
-                identity_context=dynamic_identity_context,
-                short_term_memory=stm_context,
-                long_term_memory=ltm_context,
-                user_input=input_text
-            )
+            # 최종 프롬프트 구성 (증분 모드면 이전 context에 이어 새 입력과 바뀐 장기 기억만 전송)
+            llm_context = self.assistant.llm_context
+            with tracing.span("prompt.format"):
+                prompt_with_context, previous_context, context_generation = llm_context.prepare(
+                    self.assistant.model, dynamic_identity_context, stm_context, ltm_context, input_text
+                )
             
             # Ollama API 페이로드
             payload = {
@@ -779,11 +996,15 @@ class AstraUI(tk.Tk):
                     "temperature": self.assistant.temperature,
                 }
             }
+            if previous_context:
+                payload["context"] = previous_context
             
             headers = {'Content-Type': 'application/json'}
             full_response = ""
             
             # Ollama API 호출
+            request_started = time.perf_counter()
+            first_token_at = None
             response = requests.post(
                 self.assistant.ollama_url, 
                 json=payload, 
@@ -799,114 +1020,189 @@ class AstraUI(tk.Tk):
                     try:
                         json_chunk = json.loads(decoded_line)
                         response_part = json_chunk.get('response', '')
+                        if response_part and first_token_at is None:
+                            first_token_at = time.perf_counter()
                         full_response += response_part
                         
-                        # UI 업데이트
-                        self.after(0, lambda: self.update_assistant_message(full_response))
+                        # UI 업데이트 (Tk 스레드가 프레임 단위로 모아서 반영)
+                        if response_part:
+                            self.ui_events.publish(ui_events.TOKEN, response_part)
                         
                         if json_chunk.get('done', False):
+                            llm_context.update(context_generation, payload["model"], json_chunk.get('context'))
+                            metrics.observe_generation(json_chunk, request_started, first_token_at, payload["model"], turn_started)
+                            tracing.record_generation(json_chunk, request_started, first_token_at)
                             break
                     except json.JSONDecodeError:
-                        logging.warning(f"응답 스트림 JSON 디코딩 오류 (무시): {decoded_line}")
+                        logging.warning("응답 스트림 JSON 디코딩 오류 (무시): %s", decoded_line)
                     except Exception as e:
                         logging.error(f"응답 스트림 처리 중 오류: {e}")
+            else:
+                # 마지막 청크(done)를 받지 못하면 서버 context와 STM이 어긋나므로 다음 턴은 전체 프롬프트로 전송
+                llm_context.invalidate("응답 스트림이 완료되지 않음")
             
-            # 대화 기억 저장
+            # 대화 기억 저장 (STM 추가, LTM 저장은 어시스턴트의 저장 정책/큐에서 처리)
             if input_text and full_response.strip():
-                interaction_to_save = f"사용자: {input_text}\n아스트라 시로: {full_response}"
-                
-                # STM 저장
-                if hasattr(self.assistant, 'short_term_memory'):
-                    self.assistant.short_term_memory.append(interaction_to_save)
-                    logging.info("현재 대화를 STM에 추가했습니다.")
-                    self.after(0, self.update_stm_display)
-                
-                # LTM 저장 (백그라운드)
-                if hasattr(self.assistant, 'long_term_memory') and hasattr(self.assistant, 'save_to_ltm'):
-                    ltm_save_thread = threading.Thread(
-                        target=self.assistant.save_to_ltm,
-                        args=(interaction_to_save,),
-                        daemon=True
-                    )
-                    ltm_save_thread.start()
-                    logging.info(f"LTM 저장을 위한 백그라운드 스레드 시작됨")
+                with tracing.span("stm.record"):
+                    self.assistant.record_interaction(input_text, full_response)
             
             self.update_status("준비 완료")
             
         except requests.exceptions.RequestException as e:
+            metrics.registry.count(metrics.ERRORS, "llm_request")
+            self.assistant.reset_llm_context("LLM 요청 오류")
             logging.error(f"Ollama API 오류: {e}")
-            self.add_system_message(f"Ollama API 오류: {e}")
+            self.post_error(f"Ollama API 오류: {e}")
         except Exception as e:
+            metrics.registry.count(metrics.ERRORS, "llm_response")
+            self.assistant.reset_llm_context("LLM 응답 처리 오류")
             logging.error(f"LLM 응답 처리 오류: {e}")
-            self.add_system_message(f"오류가 발생했습니다: {e}")
+            self.post_error(f"오류가 발생했습니다: {e}")
+        finally:
+            # 완성된(또는 중단된) 응답을 대화 내역 저장소에 기록
+            self.ui_events.publish(ui_events.STREAM_END)
+
+    def _conversation_has_text(self):
+        """대화 창이 비어 있지 않은지 (전체 텍스트를 읽지 않고 확인)"""
+        return self.conversation_text.compare("end-1c", "!=", "1.0")
+
+    def _append_message(self, kind, text, seq):
+        """
+        대화 창 끝에 메시지를 추가하고 메시지 시작 위치에 msg<seq> 마크를 둡니다. (UI 스레드)
+        창에 남은 메시지가 config.CONVERSATION_VIEW_MAX_MESSAGES를 넘으면 가장 오래된 메시지부터 창에서 내립니다.
+        (내린 메시지는 transcript 저장소에 남아 있고, 위로 스크롤하면 다시 불러옴)
+        """
+        widget = self.conversation_text
+        follow = widget.yview()[1] >= 0.999
+        # 스트리밍 중인 응답의 끝 위치는 뒤에 추가되는 메시지에 밀리지 않도록 유지
+        reply_end = widget.index("reply_end") if self.streaming_seq is not None else None
+        widget.config(state=tk.NORMAL)
+        if self._conversation_has_text():
+            widget.insert(tk.END, "\n\n")
+        mark = f"msg{seq}"
+        widget.mark_set(mark, "end-1c")
+        widget.mark_gravity(mark, tk.LEFT)
+        prefix, tag, body = format_message({"kind": kind, "text": text})
+        widget.insert(tk.END, prefix, tag)
+        if kind == "assistant":
+            # reply_start는 본문 앞에 고정(left), reply_end는 삽입한 텍스트 뒤로 이동(right)
+            widget.mark_set("reply_start", "end-1c")
+            widget.mark_gravity("reply_start", tk.LEFT)
+            widget.mark_set("reply_end", "end-1c")
+            widget.mark_gravity("reply_end", tk.RIGHT)
+        widget.insert(tk.END, body)
+        if reply_end is not None:
+            widget.mark_set("reply_end", reply_end)
+        # 사용자가 이전 대화를 보고 있으면 창을 줄이거나 끝으로 끌어내리지 않음
+        if follow:
+            self._trim_conversation_view()
+            widget.see(tk.END)
+        widget.config(state=tk.DISABLED)
+
+    def _trim_conversation_view(self):
+        """대화 창의 메시지 수를 상한 이하로 줄입니다. (state=NORMAL 상태에서 호출)"""
+        new_start = len(self.transcript) - config.CONVERSATION_VIEW_MAX_MESSAGES
+        if new_start <= self.view_start_seq:
+            return
+        self.conversation_text.delete("1.0", f"msg{new_start}")
+        for seq in range(self.view_start_seq, new_start):
+            self.conversation_text.mark_unset(f"msg{seq}")
+        self.view_start_seq = new_start
+
+    def on_conversation_scroll(self, first, last):
+        """대화 창 스크롤: 맨 위에 닿으면 저장소에서 이전 메시지를 한 페이지 불러옴"""
+        self.conversation_text.vbar.set(first, last)
+        if float(first) <= 0.0 and self.view_start_seq > self.history_floor_seq and not self.loading_history:
+            self.loading_history = True
+            self.after_idle(self.load_older_messages)
+
+    def load_older_messages(self):
+        """창 맨 위 메시지 앞에 저장소의 이전 메시지를 한 페이지 삽입하고 보던 위치를 유지합니다. (UI 스레드)"""
+        try:
+            start = max(self.history_floor_seq, self.view_start_seq - config.CONVERSATION_PAGE_SIZE)
+            records = self.transcript.read_range(start, self.view_start_seq)
+            if not records:
+                self.history_floor_seq = self.view_start_seq
+                return
+            widget = self.conversation_text
+            old_top = f"msg{self.view_start_seq}"
+            # 맨 앞에 삽입하는 동안 기존 첫 메시지 마크가 삽입된 텍스트 뒤로 밀리도록 gravity를 잠시 바꿈
+            widget.mark_gravity(old_top, tk.RIGHT)
+            widget.mark_set("page_anchor", "1.0")
+            widget.mark_gravity("page_anchor", tk.RIGHT)
+            widget.config(state=tk.NORMAL)
+            for record in records:
+                mark = f"msg{record['seq']}"
+                widget.mark_set(mark, "page_anchor")
+                widget.mark_gravity(mark, tk.LEFT)
+                prefix, tag, body = format_message(record)
+                widget.insert("page_anchor", prefix, tag, body + "\n\n", "")
+            widget.config(state=tk.DISABLED)
+            widget.mark_gravity(old_top, tk.LEFT)
+            widget.mark_unset("page_anchor")
+            widget.yview(old_top)
+            self.view_start_seq = records[0]['seq']
+        except Exception as e:
+            logging.error(f"이전 대화 불러오기 오류: {e}")
+        finally:
+            self.loading_history = False
 
     def add_user_message(self, message):
         """UI에 사용자 메시지 추가"""
-        self.conversation_text.config(state=tk.NORMAL)
-        if self.conversation_text.get("1.0", tk.END).strip():
-            self.conversation_text.insert(tk.END, "\n\n")
-        self.conversation_text.insert(tk.END, "사용자: ", "user")
-        self.conversation_text.insert(tk.END, message)
-        self.conversation_text.see(tk.END)
-        self.conversation_text.config(state=tk.DISABLED)
+        self._append_message("user", message, self.transcript.append("user", message)["seq"])
 
-    def add_assistant_message(self, message):
-        """UI에 어시스턴트 메시지 추가"""
-        self.conversation_text.config(state=tk.NORMAL)
-        if self.conversation_text.get("1.0", tk.END).strip():
-            self.conversation_text.insert(tk.END, "\n\n")
-        self.conversation_text.insert(tk.END, "아스트라 시로: ", "assistant")
-        self.conversation_text.insert(tk.END, message)
-        self.conversation_text.see(tk.END)
-        self.conversation_text.config(state=tk.DISABLED)
+    def add_assistant_message(self, message, seq=None):
+        """
+        UI에 어시스턴트 메시지 추가 (이 메시지 본문 위치에 스트리밍 마크를 설정)
+        seq를 지정하면 미리 받아 둔 번호로 표시만 하고, 저장소 기록은 end_assistant_stream에서 합니다.
+        """
+        if seq is None:
+            seq = self.transcript.append("assistant", message)["seq"]
+        self._append_message("assistant", message, seq)
 
     def update_assistant_message(self, message):
-        """마지막 어시스턴트 메시지 업데이트 (스트리밍용)"""
-        # 마지막 메시지 위치 찾기
+        """스트리밍 중인 어시스턴트 메시지 본문을 message로 교체"""
+        if self.streaming_seq is None:
+            self.add_assistant_message(message)
+            return
         self.conversation_text.config(state=tk.NORMAL)
-        
-        # 현재 텍스트 내용 가져오기
-        current_text = self.conversation_text.get("1.0", tk.END)
-        
-        # 마지막 "아스트라 시로: " 위치 찾기
-        last_prefix_pos = current_text.rfind("아스트라 시로: ")
-        
-        if last_prefix_pos != -1:
-            # 마지막 메시지의 시작 위치 계산
-            line_start = current_text.count("\n", 0, last_prefix_pos) + 1
-            char_in_line = last_prefix_pos - current_text.rfind("\n", 0, last_prefix_pos) - 1
-            start_pos = f"{line_start}.{char_in_line}"
-            
-            # 접두사 길이
-            prefix_len = len("아스트라 시로: ")
-            message_start = f"{line_start}.{char_in_line + prefix_len}"
-            
-            # 마지막 어시스턴트 메시지 삭제 및 새 메시지로 대체
-            self.conversation_text.delete(message_start, tk.END)
-            self.conversation_text.insert(message_start, message)
-        else:
-            # 마지막 메시지가 없는 경우, 새로 추가
-            if self.conversation_text.get("1.0", tk.END).strip():
-                self.conversation_text.insert(tk.END, "\n\n")
-            self.conversation_text.insert(tk.END, "아스트라 시로: ", "assistant")
-            self.conversation_text.insert(tk.END, message)
-        
-        # 스크롤 및 상태 복원
+        self.conversation_text.delete("reply_start", "reply_end")
+        self.conversation_text.insert("reply_end", message)
         self.conversation_text.see(tk.END)
         self.conversation_text.config(state=tk.DISABLED)
 
-    def add_system_message(self, message):
-        """UI에 시스템 메시지 추가"""
+    def begin_assistant_stream(self):
+        """스트리밍 응답용 빈 어시스턴트 메시지를 추가합니다. (UI 스레드)"""
+        self.end_assistant_stream()
+        seq = self.transcript.new_seq()
+        self.add_assistant_message("", seq=seq)
+        self.streaming_seq = seq
+
+    def end_assistant_stream(self):
+        """완성된 응답을 저장소에 기록합니다. (UI 스레드)"""
+        if self.streaming_seq is None:
+            return
+        self.transcript.write(self.streaming_seq, "assistant", self.conversation_text.get("reply_start", "reply_end"))
+        self.streaming_seq = None
+
+    def _insert_assistant_delta(self, delta):
+        """
+        모인 응답 조각을 reply_end 마크 위치에 한 번에 삽입합니다. (UI 스레드)
+        조각은 이벤트 버스에서 프레임(config.UI_STREAM_FPS) 단위로 합쳐져 들어옵니다.
+        """
+        if not delta or self.streaming_seq is None:
+            return
+        # 사용자가 위로 스크롤해 이전 대화를 보고 있으면 끝으로 끌어내리지 않음
+        follow = self.conversation_text.yview()[1] >= 0.999
         self.conversation_text.config(state=tk.NORMAL)
-        if self.conversation_text.get("1.0", tk.END).strip():
-            self.conversation_text.insert(tk.END, "\n\n")
-        self.conversation_text.insert(tk.END, f"[시스템: {message}]", "system")
-        self.conversation_text.see(tk.END)
+        self.conversation_text.insert("reply_end", delta)
         self.conversation_text.config(state=tk.DISABLED)
+        if follow:
+            self.conversation_text.see(tk.END)
 
-    def update_status(self, message):
-        """상태 표시줄 업데이트"""
-        self.status_label.config(text=message)
+    def add_system_message(self, message):
+        """UI에 시스템 메시지 추가"""
+        self._append_message("system", message, self.transcript.append("system", message)["seq"])
 
     def update_temp_label(self, event):
         """온도 슬라이더 값 변경 시 라벨 업데이트"""
@@ -925,10 +1221,10 @@ class AstraUI(tk.Tk):
             if not filename:
                 return  # 사용자가 취소함
                 
-            with open(filename, "w", encoding="utf-8") as file:
-                file.write(self.conversation_text.get("1.0", tk.END))
+            # 창에는 최근 메시지만 남아 있으므로 전체 내역은 저장소에서 내보냄
+            count = self.transcript.export_text(filename)
                 
-            messagebox.showinfo("저장 완료", f"대화 내역이 {filename}에 저장되었습니다.")
+            messagebox.showinfo("저장 완료", f"대화 내역 {count}개 메시지가 {filename}에 저장되었습니다.")
             
         except Exception as e:
             logging.error(f"대화 내역 저장 오류: {e}")
@@ -940,6 +1236,10 @@ class AstraUI(tk.Tk):
             self.conversation_text.config(state=tk.NORMAL)
             self.conversation_text.delete("1.0", tk.END)
             self.conversation_text.config(state=tk.DISABLED)
+            for seq in range(self.view_start_seq, len(self.transcript)):
+                self.conversation_text.mark_unset(f"msg{seq}")
+            self.transcript.clear()
+            self.view_start_seq = self.history_floor_seq = len(self.transcript)
             self.add_system_message("대화 내역이 지워졌습니다.")
 
     def clear_logs(self):
@@ -952,8 +1252,15 @@ class AstraUI(tk.Tk):
         """로그 레벨 변경"""
         new_level = self.log_level_var.get()
         logging.getLogger().setLevel(getattr(logging, new_level))
+        self.gui_log_handler.setLevel(getattr(logging, new_level))
         logging.info(f"로그 레벨이 {new_level}로 변경되었습니다.")
 
+    def change_log_module(self, event=None):
+        """로그 창에 표시할 모듈 변경"""
+        module = self.log_module_var.get()
+        self.gui_log_handler.set_modules(None if module == "전체" else [module])
+        logging.info(f"로그 창 모듈 필터가 '{module}'(으)로 변경되었습니다.")
+
     def apply_model_change(self):
         """모델 변경 적용"""
         new_model = self.model_var.get().strip()
@@ -965,8 +1272,9 @@ class AstraUI(tk.Tk):
             messagebox.showinfo("알림", "어시스턴트가 아직 초기화되지 않았습니다.")
             return
             
-        # 모델 변경
+        # 모델 변경 (이전 모델의 context는 재사용할 수 없음)
         self.assistant.model = new_model
+        self.assistant.reset_llm_context(f"모델 변경 ({new_model})")
         
         # UI 업데이트
         self.model_label.config(text=f"모델: {new_model}")
@@ -1060,53 +1368,307 @@ class AstraUI(tk.Tk):
         ttk.Button(ltm_frame, text="모든 장기 기억 조회", 
                   command=lambda: self.view_all_ltm(memory_dialog)).pack(padx=10, pady=5)
         
+        ttk.Button(ltm_frame, text="월별 샤드 관리", 
+                  command=lambda: self.manage_ltm_shards(memory_dialog)).pack(padx=10, pady=5)
+        
+        ttk.Button(ltm_frame, text="중복 기억 정리", 
+                  command=lambda: self.compact_ltm(memory_dialog)).pack(padx=10, pady=5)
+        
+        snapshot_frame = ttk.Frame(ltm_frame)
+        snapshot_frame.pack(padx=10, pady=5)
+        ttk.Button(snapshot_frame, text="스냅샷 내보내기", 
+                  command=lambda: self.export_ltm_snapshot(memory_dialog)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(snapshot_frame, text="스냅샷 가져오기", 
+                  command=lambda: self.import_ltm_snapshot(memory_dialog)).pack(side=tk.LEFT, padx=5)
+        
         ttk.Button(ltm_frame, text="장기 기억 초기화 (위험)", 
                   command=lambda: self.confirm_clear_ltm(memory_dialog)).pack(padx=10, pady=5)
         
         ttk.Button(memory_dialog, text="닫기", command=memory_dialog.destroy).pack(pady=10)
 
     def view_all_ltm(self, parent_dialog):
-        """모든 장기 기억 조회"""
-        if not self.is_assistant_ready or not hasattr(self.assistant, 'long_term_memory'):
+        """모든 장기 기억 조회 (페이지 단위로 필요할 때만 불러오는 목록)"""
+        if not self.is_assistant_ready or not hasattr(self.assistant.long_term_memory, 'browse'):
             messagebox.showinfo("알림", "장기 기억 기능을 사용할 수 없습니다.")
             return
+        
+        view_dialog = tk.Toplevel(parent_dialog)
+        view_dialog.title("모든 장기 기억")
+        view_dialog.geometry("800x600")
+        view_dialog.transient(parent_dialog)
+        
+        # 필터/정렬 컨트롤
+        filter_frame = ttk.Frame(view_dialog)
+        filter_frame.pack(fill=tk.X, padx=10, pady=5)
+        
+        ttk.Label(filter_frame, text="기간:").pack(side=tk.LEFT, padx=5)
+        period_var = tk.StringVar(value="전체")
+        period_combo = ttk.Combobox(filter_frame, textvariable=period_var, width=8, state="readonly",
+                                    values=["전체", "1일", "7일", "30일"])
+        period_combo.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(filter_frame, text="정렬:").pack(side=tk.LEFT, padx=5)
+        order_var = tk.StringVar(value="최신순")
+        order_combo = ttk.Combobox(filter_frame, textvariable=order_var, width=8, state="readonly",
+                                   values=["최신순", "오래된순"])
+        order_combo.pack(side=tk.LEFT, padx=5)
+        
+        count_label = ttk.Label(filter_frame, text="")
+        count_label.pack(side=tk.RIGHT, padx=5)
+        
+        # 목록 (Treeview) + 상세 내용
+        list_paned = ttk.PanedWindow(view_dialog, orient=tk.VERTICAL)
+        list_paned.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        tree_frame = ttk.Frame(list_paned)
+        list_paned.add(tree_frame, weight=3)
+        memory_tree = ttk.Treeview(tree_frame, columns=("time", "tier", "memory"), show="headings")
+        memory_tree.heading("time", text="저장 시각")
+        memory_tree.heading("tier", text="계층")
+        memory_tree.heading("memory", text="내용")
+        memory_tree.column("time", width=140, stretch=False)
+        memory_tree.column("tier", width=50, stretch=False)
+        memory_tree.column("memory", width=560)
+        tree_scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=memory_tree.yview)
+        memory_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        tree_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        detail_text = scrolledtext.ScrolledText(list_paned, wrap=tk.WORD, font=("맑은 고딕", 9), height=8)
+        list_paned.add(detail_text, weight=1)
+        detail_text.config(state=tk.DISABLED)
+        
+        state = {"pager": None, "loading": False, "loaded": 0, "records": {}}
+        
+        def on_page_loaded(pager, records):
+            if pager is not state["pager"] or not view_dialog.winfo_exists():
+                return  # 필터가 바뀌었거나 창이 닫힘
+            state["loading"] = False
+            for record in records:
+                if record['id'] in state["records"]:
+                    continue  # hot과 읽기 전용 샤드에 같은 id가 남아 있는 승격 사본
+                state["records"][record['id']] = record
+                saved_at = time.strftime("%Y-%m-%d %H:%M", time.localtime(record['timestamp'])) if record['timestamp'] else "-"
+                preview = record['memory'].replace("\n", " ")[:120]
+                memory_tree.insert("", tk.END, iid=record['id'], values=(saved_at, record['tier'], preview))
+            state["loaded"] = len(state["records"])
+            count_label.config(text=f"{state['loaded']}개 표시" + (" (더 불러오는 중...)" if pager.has_more else ""))
+            if not state["loaded"]:
+                count_label.config(text="저장된 장기 기억이 없습니다.")
+        
+        def load_next_page():
+            pager = state["pager"]
+            if state["loading"] or pager is None or not pager.has_more:
+                return
+            state["loading"] = True
             
-        try:
-            # 빈 검색으로 모든 메모리 가져오기
-            memories = self.assistant.long_term_memory.search(
-                query="",
-                user_id=config.MEMORY_USER_ID,
-                limit=100
-            )
-            
-            view_dialog = tk.Toplevel(parent_dialog)
-            view_dialog.title("모든 장기 기억")
-            view_dialog.geometry("700x500")
-            view_dialog.transient(parent_dialog)
-            
-            ttk.Label(view_dialog, text="모든 장기 기억 목록", font=("맑은 고딕", 11, "bold")).pack(pady=5)
+            def page_worker():
+                try:
+                    records = pager.next_page()
+                except Exception as e:
+                    logging.error(f"장기 기억 조회 오류: {e}")
+                    records = []
+                    pager.has_more = False
+                self.run_on_ui(lambda: on_page_loaded(pager, records))
             
-            # 메모리 텍스트 영역
-            memory_text = scrolledtext.ScrolledText(
-                view_dialog, wrap=tk.WORD, font=("맑은 고딕", 9)
+            threading.Thread(target=page_worker, daemon=True).start()
+        
+        def reload(event=None):
+            memory_tree.delete(*memory_tree.get_children())
+            state["records"] = {}
+            state["loaded"] = 0
+            state["loading"] = False
+            days = {"1일": 1, "7일": 7, "30일": 30}.get(period_var.get())
+            since = time.time() - days * 86400 if days else None
+            state["pager"] = self.assistant.long_term_memory.browse(
+                user_id=None, since=since, newest_first=(order_var.get() == "최신순"),
+                page_size=config.LTM_BROWSER_PAGE_SIZE
             )
-            memory_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
-            
-            if not memories:
-                memory_text.insert(tk.END, "저장된 장기 기억이 없습니다.")
-            else:
-                memory_text.insert(tk.END, f"총 {len(memories)}개의 장기 기억이 있습니다.\n\n")
-                
-                for i, mem in enumerate(memories, 1):
-                    memory_text = mem.get('memory', '내용 없음')
-                    memory_text.insert(tk.END, f"--- 기억 #{i} ---\n")
-                    memory_text.insert(tk.END, f"{memory_text}\n\n")
-            
-            ttk.Button(view_dialog, text="닫기", command=view_dialog.destroy).pack(pady=10)
-            
+            load_next_page()
+        
+        def on_scroll(first, last):
+            tree_scrollbar.set(first, last)
+            # 목록 끝 근처까지 스크롤하면 다음 페이지를 불러옴
+            if float(last) > 0.9:
+                load_next_page()
+        
+        def on_select(event=None):
+            selected = memory_tree.selection()
+            if not selected:
+                return
+            record = state["records"].get(selected[0], {})
+            detail_text.config(state=tk.NORMAL)
+            detail_text.delete("1.0", tk.END)
+            detail_text.insert(tk.END, f"[{record.get('user_id', '-')} / {record.get('collection', '-')}]\n")
+            detail_text.insert(tk.END, record.get('memory', '내용 없음'))
+            detail_text.config(state=tk.DISABLED)
+        
+        memory_tree.configure(yscrollcommand=on_scroll)
+        memory_tree.bind("<<TreeviewSelect>>", on_select)
+        period_combo.bind("<<ComboboxSelected>>", reload)
+        order_combo.bind("<<ComboboxSelected>>", reload)
+        
+        ttk.Button(view_dialog, text="닫기", command=view_dialog.destroy).pack(pady=10)
+        
+        reload()
+
+    def manage_ltm_shards(self, parent_dialog):
+        """월별 cold 샤드 목록 조회 및 샤드 단위 삭제"""
+        if not self.is_assistant_ready or not hasattr(self.assistant.long_term_memory, 'shard_info'):
+            messagebox.showinfo("알림", "장기 기억 기능을 사용할 수 없습니다.", parent=parent_dialog)
+            return
+        
+        ltm = self.assistant.long_term_memory
+        shard_dialog = tk.Toplevel(parent_dialog)
+        shard_dialog.title("장기 기억 월별 샤드")
+        shard_dialog.geometry("500x350")
+        shard_dialog.transient(parent_dialog)
+        
+        ttk.Label(shard_dialog, text=f"hot 계층: {ltm.hot.count()}개 기억 (지난 달 샤드는 읽기 전용)").pack(pady=5)
+        
+        shard_tree = ttk.Treeview(shard_dialog, columns=("month", "count", "state"), show="headings", height=10)
+        shard_tree.heading("month", text="월")
+        shard_tree.heading("count", text="기억 수")
+        shard_tree.heading("state", text="상태")
+        shard_tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        def refresh():
+            shard_tree.delete(*shard_tree.get_children())
+            ltm.refresh_shards()
+            for shard in ltm.shard_info():
+                state = "읽기 전용" if shard['sealed'] else "쓰기 가능"
+                if shard['compacted']:
+                    state += ", 압축됨"
+                shard_tree.insert("", tk.END, iid=shard['name'], values=(shard['month'], shard['count'], state))
+        
+        def drop_selected():
+            selected = shard_tree.selection()
+            if not selected:
+                return
+            if not messagebox.askyesno("위험", f"선택한 샤드 {len(selected)}개를 삭제하시겠습니까?\n이 작업은 되돌릴 수 없습니다!", parent=shard_dialog):
+                return
+            try:
+                for name in selected:
+                    ltm.drop_shard(name)
+                self.add_system_message(f"장기 기억 샤드 {len(selected)}개가 삭제되었습니다.")
+            except Exception as e:
+                logging.error(f"장기 기억 샤드 삭제 오류: {e}")
+                messagebox.showerror("오류", f"샤드 삭제 중 오류가 발생했습니다: {e}", parent=shard_dialog)
+            refresh()
+        
+        button_frame = ttk.Frame(shard_dialog)
+        button_frame.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Button(button_frame, text="새로고침", command=refresh).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="선택 샤드 삭제", command=drop_selected).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="닫기", command=shard_dialog.destroy).pack(side=tk.RIGHT, padx=5)
+        
+        refresh()
+
+    def compact_ltm(self, parent_dialog):
+        """장기 기억 중복 정리 (백그라운드 스레드에서 전체 검사 실행)"""
+        if not self.is_assistant_ready or not hasattr(self.assistant, 'ltm_compactor'):
+            messagebox.showinfo("알림", "장기 기억 기능을 사용할 수 없습니다.", parent=parent_dialog)
+            return
+        
+        def compaction_worker():
+            try:
+                self.update_status("장기 기억 중복 정리 중...")
+                report = self.assistant.ltm_compactor.run_once(full=True)
+                summary = self.assistant.ltm_compactor.format_report(report)
+                self.post_message("system", summary)
+                self.update_status("장기 기억 중복 정리 완료")
+            except Exception as e:
+                logging.error(f"장기 기억 중복 정리 오류: {e}")
+                self.post_error(f"장기 기억 중복 정리 중 오류가 발생했습니다: {e}", popup=True)
+                self.update_status("장기 기억 중복 정리 실패")
+        
+        threading.Thread(target=compaction_worker, daemon=True).start()
+
+    def export_ltm_snapshot(self, parent_dialog):
+        """장기 기억 스냅샷 내보내기 (임베딩 벡터 포함)"""
+        if not self.is_assistant_ready or not hasattr(self.assistant, 'long_term_memory'):
+            messagebox.showinfo("알림", "장기 기억 기능을 사용할 수 없습니다.", parent=parent_dialog)
+            return
+        
+        os.makedirs(config.LTM_SNAPSHOT_DIR, exist_ok=True)
+        file_path = filedialog.asksaveasfilename(
+            parent=parent_dialog,
+            initialdir=config.LTM_SNAPSHOT_DIR,
+            initialfile=f"ltm_snapshot_{time.strftime('%Y%m%d_%H%M%S')}.zip",
+            defaultextension=".zip",
+            filetypes=[("LTM 스냅샷", "*.zip"), ("모든 파일", "*.*")]
+        )
+        if not file_path:
+            return
+        
+        def export_worker():
+            try:
+                self.update_status("장기 기억 스냅샷 내보내는 중...")
+                # 대기 중인 조회 기록을 먼저 반영해 스냅샷에 최신 access_count가 들어가도록 함
+                self.assistant.long_term_memory.flush_access()
+                report = ltm_snapshot.export_snapshot(
+                    self.assistant.long_term_memory.client, file_path,
+                    progress=lambda done, total: self.update_status(f"장기 기억 스냅샷 내보내는 중... ({done}/{total})")
+                )
+                summary = f"장기 기억 스냅샷 내보내기 완료: {ltm_snapshot.format_report(report)}"
+                self.post_message("system", summary)
+                self.update_status("장기 기억 스냅샷 내보내기 완료")
+            except Exception as e:
+                logging.error(f"장기 기억 스냅샷 내보내기 오류: {e}")
+                self.post_error(f"스냅샷 내보내기 중 오류가 발생했습니다: {e}", popup=True)
+                self.update_status("장기 기억 스냅샷 내보내기 실패")
+        
+        threading.Thread(target=export_worker, daemon=True).start()
+    
+    def import_ltm_snapshot(self, parent_dialog):
+        """장기 기억 스냅샷 가져오기 (임베딩을 다시 계산하지 않고 벡터를 그대로 적재)"""
+        if not self.is_assistant_ready or not hasattr(self.assistant, 'long_term_memory'):
+            messagebox.showinfo("알림", "장기 기억 기능을 사용할 수 없습니다.", parent=parent_dialog)
+            return
+        
+        file_path = filedialog.askopenfilename(
+            parent=parent_dialog,
+            initialdir=config.LTM_SNAPSHOT_DIR,
+            filetypes=[("LTM 스냅샷", "*.zip"), ("모든 파일", "*.*")]
+        )
+        if not file_path:
+            return
+        
+        try:
+            manifest = ltm_snapshot.read_manifest(file_path)
         except Exception as e:
-            logging.error(f"장기 기억 조회 오류: {e}")
-            messagebox.showerror("오류", f"장기 기억 조회 중 오류가 발생했습니다: {e}")
+            messagebox.showerror("오류", f"스냅샷 파일을 읽을 수 없습니다: {e}", parent=parent_dialog)
+            return
+        
+        total = sum(entry['count'] for entry in manifest['collections'])
+        replace = messagebox.askyesnocancel(
+            "스냅샷 가져오기",
+            f"기억 {total}개 (임베딩 모델: {manifest.get('embedding_model')})\n\n"
+            f"기존 장기 기억을 모두 지우고 스냅샷으로 교체하시겠습니까?\n"
+            f"'아니오'를 누르면 기존 기억에 합칩니다.",
+            parent=parent_dialog
+        )
+        if replace is None:
+            return
+        if replace:
+            self.clear_ltm()
+        
+        def import_worker():
+            try:
+                self.update_status("장기 기억 스냅샷 가져오는 중...")
+                report = ltm_snapshot.import_snapshot(
+                    self.assistant.long_term_memory.client, file_path,
+                    progress=lambda done, count: self.update_status(f"장기 기억 스냅샷 가져오는 중... ({done}/{count})")
+                )
+                self.assistant.long_term_memory.refresh_shards()
+                summary = f"장기 기억 스냅샷 가져오기 완료: {ltm_snapshot.format_report(report)}"
+                self.post_message("system", summary)
+                self.update_status("장기 기억 스냅샷 가져오기 완료")
+            except Exception as e:
+                logging.error(f"장기 기억 스냅샷 가져오기 오류: {e}")
+                self.post_error(f"스냅샷 가져오기 중 오류가 발생했습니다: {e}", popup=True)
+                self.update_status("장기 기억 스냅샷 가져오기 실패")
+        
+        threading.Thread(target=import_worker, daemon=True).start()
 
     def confirm_clear_ltm(self, parent_dialog):
         """장기 기억 초기화 확인"""
@@ -1120,8 +1682,10 @@ class AstraUI(tk.Tk):
             return
             
         try:
-            self.assistant.short_term_memory.clear()
-            self.update_stm_display()
+            # 지워지는 턴은 아직 LTM에 저장되지 않았으므로 LTM으로 승격한 뒤 비움
+            self.assistant.short_term_memory.clear(evict=True)
+            # 서버 context에도 지운 대화가 들어 있으므로 함께 버림
+            self.assistant.reset_llm_context("단기 기억 초기화")
             self.add_system_message("단기 기억이 초기화되었습니다.")
             logging.info("단기 기억이 초기화되었습니다.")
         except Exception as e:
@@ -1135,13 +1699,17 @@ class AstraUI(tk.Tk):
             return
             
         try:
-            # ChromaDB 컬렉션 삭제 (LTM 초기화)
-            self.assistant.long_term_memory.vector_store.delete_collection()
+            # ChromaDB hot/cold 컬렉션 삭제 (LTM 초기화)
+            self.assistant.long_term_memory.clear()
             self.add_system_message("장기 기억이 초기화되었습니다.")
             logging.info("장기 기억이 초기화되었습니다.")
             
-            # LTM 재초기화
+            # LTM 재초기화 (이전 인스턴스의 백그라운드 스레드는 정리)
+            self.assistant.long_term_memory.close()
             self.assistant.long_term_memory = self.assistant.setup_mem0_for_ltm()
+            self.assistant.ltm_compactor.memory = self.assistant.long_term_memory
+            self.assistant.ltm_compactor.reset_state()
+            self.assistant.long_term_memory.start_maintenance()
             
             if parent_dialog:
                 messagebox.showinfo("완료", "장기 기억이 성공적으로 초기화되었습니다.", parent=parent_dialog)
@@ -1160,6 +1728,7 @@ class AstraUI(tk.Tk):
         new_model = self.model_var.get().strip()
         if new_model and new_model != self.assistant.model:
             self.assistant.model = new_model
+            self.assistant.reset_llm_context(f"모델 변경 ({new_model})")
             self.model_label.config(text=f"모델: {new_model}")
             logging.info(f"LLM 모델이 {new_model}로 변경되었습니다.")
         
@@ -1198,10 +1767,8 @@ class AstraUI(tk.Tk):
         # STM 크기 변경
         new_stm_size = self.stm_size_var.get()
         if hasattr(self.assistant, 'short_term_memory') and new_stm_size != self.assistant.short_term_memory.maxlen:
-            # 새 deque 생성하고 기존 항목 복사
-            import collections
-            new_stm = collections.deque(self.assistant.short_term_memory, maxlen=new_stm_size)
-            self.assistant.short_term_memory = new_stm
+            # 크기가 줄어 밀려난 턴은 LTM으로 승격됨
+            self.assistant.short_term_memory.resize(new_stm_size)
             logging.info(f"STM 크기가 {new_stm_size}로 변경되었습니다.")
         
         self.add_system_message("설정이 적용되었습니다.")
@@ -1272,6 +1839,9 @@ Vector Store: {config.VECTOR_STORE_PROVIDER if MEM0_AVAILABLE else "N/A"}
             self.is_voice_active = False
             
             # 어시스턴트 정리
+            if self.is_assistant_ready and hasattr(self.assistant, 'end_session'):
+                self.assistant.end_session()
+            
             if self.is_assistant_ready and hasattr(self.assistant, 'recorder') and hasattr(self.assistant.recorder, 'shutdown'):
                 try:
                     self.assistant.recorder.shutdown()
@@ -1280,6 +1850,8 @@ Vector Store: {config.VECTOR_STORE_PROVIDER if MEM0_AVAILABLE else "N/A"}
                     logging.error(f"STT 레코더 종료 오류: {e}")
             
             logging.info("프로그램이 종료됩니다.")
+            self.transcript.close()
+            log_pipeline.stop()
             self.destroy()
 
 
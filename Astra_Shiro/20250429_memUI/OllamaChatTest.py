@@ -6,7 +6,9 @@ import threading
 import argparse
 import collections 
 import os
+import uuid
 from logging.handlers import RotatingFileHandler
+import log_pipeline
 
 try:
     import config # 설정 파일 임포트
@@ -24,13 +26,23 @@ try:
     # system_prompts에서 필요한 요소들을 명시적으로 임포트
     from system_prompts import (
         # MEMORY_PROMPTS, # 중요도 평가 프롬프트 더 이상 사용 안 함
-        MAIN_PROMPT_TEMPLATE,
-        get_astra_siro_identity_context # 새로 추가된 함수 임포트
+        STM_SUMMARY_PROMPT,
+        get_identity_context # 페르소나 모드(전체/압축)에 따른 정체성 컨텍스트
     )
 except ModuleNotFoundError:
     print("오류: system_prompts.py 파일을 찾을 수 없습니다. OllamaChatTest.py와 같은 디렉토리에 있는지 확인하세요.")
     exit()
 
+from ltm_compaction import LTMCompactor
+from long_term_memory import TieredLongTermMemory
+from embedding_client import OllamaEmbeddingClient, EmbeddingBatcher, select_embed_endpoint
+from stm import ShortTermMemory, STMJournal
+from ltm_writer import LTMWriteQueue
+from context_dedup import dedup_memories
+from llm_context import ConversationContext
+import metrics
+import tracing
+
 # --- 선택적 임포트 (음성 입력용) ---
 try:
     from RealtimeSTT import AudioToTextRecorder
@@ -61,7 +73,7 @@ os.makedirs(LOG_DIR, exist_ok=True)
 def setup_module_logger(name, log_file, level=logging.INFO):
     formatter = logging.Formatter(config.LOG_FORMAT)
     
-    # 파일 핸들러 설정
+    # 파일 핸들러 설정 (로그 파이프라인의 기록 스레드에서 실행, 이 로거와 하위 로거의 레코드만 기록)
     file_handler = RotatingFileHandler(
         os.path.join(LOG_DIR, log_file),
         maxBytes=5*1024*1024,  # 5MB
@@ -69,27 +81,17 @@ def setup_module_logger(name, log_file, level=logging.INFO):
         encoding='utf-8'  # UTF-8 인코딩 명시적 설정
     )
     file_handler.setFormatter(formatter)
-    file_handler.setLevel(level)
-    
-    # 스트림 핸들러는 필요 없음 (모듈별 출력 분리 목적)
+    file_handler.addFilter(logging.Filter(name))
+    log_pipeline.add_handler(file_handler)
     
-    # 로거 설정
+    # 로거 설정 (핸들러는 두지 않고 루트의 큐 핸들러로 전달)
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    logger.addHandler(file_handler)
-    
-    # 기존 핸들러 제거 (중복 방지)
-    for hdlr in logger.handlers[:]:
-        if isinstance(hdlr, logging.StreamHandler) and not isinstance(hdlr, logging.FileHandler):
-            logger.removeHandler(hdlr)
     
     return logger
 
-# 메인 로거 (기본 설정)
-logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL, 'INFO'),
-    format=config.LOG_FORMAT
-)
+# 메인 로거 (기본 설정): 루트 로거는 큐에 넣기만 하고, 콘솔/파일 기록은 백그라운드 기록 스레드에서 처리
+log_pipeline.setup(config.LOG_LEVEL, config.LOG_FORMAT)
 
 # 모듈별 로거 설정
 main_logger = setup_module_logger('main', 'main.log')
@@ -104,9 +106,11 @@ if not REALTIME_STT_AVAILABLE:
 
 class VoiceLLMAssistant:
     def __init__(self, ollama_host=config.OLLAMA_HOST, model=config.DEFAULT_MODEL,
-                 temperature=config.TEMPERATURE, stt_model=config.STT_MODEL, use_cuda=config.USE_CUDA):
+                 temperature=config.TEMPERATURE, stt_model=config.STT_MODEL, use_cuda=config.USE_CUDA,
+                 user_id=None, channel_id=None):
         """
         STT 및 새로운 LTM/STM 메모리 기능을 갖춘 음성 LLM 어시스턴트를 초기화합니다.
+        user_id/channel_id는 요청별로 지정하지 않았을 때 사용할 기본 시청자/채널입니다.
         """
         self.ollama_url = f"http://{ollama_host}:{config.OLLAMA_PORT}/api/generate"
         self.model = model
@@ -117,11 +121,46 @@ class VoiceLLMAssistant:
         self.compute_type = config.COMPUTE_TYPE if use_cuda and REALTIME_STT_AVAILABLE else "default"
         self.is_processing = False
         self.processing_lock = threading.Lock()
+        # 세션 ID (LTM 턴에 기록되어 세션 요약 인덱스의 단위가 됨)
+        self.session_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        # 기본 시청자/채널 (LTM 파티션 결정용)
+        self.user_id = user_id
+        self.channel_id = channel_id
 
         self.test_ollama_connection(self.ollama_url.replace('/api/generate', '/api/version'), "메인 LLM")
         self.long_term_memory = self.setup_mem0_for_ltm()
-        self.short_term_memory = collections.deque(maxlen=10)
-        main_logger.info("단기 기억 버퍼 (최대 10턴) 초기화 완료")
+        self.long_term_memory.start_maintenance()
+        self.ltm_compactor = LTMCompactor(self.long_term_memory)
+        if config.LTM_COMPACTION_ENABLED:
+            self.ltm_compactor.start()
+        self.ltm_writer = LTMWriteQueue(self.save_to_ltm)
+        metrics.registry.gauge(metrics.LTM_WRITE_QUEUE, self.ltm_writer.depth)
+        # clear_ltm이 LTM(과 임베딩 배처)을 새로 만들어도 현재 인스턴스를 읽도록 속성을 매번 따라감
+        # (배처를 쓰지 않으면 읽기에 실패하여 게이지 값에서 빠짐)
+        metrics.registry.gauge(metrics.EMBED_QUEUE, lambda: self.long_term_memory.embedding_model.pending())
+        self._recording_stopped_at = None
+        self.last_stt_span = None  # 마지막 음성 입력의 (녹음 종료, 변환 완료) perf_counter 시각
+        # 증분 대화 컨텍스트 (서버가 반환한 context를 턴 사이에 재사용)
+        self.llm_context = ConversationContext()
+        # STM 저널: 재시작 후에도 최근 대화 창을 복원 (창 크기도 저널에 기록된 값을 따름)
+        self.stm_journal = None
+        if config.STM_JOURNAL_ENABLED:
+            self.stm_journal = STMJournal(
+                config.STM_JOURNAL_FILE,
+                fsync_interval=config.STM_JOURNAL_FSYNC_INTERVAL,
+                compact_every=config.STM_JOURNAL_COMPACT_EVERY
+            )
+        self.short_term_memory = ShortTermMemory(
+            maxlen=config.STM_MAX_TURNS,
+            token_budget=config.STM_TOKEN_BUDGET,
+            on_evict=self.promote_to_ltm,
+            summarizer=self.summarize_stm if config.STM_ROLLING_SUMMARY else None,
+            journal=self.stm_journal
+        )
+        metrics.registry.gauge(metrics.STM_TURNS, lambda: len(self.short_term_memory))
+        metrics.registry.gauge(metrics.STM_TOKENS, self.short_term_memory.token_count)
+        main_logger.info(f"단기 기억 버퍼 (최대 {self.short_term_memory.maxlen}턴 / 약 {config.STM_TOKEN_BUDGET}토큰, "
+                         f"현재 {len(self.short_term_memory)}턴, LTM 저장 정책: {config.LTM_WRITE_POLICY}) 초기화 완료")
 
         try:
             self.setup_stt_recorder()
@@ -158,8 +197,17 @@ class VoiceLLMAssistant:
         }
         try:
             self.test_ollama_connection(f"{config.MEM0_OLLAMA_BASE_URL}/api/version", "메모리 LLM/임베더")
-            memory_instance = Memory.from_config(mem0_config)
-            ltm_logger.info(f"LTM 저장용 Memory 시스템 설정 완료 (Vector Store: ChromaDB at '{config.CHROMA_PATH}', Embedder: Ollama)")
+            mem0_memory = Memory.from_config(mem0_config)
+            memory_instance = TieredLongTermMemory(mem0_memory)
+            if config.EMBED_BATCH_ENABLED:
+                # 여러 스레드(검색, LTM 저장, 세션 요약)의 임베딩 요청을 모아 한 번에 전송
+                # 기존 저장소는 만들 때 쓴 /api/embeddings(정규화 안 됨)를 계속 사용
+                endpoint = select_embed_endpoint(memory_instance.hot, memory_instance.client)
+                mem0_memory.embedding_model = EmbeddingBatcher(
+                    OllamaEmbeddingClient(legacy_api=endpoint == "embeddings"), fallback=mem0_memory.embedding_model
+                )
+            ltm_logger.info(f"LTM 저장용 Memory 시스템 설정 완료 (Vector Store: ChromaDB at '{config.CHROMA_PATH}', Embedder: Ollama, "
+                            f"hot {memory_instance.hot.count()}개 / cold {sum(s['count'] for s in memory_instance.shard_info())}개)")
             return memory_instance
         except Exception as e:
             ltm_logger.error(f"LTM 저장용 Memory 시스템 설정 실패: {e}")
@@ -213,26 +261,209 @@ class VoiceLLMAssistant:
             self.recorder = AudioToTextRecorder()
 
     def _on_recording_start(self): stt_logger.info("🎤 녹음 시작됨")
-    def _on_recording_stop(self): stt_logger.info("🛑 녹음 중지됨, 변환 처리 중...")
+    def _on_recording_stop(self):
+        self._recording_stopped_at = time.perf_counter()
+        stt_logger.info("🛑 녹음 중지됨, 변환 처리 중...")
+
+    def transcribe(self):
+        """레코더에서 다음 입력을 받아 반환합니다. 음성 입력이면 녹음 종료부터 변환 완료까지의 시간을 기록합니다."""
+        text = self.recorder.text()
+        stopped_at, self._recording_stopped_at = self._recording_stopped_at, None
+        self.last_stt_span = None
+        if text and stopped_at is not None:
+            self.last_stt_span = (stopped_at, time.perf_counter())
+            metrics.observe(metrics.STT_FINALIZE_MS, (self.last_stt_span[1] - stopped_at) * 1000)
+        return text
+
     def _on_realtime_update(self, text): print(f"\r🎤 {text}", end="", flush=True)
 
-    def save_to_ltm(self, conversation_text):
+    def memory_partition(self, user_id=None, channel_id=None):
         """
-        **수정됨:** 중요도 평가 없이 모든 대화 내용을 LTM에 저장합니다.
-        백그라운드 스레드에서 실행될 수 있습니다.
+        시청자/채널에 해당하는 LTM 파티션 ID를 반환합니다.
+        시청자를 알 수 없으면 기존 기본 파티션(config.MEMORY_USER_ID)을 사용합니다.
         """
+        user_id = user_id or self.user_id
+        if not user_id:
+            return config.MEMORY_USER_ID
+        channel_id = channel_id or self.channel_id or config.MEMORY_CHANNEL_ID
+        return f"{channel_id}:{user_id}"
+
+    def search_partitions(self, user_id=None, channel_id=None):
+        """검색 대상 파티션: 호출한 시청자의 파티션 + 공용 지식 파티션"""
+        return [self.memory_partition(user_id, channel_id), config.MEMORY_GLOBAL_PARTITION]
+
+    def save_to_ltm(self, conversation_text, user_id=None, channel_id=None, timestamp=None, trace=None, session_id=None):
+        """
+        **수정됨:** 중요도 평가 없이 모든 대화 내용을 시청자/채널 파티션의 LTM에 저장합니다.
+        LTM 저장 큐(ltm_writer)의 백그라운드 스레드에서 실행됩니다. timestamp는 대화가 실제로 오간 시각이고,
+        session_id는 대화가 오간 세션입니다. (지정하지 않으면 현재 세션)
+        trace가 있으면 저장 시간을 그 턴의 추적에 "ltm.store" 구간으로 기록합니다.
+        """
+        trace = trace or tracing.NULL_TRACE
         thread_id = threading.get_ident()
-        ltm_logger.info(f"LTM 저장 진행 중... (스레드 ID: {thread_id})")
+        partition = self.memory_partition(user_id, channel_id)
+        session_id = session_id or self.session_id
+        ltm_logger.info("LTM 저장 진행 중... (파티션: %s, 스레드 ID: %s)", partition, thread_id)
+        store_started = time.perf_counter()
         try:
             self.long_term_memory.add(
                 conversation_text,
-                user_id=config.MEMORY_USER_ID,
+                user_id=partition,
+                metadata={
+                    "session_id": session_id,
+                    "channel_id": channel_id or self.channel_id or config.MEMORY_CHANNEL_ID,
+                    "created_ts": timestamp or time.time(),  # 시간 범위 필터/정렬용 숫자 타임스탬프
+                },
             )
-            ltm_logger.info(f"대화 내용을 LTM에 저장했습니다: {conversation_text[:100]}... (스레드 ID: {thread_id})")
+            self.long_term_memory.summaries.note_turn(session_id, conversation_text, user_id=partition)
+            ltm_logger.info("대화 내용을 LTM에 저장했습니다: %.100s... (스레드 ID: %s)", conversation_text, thread_id)
         except Exception as e:
+            metrics.registry.count(metrics.ERRORS, "ltm_store")
             ltm_logger.error(f"LTM 저장 중 예상치 못한 오류 (스레드 ID: {thread_id}): {e}", exc_info=True)
+        finally:
+            trace.add_span("ltm.store", store_started, time.perf_counter(), partition=partition)
+            trace.release()
 
 
+    def record_interaction(self, text, response, user_id=None, channel_id=None):
+        """
+        한 턴(사용자 입력 + 응답)을 STM에 추가하고 LTM 저장 정책에 따라 LTM 저장을 예약합니다.
+        CLI(send_to_llm)와 AstraUI가 함께 사용합니다.
+
+        - "evict": STM 창에서 밀려날 때(또는 세션 종료 시) promote_to_ltm으로 저장 (프롬프트의 STM과 LTM 중복 방지)
+        - "immediate": 매 턴 즉시 저장 (이전 동작)
+        """
+        interaction = f"사용자: {text}\n아스트라 시로: {response}"
+        self.short_term_memory.append_turn(text, response, user_id=user_id, channel_id=channel_id, session_id=self.session_id)
+        if stm_logger.isEnabledFor(logging.INFO):
+            stm_logger.info("현재 대화를 STM에 추가했습니다. (%d턴, 추정 %d토큰)", len(self.short_term_memory), self.short_term_memory.token_count())
+        if config.LTM_WRITE_POLICY == "immediate":
+            trace = tracing.current()
+            trace.hold()  # 저장이 끝날 때까지 이 턴의 추적 기록을 미룸
+            self.ltm_writer.submit(interaction, user_id, channel_id, trace=trace)
+            ltm_logger.info("LTM 저장 예약됨 (대기 중: %d개)", self.ltm_writer.depth())
+        return interaction
+
+    def promote_to_ltm(self, records):
+        """
+        STM에서 밀려난 턴 레코드를 LTM 저장 큐에 넣습니다. ("evict" 정책)
+        config.LTM_PROMOTION_MERGE_SPAN이 켜져 있으면 같은 시청자·세션의 연속된 턴을 하나의 기억으로 합쳐 저장합니다.
+        STM 저널로 복원된 턴은 원래 세션 id로 저장되어 이전 세션의 요약/검색 범위에 들어갑니다.
+        """
+        if config.LTM_WRITE_POLICY != "evict":
+            return
+        groups = []
+        for record in records:
+            partition = (record['user_id'], record['channel_id'], record.get('session_id'))
+            if config.LTM_PROMOTION_MERGE_SPAN and groups and groups[-1][0] == partition:
+                groups[-1][1].append(record)
+            else:
+                groups.append((partition, [record]))
+        trace = tracing.current()
+        for (user_id, channel_id, session_id), span in groups:
+            text = "\n\n".join(record['text'] for record in span)
+            trace.hold()
+            self.ltm_writer.submit(text, user_id, channel_id, span[0]['timestamp'], trace=trace, session_id=session_id)
+        ltm_logger.info("STM에서 밀려난 %d개 턴을 LTM 저장 큐에 추가 (기억 %d개, 대기 중: %d개)", len(records), len(groups), self.ltm_writer.depth())
+
+    def reset_llm_context(self, reason):
+        """증분 대화 컨텍스트를 버립니다. (STM 초기화, 모델 변경 시 호출)"""
+        self.llm_context.invalidate(reason)
+
+    def summarize_stm(self, previous_summary, transcript):
+        """STM에서 밀려난 대화를 기존 롤링 요약에 합칩니다. (메모리 LLM 사용, STM 요약 스레드에서 호출)"""
+        return self.long_term_memory.llm.generate_response(messages=[
+            {"role": "system", "content": STM_SUMMARY_PROMPT},
+            {"role": "user", "content": f"[이전 요약]\n{previous_summary or '없음'}\n\n[새 대화]\n{transcript}"},
+        ])
+
+    def end_session(self):
+        """
+        세션 종료 처리: 저장/요약/유지보수 작업을 정리합니다.
+        STM 저널을 사용하면 STM은 다음 실행에서 복원되므로 그대로 두고(나중에 밀려날 때 이 세션 id로 LTM 승격),
+        저널을 사용하지 않으면 남은 STM 턴을 지금 LTM에 승격합니다.
+        """
+        if self.stm_journal is not None:
+            self.short_term_memory.wait_for_summary(timeout=10)
+            self.stm_journal.close()
+        else:
+            self.short_term_memory.clear(evict=True)
+        if not self.ltm_writer.flush():
+            ltm_logger.warning(f"LTM 저장 큐가 비워지지 않은 채 종료합니다. (남은 작업: {self.ltm_writer.depth()}개)")
+        self.ltm_compactor.stop()
+        self.long_term_memory.summaries.close_session()  # 현재 세션 + 복원된 턴이 승격된 이전 세션
+        if isinstance(self.long_term_memory.embedding_model, EmbeddingBatcher):
+            ltm_logger.info(self.long_term_memory.embedding_model.format_stats())
+        self.long_term_memory.close()  # 유지보수/요약 스레드와 임베딩 배처 종료
+
+    def add_global_memory(self, knowledge_text):
+        """모든 시청자의 검색에 포함되는 공용 지식 파티션에 기억을 추가합니다."""
+        self.long_term_memory.add(
+            knowledge_text,
+            user_id=config.MEMORY_GLOBAL_PARTITION,
+            metadata={"session_id": self.session_id, "created_ts": time.time()},
+        )
+        ltm_logger.info(f"공용 지식 파티션에 기억을 추가했습니다: {knowledge_text[:100]}...")
+
+    def build_ltm_context(self, text, limit=3, user_id=None, channel_id=None):
+        """
+        사용자 입력으로 시청자 파티션 + 공용 파티션의 LTM을 검색하여 장기 기억 컨텍스트 문자열을 만듭니다.
+        config.LTM_STM_DEDUP_ENABLED가 켜져 있으면 limit보다 많이 검색한 뒤, 이미 STM에 있는 턴과 겹치거나
+        서로 거의 같은 기억을 빼고 다음 순위의 기억으로 채웁니다.
+        """
+        ltm_context = "관련된 장기 기억 없음."
+        search_started = time.perf_counter()
+        try:
+            fetch_limit = limit * config.LTM_DEDUP_OVERFETCH if config.LTM_STM_DEDUP_ENABLED else limit
+            memories_found = self.long_term_memory.search(
+                query=text,
+                user_id=self.search_partitions(user_id, channel_id),
+                limit=fetch_limit,
+                current_session_id=self.session_id
+            )
+            if config.LTM_STM_DEDUP_ENABLED:
+                memories_found, dropped_stm, dropped_dup = dedup_memories(
+                    memories_found, list(self.short_term_memory), limit, config.LTM_STM_DEDUP_THRESHOLD
+                )
+                if dropped_stm or dropped_dup:
+                    ltm_logger.info("LTM 검색 결과 중복 제거: STM과 겹침 %d개, LTM끼리 겹침 %d개", dropped_stm, dropped_dup)
+            # 프롬프트에 실제로 들어가는 기억만 조회 기록 (더 가져왔다가 버린 결과가 heat를 올리지 않도록)
+            self.long_term_memory.record_access(memories_found)
+            search_finished = time.perf_counter()
+            metrics.observe(metrics.LTM_SEARCH_MS, (search_finished - search_started) * 1000)
+            tracing.current().add_span("ltm.retrieve", search_started, search_finished, results=len(memories_found))
+            ltm_context_lines = []
+            summaries_shown = set()
+            for mem in memories_found:
+                if isinstance(mem, dict):
+                    # 세션 요약 인덱스를 거친 결과는 세션 요약을 한 번만 먼저 표시
+                    session_summary = mem.get('session_summary')
+                    if session_summary and session_summary not in summaries_shown:
+                        summaries_shown.add(session_summary)
+                        ltm_context_lines.append(f"- [지난 대화 요약] {session_summary}")
+                    memory_text = mem.get('memory', '내용 없음')
+                    if len(memory_text) > config.LTM_CONTEXT_TURN_MAX_CHARS:
+                        memory_text = memory_text[:config.LTM_CONTEXT_TURN_MAX_CHARS] + "..."
+                    score = mem.get('score')
+                    if score is None:
+                        ltm_context_lines.append(f"- {memory_text} (관련도: N/A)")
+                    else:
+                        try:
+                            ltm_context_lines.append(f"- {memory_text} (관련도: {float(score):.2f})")
+                        except (ValueError, TypeError):
+                            ltm_context_lines.append(f"- {memory_text} (관련도: {score})")
+            if ltm_context_lines:
+                ltm_context = "\n".join(ltm_context_lines)
+
+            if ltm_logger.isEnabledFor(logging.DEBUG):
+                ltm_logger.debug("검색된 LTM 컨텍스트:\n%s", log_pipeline.clip(ltm_context))
+
+        except Exception as e:
+            metrics.registry.count(metrics.ERRORS, "ltm_search")
+            ltm_logger.error(f"LTM 검색 중 오류 발생: {e}", exc_info=True)
+            ltm_context = "장기 기억 검색 중 오류 발생."
+        return ltm_context
+
     def process_voice_input(self):
         """음성 또는 텍스트 입력을 처리하고, 결과를 얻어 메인 LLM에 전송합니다."""
         if self.is_processing:
@@ -244,7 +475,7 @@ class VoiceLLMAssistant:
             try:
                 if REALTIME_STT_AVAILABLE:
                     print("\n⏳ 질문을 듣고 있습니다... (지금 말씀하세요)")
-                transcribed_text = self.recorder.text()
+                transcribed_text = self.transcribe()
                 if not transcribed_text or transcribed_text.strip() == "":
                     if transcribed_text is None:
                          raise KeyboardInterrupt("입력 종료됨")
@@ -254,7 +485,7 @@ class VoiceLLMAssistant:
                 input_source = "🎤 말씀하신 내용" if REALTIME_STT_AVAILABLE else "⌨️  입력하신 내용"
                 print(f"\n\n{input_source}: {transcribed_text}")
                 print("\n⏳ LLM 생각 중 (정체성 + STM + LTM 사용)...")
-                self.send_to_llm(transcribed_text)
+                self.send_to_llm(transcribed_text, trace=self.start_turn_trace())
             except KeyboardInterrupt:
                 raise
             except Exception as e:
@@ -266,74 +497,73 @@ class VoiceLLMAssistant:
                 # 어떤 경우든 처리 완료 후 플래그 해제
                 self.is_processing = False
 
-    def send_to_llm(self, text):
+    def start_turn_trace(self):
+        """
+        새 턴 추적을 시작합니다. 직전 입력이 음성이면 녹음 종료 시각부터 시작하고 STT 변환 구간을 기록합니다.
+        transcribe() 직후 입력을 처리하는 스레드에서 호출합니다.
+        """
+        stt_span, self.last_stt_span = self.last_stt_span, None
+        trace = tracing.start_trace("turn", started_at=stt_span[0] if stt_span else None, model=self.model)
+        if stt_span:
+            trace.add_span("stt.finalize", *stt_span)
+        return trace
+
+    def send_to_llm(self, text, user_id=None, channel_id=None, trace=None):
         """
         동적 정체성, STM, LTM 컨텍스트와 함께 텍스트를 메인 LLM에 전송하고,
         응답 후 STM 저장 및 LTM 처리 (수정됨: LTM 무조건 저장).
+        user_id/channel_id로 지정한 시청자의 LTM 파티션(+ 공용 파티션)만 검색하고 저장합니다.
         
         LTM 저장은 별도의 백그라운드 스레드에서 비동기적으로 처리됩니다.
         이를 통해 UI 응답성이 향상되며, LTM 저장이 완료되지 않아도 사용자는 계속해서
         어시스턴트와 상호작용할 수 있습니다.
-        """
 
-        stm_context = "\n".join(self.short_term_memory) if self.short_term_memory else "최근 대화 없음."
-        stm_logger.debug(f"사용될 STM 컨텍스트:\n{stm_context}")
+        각 단계의 소요 시간은 trace(없으면 새로 시작한 턴 추적)에 구간으로 기록됩니다.
+        """
+        trace = trace or tracing.start_trace("turn", model=self.model)
+        metrics.registry.count(metrics.TURNS, self.model)
+        log_started = log_pipeline.thread_time_ms()
+        with tracing.activate(trace):
+            try:
+                self._send_to_llm(text, user_id, channel_id)
+            finally:
+                log_ms = log_pipeline.thread_time_ms() - log_started
+                metrics.observe(metrics.LOG_EMIT_MS, log_ms)
+                trace.end(log_ms=round(log_ms, 3))
 
-        ltm_context = "관련된 장기 기억 없음."
-        try:
-            ltm_search_query = text
-            ltm_search_response = self.long_term_memory.search(
-                query=ltm_search_query,
-                user_id=config.MEMORY_USER_ID,
-                limit=3
-            )
-            memories_found = []
-            if isinstance(ltm_search_response, list):
-                memories_found = ltm_search_response
-
-            if memories_found:
-                ltm_context_lines = []
-                for mem in memories_found:
-                    if isinstance(mem, dict):
-                        memory_text = mem.get('memory', '내용 없음')
-                        score = mem.get('score')
-                        if score is None:
-                            ltm_context_lines.append(f"- {memory_text} (관련도: N/A)")
-                        else:
-                            try:
-                                ltm_context_lines.append(f"- {memory_text} (관련도: {float(score):.2f})")
-                            except (ValueError, TypeError):
-                                ltm_context_lines.append(f"- {memory_text} (관련도: {score})")
-                if ltm_context_lines:
-                    ltm_context = "\n".join(ltm_context_lines)
-
-            ltm_logger.debug(f"검색된 LTM 컨텍스트:\n{ltm_context}")
+    def _send_to_llm(self, text, user_id=None, channel_id=None):
+        turn_started = time.perf_counter()
+        stm_context = self.short_term_memory.context()
+        if stm_logger.isEnabledFor(logging.DEBUG):
+            stm_logger.debug("사용될 STM 컨텍스트:\n%s", log_pipeline.clip(stm_context))
 
-        except Exception as e:
-            ltm_logger.error(f"LTM 검색 중 오류 발생: {e}", exc_info=True)
-            ltm_context = "장기 기억 검색 중 오류 발생."
+        ltm_context = self.build_ltm_context(text, user_id=user_id, channel_id=channel_id)
 
         try:
-            dynamic_identity_context = get_astra_siro_identity_context()
-            llm_logger.debug(f"사용될 동적 정체성 컨텍스트:\n{dynamic_identity_context[:300]}...")
+            with tracing.span("persona.build", mode=config.PERSONA_MODE):
+                dynamic_identity_context = get_identity_context(config.PERSONA_MODE)
+            llm_logger.debug("사용될 동적 정체성 컨텍스트:\n%.300s...", dynamic_identity_context)
         except Exception as e:
             llm_logger.error(f"동적 정체성 컨텍스트 생성 중 오류: {e}", exc_info=True)
             dynamic_identity_context = "오류: 정체성 컨텍스트를 생성할 수 없습니다."
 
 
         try:
-            prompt_with_context = MAIN_PROMPT_TEMPLATE.format(
-                identity_context=dynamic_identity_context,
-                short_term_memory=stm_context,
-                long_term_memory=ltm_context,
-                user_input=text
-            )
-            llm_logger.debug(f"메인 LLM에 전송될 최종 프롬프트:\n{prompt_with_context}")
+            # 증분 모드면 이전 context에 이어 새 입력(과 바뀐 장기 기억)만 전송
+            with tracing.span("prompt.format"):
+                prompt_with_context, llm_context, context_generation = self.llm_context.prepare(
+                    self.model, dynamic_identity_context, stm_context, ltm_context, text
+                )
+            if llm_logger.isEnabledFor(logging.DEBUG):
+                llm_logger.debug("메인 LLM에 전송될 최종 프롬프트 (이어지는 context: %d토큰):\n%s",
+                                 len(llm_context) if llm_context else 0, log_pipeline.clip(prompt_with_context))
         except KeyError as e:
+            metrics.registry.count(metrics.ERRORS, "prompt")
             llm_logger.error(f"프롬프트 템플릿 포맷팅 오류: 누락된 키 - {e}")
             print(f"\n❌ 오류: 프롬프트를 구성할 수 없습니다.")
             return
         except Exception as e:
+            metrics.registry.count(metrics.ERRORS, "prompt")
             llm_logger.error(f"프롬프트 구성 중 예상치 못한 오류: {e}", exc_info=True)
             print(f"\n❌ 오류: 프롬프트를 구성할 수 없습니다.")
             return
@@ -347,11 +577,15 @@ class VoiceLLMAssistant:
                 "temperature": self.temperature,
             }
         }
+        if llm_context:
+            payload["context"] = llm_context
         headers = {'Content-Type': 'application/json'}
         full_response = ""
 
         try:
             print("\n🤖 아스트라 시로 응답:")
+            request_started = time.perf_counter()
+            first_token_at = None
             response = requests.post(
                 self.ollama_url, json=payload, headers=headers, stream=True,
                 timeout=config.REQUEST_TIMEOUT * 6
@@ -364,37 +598,42 @@ class VoiceLLMAssistant:
                     try:
                         json_chunk = json.loads(decoded_line)
                         response_part = json_chunk.get('response', '')
+                        if response_part and first_token_at is None:
+                            first_token_at = time.perf_counter()
                         print(response_part, end='', flush=True)
                         full_response += response_part
                         if json_chunk.get('done', False):
+                            self.llm_context.update(context_generation, self.model, json_chunk.get('context'))
+                            metrics.observe_generation(json_chunk, request_started, first_token_at, self.model, turn_started)
+                            tracing.record_generation(json_chunk, request_started, first_token_at)
                             break
                     except json.JSONDecodeError:
-                        llm_logger.warning(f"응답 스트림 JSON 디코딩 오류 (무시): {decoded_line}")
+                        llm_logger.warning("응답 스트림 JSON 디코딩 오류 (무시): %s", decoded_line)
                     except Exception as e:
                         llm_logger.error(f"응답 스트림 처리 중 오류: {e}", exc_info=True)
+            else:
+                # 마지막 청크(done)를 받지 못하면 서버 context와 STM이 어긋나므로 다음 턴은 전체 프롬프트로 전송
+                self.llm_context.invalidate("응답 스트림이 완료되지 않음")
 
             print("\n")
 
             if text and full_response.strip():
-                interaction_to_save = f"사용자: {text}\n아스트라 시로: {full_response}"
-                self.short_term_memory.append(interaction_to_save)
-                stm_logger.info("현재 대화를 STM에 추가했습니다.")
-                # 비동기적으로 LTM에 저장하도록 수정
-                ltm_save_thread = threading.Thread(
-                    target=self.save_to_ltm,
-                    args=(interaction_to_save,),
-                    daemon=True
-                )
-                ltm_save_thread.start()
-                ltm_logger.info(f"LTM 저장을 위한 백그라운드 스레드 시작됨 (ID: {ltm_save_thread.ident})")
+                with tracing.span("stm.record"):
+                    self.record_interaction(text, full_response, user_id, channel_id)
 
         except requests.exceptions.Timeout:
+            metrics.registry.count(metrics.ERRORS, "llm_timeout")
+            self.llm_context.invalidate("LLM 요청 시간 초과")
             llm_logger.error(f"Ollama API 호출 시간 초과 ({self.ollama_url})")
             print(f"\n❌ 오류: LLM 응답 시간이 초과되었습니다.")
         except requests.exceptions.RequestException as e:
+            metrics.registry.count(metrics.ERRORS, "llm_request")
+            self.llm_context.invalidate("LLM 요청 오류")
             llm_logger.error(f"Ollama API 호출 오류: {e}")
             print(f"\n❌ 오류: LLM 서버({self.ollama_url}) 응답을 받을 수 없습니다 ({e}).")
         except Exception as e:
+            metrics.registry.count(metrics.ERRORS, "llm_response")
+            self.llm_context.invalidate("LLM 응답 처리 오류")
             llm_logger.error(f"LLM 응답 처리 중 예상치 못한 오류: {e}", exc_info=True)
             print(f"\n❌ 처리 중 오류 발생: {e}")
 
@@ -415,6 +654,7 @@ class VoiceLLMAssistant:
         except KeyboardInterrupt:
             print("\n\nCtrl+C 또는 입력 종료 감지됨. 어시스턴트를 종료합니다...")
         finally:
+            self.end_session()
             if hasattr(self, 'recorder') and hasattr(self.recorder, 'shutdown') and callable(self.recorder.shutdown):
                 try:
                     self.recorder.shutdown()
@@ -432,6 +672,11 @@ def parse_arguments():
     parser.add_argument("--temp", type=float, default=config.TEMPERATURE, help=f"LLM 온도 (기본값: {config.TEMPERATURE} from config.py)")
     parser.add_argument("--cpu", action="store_true", default=not config.USE_CUDA, help=f"CUDA(GPU) 대신 CPU 사용 (STT용, 기본값: {'CPU' if not config.USE_CUDA else 'GPU'} from config.py, RealtimeSTT 필요)")
     parser.add_argument("--debug", action="store_true", default=config.DEBUG_MODE, help=f"자세한 로깅 활성화 (DEBUG 레벨, 기본값: {config.DEBUG_MODE} from config.py)")
+    parser.add_argument("--user", type=str, default=None, help=f"LTM 파티션을 나눌 시청자 ID (기본값: 없음 -> '{config.MEMORY_USER_ID}' 파티션)")
+    parser.add_argument("--channel", type=str, default=None, help=f"LTM 파티션을 나눌 채널 ID (기본값: {config.MEMORY_CHANNEL_ID} from config.py)")
+    parser.add_argument("--metrics", action="store_true", default=config.METRICS_SERVER_ENABLED, help=f"Prometheus 형식 지표 엔드포인트(/metrics) 실행 (기본값: {config.METRICS_SERVER_ENABLED} from config.py)")
+    parser.add_argument("--metrics-host", type=str, default=config.METRICS_SERVER_HOST, help=f"지표 엔드포인트 바인딩 주소 (기본값: {config.METRICS_SERVER_HOST} from config.py)")
+    parser.add_argument("--metrics-port", type=int, default=None, help=f"지표 엔드포인트 포트, 지정하면 --metrics 없이도 실행 (기본값: {config.METRICS_SERVER_PORT} from config.py)")
     return parser.parse_args()
 
 if __name__ == "__main__":
@@ -443,20 +688,26 @@ if __name__ == "__main__":
     else:
         log_level = getattr(logging, config.LOG_LEVEL.upper(), logging.INFO)
 
-    # 모든 로거의 레벨 설정
+    # 모든 로거의 레벨 설정 (파일 핸들러는 로거 레벨을 따름)
     loggers = [main_logger, stt_logger, ltm_logger, stm_logger, llm_logger]
     for logger in loggers:
         logger.setLevel(log_level)
-        for handler in logger.handlers:
-            handler.setLevel(log_level)
     main_logger.info(f"모든 로거 레벨 설정됨: {logging.getLevelName(log_level)}")
 
 
     try:
         assistant = VoiceLLMAssistant(
             ollama_host=args.host, model=args.model, temperature=args.temp,
-            stt_model=args.stt, use_cuda=not args.cpu
+            stt_model=args.stt, use_cuda=not args.cpu,
+            user_id=args.user, channel_id=args.channel
         )
+        if args.metrics or args.metrics_port is not None:
+            from metrics_server import MetricsServer, assistant_collectors
+            MetricsServer(
+                host=args.metrics_host,
+                port=args.metrics_port if args.metrics_port is not None else config.METRICS_SERVER_PORT,
+                collectors=assistant_collectors(assistant)
+            ).start()
         assistant.run_interactive_session()
     except ConnectionError as e:
         main_logger.critical(f"치명적 연결 오류: {e}")
@@ -0,0 +1,315 @@
+# bench_assistant.py
+# 어시스턴트 종단 간 성능 측정 스크립트
+# mock_ollama 대역 서버를 띄우고 텍스트 모드 VoiceLLMAssistant.send_to_llm을 직접 호출해
+# 단계별 지연(턴 추적 구간), 동시 세션 처리량, 메모리 증가량을 측정합니다.
+# 결과를 기준선 JSON으로 저장해 두고, 다음 실행에서 비교해 성능 저하를 확인할 수 있습니다.
+#
+# 사용 예:
+#   python bench_assistant.py --turns 30 --save-baseline bench_baseline.json
+#   python bench_assistant.py --turns 30 --baseline bench_baseline.json --tolerance 0.15
+#   python bench_assistant.py --url http://127.0.0.1:11434    # 이미 실행 중인 서버(대역 또는 실제) 사용
+#
+# LTM/STM 데이터, 추적 파일은 임시 폴더에 만들어 측정 후 지우므로 실제 기억 DB에는 영향이 없습니다.
+
+import os
+import gc
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import contextlib
+import tracemalloc
+import importlib.util
+from urllib.parse import urlparse
+
+import config
+import tracing
+from metrics import percentile
+from mock_ollama import MockOllamaServer, add_mock_arguments, mock_from_args
+
+SAMPLE_INPUTS = [
+    "오늘 방송 주제가 뭐야?",
+    "어제 했던 게임 이야기 좀 더 해줘",
+    "시로는 좋아하는 노래가 있어?",
+    "내 이름 기억하고 있어?",
+    "요즘 날씨가 너무 춥다",
+    "다음 방송은 언제 해?",
+    "고양이랑 강아지 중에 뭐가 더 좋아?",
+    "오늘 저녁 메뉴 추천해줘",
+]
+
+# 값이 클수록 나쁜 지표 / 작을수록 나쁜 지표 (기준선 비교용)
+HIGHER_IS_WORSE = ("p50", "p95", "kb_per_100_turns")
+LOWER_IS_WORSE = ("turns_per_sec",)
+
+
+def bench_inputs(count, seed):
+    rng = random.Random(seed)
+    return [f"{rng.choice(SAMPLE_INPUTS)} ({i})" for i in range(count)]
+
+
+def stage_stats(traces):
+    """턴 추적 목록의 구간별 지연 통계 {"구간": {"p50", "p95", "p99", "mean", "n"}} ("turn"은 턴 전체)"""
+    durations = {"turn": [trace["duration_ms"] for trace in traces]}
+    for trace in traces:
+        for span in trace["spans"]:
+            durations.setdefault(span["name"], []).append(span["duration_ms"])
+    stats = {}
+    for name, values in durations.items():
+        if not values:
+            continue
+        ordered = sorted(values)
+        stats[name] = {
+            "p50": percentile(ordered, 50),
+            "p95": percentile(ordered, 95),
+            "p99": percentile(ordered, 99),
+            "mean": sum(ordered) / len(ordered),
+            "n": len(ordered),
+        }
+    return stats
+
+
+def flatten(results, prefix=""):
+    """중첩 결과를 "stages.ltm.retrieve.p95" 같은 경로 -> 값 목록으로 펼침"""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)):
+            flat[path] = value
+    return flat
+
+
+def compare(current, baseline, tolerance):
+    """
+    기준선과 비교해 [(경로, 기준값, 현재값, 변화율, 저하 여부), ...]를 반환합니다.
+    지연/메모리는 tolerance보다 커지면, 처리량은 tolerance보다 작아지면 저하로 봅니다.
+    """
+    now, base = flatten(current), flatten(baseline)
+    rows = []
+    for path, base_value in sorted(base.items()):
+        metric = path.rsplit(".", 1)[-1]
+        if path not in now or metric not in HIGHER_IS_WORSE + LOWER_IS_WORSE or not path.startswith(("stages.", "concurrency.", "memory.")):
+            continue
+        value = now[path]
+        change = (value - base_value) / base_value if base_value else 0.0
+        regressed = change > tolerance if metric in HIGHER_IS_WORSE else change < -tolerance
+        rows.append((path, base_value, value, change, regressed))
+    return rows
+
+
+class Bench:
+    """임시 데이터 폴더와 대역(또는 지정한) 서버로 VoiceLLMAssistant를 만들어 측정합니다."""
+
+    def __init__(self, args):
+        self.args = args
+        self.workdir = tempfile.mkdtemp(prefix="astra_bench_")
+        self.server = None
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            self.server = MockOllamaServer(mock_from_args(args)).start()
+            base_url = self.server.base_url
+        parsed = urlparse(base_url)
+        self._configure(parsed.hostname, parsed.port or config.OLLAMA_PORT, base_url)
+        self.assistant = self._create_assistant(parsed.hostname)
+        self._traces_seen = 0
+
+    def _configure(self, host, port, base_url):
+        # OllamaChatTest는 함수 기본값에 config 값을 쓰므로 모듈을 불러오기 전에 바꿔 둠
+        config.OLLAMA_HOST, config.OLLAMA_PORT = host, port
+        config.MEM0_OLLAMA_HOST, config.MEM0_OLLAMA_PORT, config.MEM0_OLLAMA_BASE_URL = host, port, base_url
+        config.CHROMA_PATH = os.path.join(self.workdir, "chroma_db")
+        config.LTM_COMPACTION_STATE_FILE = os.path.join(config.CHROMA_PATH, "compaction_state.json")
+        config.LTM_INGEST_STATE_FILE = os.path.join(config.CHROMA_PATH, "ingest_state.json")
+        config.LTM_SNAPSHOT_DIR = os.path.join(self.workdir, "ltm_snapshots")
+        config.CONVERSATION_STORE_DIR = os.path.join(self.workdir, "conversation_logs")
+        config.STM_JOURNAL_ENABLED = False
+        config.LTM_COMPACTION_ENABLED = False
+        config.TRACE_ENABLED = True
+        config.TRACE_FILE = os.path.join(self.workdir, "traces.jsonl")
+
+    def _create_assistant(self, host):
+        spec = importlib.util.spec_from_file_location(
+            "OllamaChatTest", os.path.join(os.path.dirname(os.path.abspath(__file__)), "OllamaChatTest.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.REALTIME_STT_AVAILABLE = False  # 마이크 없이 텍스트 입력으로만 측정
+        return module.VoiceLLMAssistant(ollama_host=host, model=self.args.model, use_cuda=False)
+
+    def new_traces(self):
+        """마지막 호출 이후 기록된 턴 추적 (LTM 저장까지 끝난 턴만 기록되므로 먼저 저장 큐를 비움)"""
+        self.assistant.ltm_writer.flush(timeout=120)
+        traces = tracing.load_traces(config.TRACE_FILE)
+        fresh, self._traces_seen = traces[self._traces_seen:], len(traces)
+        return fresh
+
+    def turn(self, text, user_id):
+        with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+            self.assistant.send_to_llm(text, user_id=user_id)
+
+    def run_sequential(self, turns):
+        for text in bench_inputs(turns, self.args.seed):
+            self.turn(text, "bench-0")
+        return stage_stats(self.new_traces())
+
+    def run_concurrent(self, sessions, turns_per_session):
+        inputs = bench_inputs(turns_per_session, self.args.seed + sessions)
+
+        def session(index):
+            for text in inputs:
+                self.turn(text, f"bench-{index}")
+
+        threads = [threading.Thread(target=session, args=(i,), name=f"BenchSession{i}") for i in range(sessions)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        turn_stats = stage_stats(self.new_traces()).get("turn", {})
+        total = sessions * turns_per_session
+        return {
+            "sessions": sessions,
+            "turns": total,
+            "elapsed_s": elapsed,
+            "turns_per_sec": total / elapsed if elapsed else 0.0,
+            "p50": turn_stats.get("p50", 0.0),
+            "p95": turn_stats.get("p95", 0.0),
+        }
+
+    def run_memory(self, turns):
+        """turns턴 동안 늘어난 Python 힙 (tracemalloc 기준, 측정 오버헤드가 있어 지연 측정과 분리)"""
+        inputs = bench_inputs(turns, self.args.seed + 1000)
+        gc.collect()
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        for text in inputs:
+            self.turn(text, "bench-memory")
+        self.assistant.ltm_writer.flush(timeout=120)
+        gc.collect()
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.new_traces()
+        growth_kb = (after - before) / 1024
+        return {
+            "turns": turns,
+            "growth_kb": growth_kb,
+            "kb_per_100_turns": growth_kb / turns * 100 if turns else 0.0,
+            "peak_kb": peak / 1024,
+        }
+
+    def ltm_records(self):
+        ltm = self.assistant.long_term_memory
+        return ltm.hot.count() + sum(shard["count"] for shard in ltm.shard_info())
+
+    def run(self):
+        args = self.args
+        records_before = self.ltm_records()
+        self.turn("안녕, 측정 시작할게", "bench-warmup")  # 모델 로드(콜드 로드)를 측정에서 제외
+        self.new_traces()
+        results = {
+            "meta": {
+                "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "server": args.url or "mock",
+                "model": args.model,
+                "turns": args.turns,
+                "tps": args.tps,
+                "ttft_ms": args.ttft_ms,
+                "response_tokens": args.response_tokens,
+                "incremental_context": config.LLM_INCREMENTAL_CONTEXT,
+                "persona_mode": config.PERSONA_MODE,
+            },
+            "stages": self.run_sequential(args.turns),
+            "concurrency": {},
+        }
+        for sessions in args.sessions:
+            results["concurrency"][str(sessions)] = self.run_concurrent(sessions, args.session_turns)
+        if args.memory_turns:
+            results["memory"] = self.run_memory(args.memory_turns)
+        self.assistant.ltm_writer.flush(timeout=120)
+        results["meta"]["ltm_records_added"] = self.ltm_records() - records_before
+        if results["meta"]["ltm_records_added"] <= 0:
+            # LTM에 아무것도 저장되지 않았다면 측정값에 LTM 쓰기 비용이 빠져 있으므로 결과를 쓰지 않음
+            raise RuntimeError("측정 중 LTM 기억 수가 늘지 않았습니다. mem0 사실 추출/기억 갱신 응답을 확인하세요.")
+        return results
+
+    def close(self):
+        try:
+            self.assistant.end_session()
+        finally:
+            if self.server:
+                self.server.stop()
+            if not self.args.keep:
+                shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def print_results(results):
+    print(f"\n단계별 지연 (순차 {results['meta']['turns']}턴, 단위 ms)")
+    print(f"{'구간':16s}{'p50':>10s}{'p95':>10s}{'p99':>10s}{'평균':>10s}{'n':>6s}")
+    for name, stats in results["stages"].items():
+        print(f"{name:16s}{stats['p50']:10.1f}{stats['p95']:10.1f}{stats['p99']:10.1f}{stats['mean']:10.1f}{stats['n']:6d}")
+    if results["concurrency"]:
+        print("\n동시 세션 처리량")
+        print(f"{'세션':>6s}{'턴':>6s}{'턴/초':>10s}{'p50(ms)':>10s}{'p95(ms)':>10s}")
+        for row in results["concurrency"].values():
+            print(f"{row['sessions']:6d}{row['turns']:6d}{row['turns_per_sec']:10.2f}{row['p50']:10.1f}{row['p95']:10.1f}")
+    memory = results.get("memory")
+    if memory:
+        print(f"\n메모리 증가: {memory['turns']}턴 동안 {memory['growth_kb']:.1f}KB "
+              f"(100턴당 {memory['kb_per_100_turns']:.1f}KB, 최대 {memory['peak_kb']:.1f}KB)")
+
+
+def print_comparison(rows, tolerance):
+    print(f"\n기준선 비교 (허용 변화 {tolerance:.0%})")
+    for path, base_value, value, change, regressed in rows:
+        mark = "저하" if regressed else ""
+        print(f"  {path:40s}{base_value:12.2f} -> {value:12.2f}  {change:+7.1%}  {mark}")
+    regressions = sum(1 for row in rows if row[4])
+    print(f"저하된 지표: {regressions}개" if regressions else "저하된 지표 없음")
+    return regressions
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="어시스턴트 종단 간 성능 측정 (Ollama 대역 서버 사용)")
+    parser.add_argument("--url", default=None, help="대역 서버 대신 사용할 Ollama 서버 주소 (예: http://127.0.0.1:11434)")
+    parser.add_argument("--model", default=config.DEFAULT_MODEL, help=f"메인 LLM 모델 (기본값: {config.DEFAULT_MODEL})")
+    parser.add_argument("--turns", type=int, default=30, help="순차 측정 턴 수 (기본값: 30)")
+    parser.add_argument("--sessions", type=int, nargs="*", default=[1, 2, 4], help="동시 세션 수 목록 (기본값: 1 2 4)")
+    parser.add_argument("--session-turns", type=int, default=5, help="동시 측정 시 세션당 턴 수 (기본값: 5)")
+    parser.add_argument("--memory-turns", type=int, default=50, help="메모리 증가 측정 턴 수 (0이면 생략, 기본값: 50)")
+    parser.add_argument("--save-baseline", default=None, help="결과를 기준선 JSON으로 저장할 경로")
+    parser.add_argument("--baseline", default=None, help="비교할 기준선 JSON 경로")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="기준선 대비 허용 변화율 (기본값: 0.10)")
+    parser.add_argument("--keep", action="store_true", help="측정용 임시 폴더(추적/LTM 데이터)를 지우지 않음")
+    add_mock_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    bench = Bench(args)
+    try:
+        results = bench.run()
+    finally:
+        bench.close()
+    print_results(results)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n기준선 저장: {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if print_comparison(compare(results, baseline, args.tolerance), args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
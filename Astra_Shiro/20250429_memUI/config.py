@@ -9,6 +9,8 @@ OLLAMA_PORT = 11434  # 기본 Ollama API 포트
 DEFAULT_MODEL = "gemma3:27b-it-qat"  # 기본 LLM 모델 이름
 TEMPERATURE = 0.8  # 생성 온도 (0.0-1.0)
 NUM_GPU = 99  # 사용할 GPU 수 (99 = 모든 사용 가능한 GPU)
+LLM_INCREMENTAL_CONTEXT = True  # 응답의 context를 다음 턴에 넘겨 새 입력과 바뀐 장기 기억만 전송 (llm_context.py)
+LLM_CONTEXT_MAX_TOKENS = 6144  # context가 이 토큰 수를 넘으면 버리고 전체 프롬프트로 다시 시작 (모델 num_ctx보다 작게)
 
 # 음성-텍스트 변환 설정
 STT_MODEL = "base"  # STT 모델 크기: "tiny", "base", "small", "medium", "large"
@@ -25,6 +27,11 @@ EARLY_TRANSCRIPTION_SILENCE = 300  # 이 시간(ms) 이후의 침묵에서 변
 SHOW_SPINNER = True  # 처리 중 스피너 표시
 PRINT_TRANSCRIPTION_TIME = True  # 변환 소요 시간 출력
 DEBUG_MODE = False  # 더 자세한 로깅을 위한 디버그 모드 활성화
+UI_STREAM_FPS = 30  # 스트리밍 응답을 대화 창에 반영하는 초당 횟수 (청크를 모아 프레임 단위로 삽입)
+UI_EVENT_IDLE_INTERVAL_MS = 200  # 처리할 UI 이벤트가 없을 때 이벤트 버스를 확인하는 최대 간격 (ms)
+CONVERSATION_VIEW_MAX_MESSAGES = 200  # 대화 창에 남겨 둘 최근 메시지 수 (나머지는 저장소에 보관)
+CONVERSATION_PAGE_SIZE = 50  # 대화 창을 맨 위로 스크롤했을 때 저장소에서 한 번에 불러올 메시지 수
+CONVERSATION_STORE_DIR = "./conversation_logs"  # 대화 내역 저장소(JSONL) 폴더. 실행마다 새 파일 생성
 
 # 네트워크 설정
 REQUEST_TIMEOUT = 10  # API 요청 제한 시간(초)
@@ -42,6 +49,33 @@ LOG_FILE_LLM = "llm.log"  # LLM 처리 로그 파일
 LOG_FILE_MEMORY = "memory.log"  # 메모리 관련 로그 파일
 LOG_MAX_SIZE = 10 * 1024 * 1024  # 각 로그 파일 최대 크기 (10MB)
 LOG_BACKUP_COUNT = 5  # 보관할 로그 파일 수
+LOG_PROMPT_MAX_CHARS = 2000  # DEBUG 로그에 남길 프롬프트/컨텍스트 최대 글자 수 (None이면 전체 기록)
+
+# 성능 지표 설정 (metrics.py, AstraUI 성능 탭)
+METRICS_WINDOW = 300  # 지표마다 보관할 최근 관측 수 (백분위 계산 범위)
+PERF_REFRESH_MS = 1000  # 성능 탭 갱신 주기 (ms, 탭이 보일 때만 다시 그림)
+PERF_CHART_POINTS = 120  # 성능 탭 차트에 그릴 최근 관측 수
+PERF_LAG_PROBE_MS = 500  # Tk 이벤트 루프 지연 측정 주기 (ms)
+METRICS_LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000]  # 모델별 서버 시간 히스토그램 구간 경계 (ms)
+LLM_COLD_LOAD_MS = 1000  # load_duration이 이 값(ms) 이상이면 모델 콜드 로드로 집계
+
+# 지표 엔드포인트 설정 (metrics_server.py, UI 없이 실행할 때 Prometheus로 수집)
+METRICS_SERVER_ENABLED = False  # True면 OllamaChatTest.py 실행 시 /metrics 엔드포인트 시작 (--metrics 옵션과 같음)
+METRICS_SERVER_HOST = "127.0.0.1"  # 바인딩 주소 (다른 장비에서 수집하려면 "0.0.0.0")
+METRICS_SERVER_PORT = 9464  # 포트
+METRICS_HEALTH_TIMEOUT = 2  # 수집 시 Ollama 서버 상태 확인 타임아웃 (초)
+
+# 턴 추적 설정 (tracing.py)
+TRACE_ENABLED = True  # 턴마다 단계별 구간(STT/검색/프롬프트/LLM/저장)을 추적 파일에 기록
+TRACE_FILE = "./logs/traces.jsonl"  # 추적 기록 파일 (python tracing.py로 폭포도/백분위 요약 확인)
+
+# GUI 로그 창 설정 (AstraUI)
+LOG_CONSOLE_BUFFER_SIZE = 5000  # 로그 창에 아직 반영되지 않은 메시지 버퍼 크기 (넘치면 오래된 것부터 버림)
+LOG_CONSOLE_MAX_LINES = 3000  # 로그 창에 남겨 둘 최대 줄 수
+LOG_CONSOLE_BATCH_SIZE = 500  # 한 번에 로그 창에 추가할 최대 메시지 수
+LOG_CONSOLE_MAX_CHARS = 2000  # 로그 창에 표시할 메시지 한 건의 최대 글자 수 (파일 로그는 그대로)
+LOG_CONSOLE_MIN_INTERVAL_MS = 100  # 로그가 계속 쌓일 때의 로그 창 갱신 주기 (ms)
+LOG_CONSOLE_MAX_INTERVAL_MS = 1000  # 로그가 없을 때 늘어나는 갱신 주기의 상한 (ms)
 
 # 메모리 Ollama 서버 설정 
 MEM0_OLLAMA_HOST = "localhost" 
@@ -59,4 +93,67 @@ CHROMA_PATH = "./chroma_db"
 CHROMA_COLLECTION = "voice_assistant_memory_chroma" 
 
 # 메모리 사용자 ID 
-MEMORY_USER_ID = "default_user"
\ No newline at end of file
+MEMORY_USER_ID = "default_user"  # 시청자를 알 수 없을 때 사용하는 기본 파티션
+MEMORY_CHANNEL_ID = "default_channel"  # 채널을 지정하지 않았을 때의 기본 채널 (파티션 ID: "채널:시청자")
+MEMORY_GLOBAL_PARTITION = "global"  # 모든 시청자의 검색에 포함되는 공용 지식 파티션
+
+# LTM 중복 압축 설정
+LTM_COMPACTION_ENABLED = True  # 백그라운드 중복 압축 작업 사용 여부
+LTM_COMPACTION_INTERVAL = 600  # 압축 주기(초)
+LTM_COMPACTION_THRESHOLD = 0.95  # 이 코사인 유사도 이상이면 근접 중복으로 간주
+LTM_COMPACTION_NEIGHBOURS = 5  # 새 기억마다 비교할 최근접 이웃 수
+LTM_COMPACTION_STATE_FILE = "./chroma_db/compaction_state.json"  # 증분 처리 워터마크 저장 파일
+
+# LTM 계층(hot/cold) 설정
+LTM_COLD_SUFFIX = "_cold"  # cold 아카이브 컬렉션 이름 접미사 (월별 샤드는 뒤에 _YYYYMM이 붙음)
+LTM_HOT_CAPACITY = 2000  # hot 계층 최대 기억 수 (초과분은 cold로 강등)
+LTM_HOT_MIN_SCORE = 0.6  # hot 최고 관련도(코사인 유사도)가 이 값 미만이면 cold 계층도 검색
+LTM_RECENCY_HALF_LIFE = 7 * 24 * 3600  # 최근성 감쇠 반감기(초)
+LTM_TIER_MAINTENANCE_INTERVAL = 300  # 조회 기록 반영 및 강등 주기(초)
+LTM_SHARD_SEARCH_WORKERS = 4  # cold 샤드 병렬 검색 스레드 수
+LTM_SHARD_RETENTION_MONTHS = 0  # 이 개월 수보다 오래된 cold 샤드는 통째로 삭제 (0 = 무제한 보존)
+
+# LTM 세션 요약 인덱스 설정
+LTM_HIERARCHICAL_SEARCH = True  # 세션 요약으로 관련 세션을 먼저 고른 뒤 그 세션의 턴만 검색
+LTM_SUMMARY_SUFFIX = "_summaries"  # 세션 요약 컬렉션 이름 접미사
+LTM_SUMMARY_EVERY_N_TURNS = 20  # 이 턴 수마다 세션 요약 생성 (세션 종료 시 남은 턴도 요약)
+LTM_SUMMARY_TOP_SESSIONS = 3  # 검색 시 선택할 관련 세션 수
+LTM_CONTEXT_TURN_MAX_CHARS = 300  # 프롬프트에 넣을 장기 기억 한 건의 최대 글자 수
+LTM_STM_DEDUP_ENABLED = True  # STM에 이미 있는 턴과 겹치는 LTM 검색 결과를 프롬프트에서 제외할지 여부
+LTM_STM_DEDUP_THRESHOLD = 0.8  # 문자 3-gram 겹침 비율이 이 값 이상이면 같은 내용으로 판단
+LTM_DEDUP_OVERFETCH = 3  # 제외된 자리를 채우기 위해 검색할 결과 수 배수 (limit x 배수)
+
+# LTM 목록 조회 설정
+LTM_BROWSER_PAGE_SIZE = 200  # 장기 기억 목록 창에서 한 번에 불러올 기억 수
+
+# LTM 스냅샷 설정 (ltm_snapshot.py)
+LTM_SNAPSHOT_DIR = "./ltm_snapshots"  # 스냅샷 파일 기본 저장 폴더
+LTM_SNAPSHOT_CHUNK_SIZE = 1000  # 스냅샷 청크당 기억 수 (내보내기/가져오기 시 메모리 사용량 상한)
+
+# 과거 대화 일괄 적재 설정 (ltm_ingest.py)
+LTM_INGEST_BATCH_SIZE = 64  # 임베딩 요청 한 번에 보낼 턴 수
+LTM_INGEST_WORKERS = 4  # 임베딩 서버 동시 연결 수
+LTM_INGEST_STATE_FILE = "./chroma_db/ingest_state.json"  # 파일별 적재 진행 상황(체크포인트)
+
+# 임베딩 마이크로 배치 설정 (embedding_client.EmbeddingBatcher)
+EMBED_BATCH_ENABLED = True  # 동시에 들어온 임베딩 요청을 모아 /api/embed 한 번으로 보낼지 여부
+EMBED_BATCH_MAX_SIZE = 32  # 한 번에 보낼 최대 텍스트 수
+EMBED_BATCH_MAX_WAIT_MS = 5  # 첫 요청 이후 다른 요청을 기다리는 최대 시간 (ms)
+EMBED_BATCH_MAX_CONCURRENT = 2  # 동시에 보낼 수 있는 배치 요청 수
+EMBED_ENDPOINT_METADATA_KEY = "astra_embed_endpoint"  # LTM 컬렉션 메타데이터에 임베딩 엔드포인트(embed/embeddings)를 기록하는 키
+
+# STM / LTM 승격 설정
+STM_MAX_TURNS = 10  # 단기 기억에 보관할 최근 대화 턴 수
+LTM_WRITE_POLICY = "evict"  # "evict": STM에서 밀려날 때/세션 종료 시 LTM 저장, "immediate": 매 턴 즉시 저장
+LTM_PROMOTION_MERGE_SPAN = False  # True면 한 번에 밀려난 연속 턴들을 하나의 기억으로 합쳐 저장
+STM_TOKEN_BUDGET = 1500  # 단기 기억(최근 턴) 추정 토큰 예산. 넘으면 오래된 턴부터 밀려남
+STM_ROLLING_SUMMARY = True  # 밀려난 턴을 메모리 LLM으로 요약해 프롬프트의 '이전 대화 요약'에 유지할지 여부
+
+# STM 저널 설정 (재시작 후 단기 기억 복원)
+STM_JOURNAL_ENABLED = True  # STM 변경 내용을 추가 전용 저널 파일에 기록할지 여부
+STM_JOURNAL_FILE = "./stm_data/stm_journal.jsonl"  # 저널 파일 경로
+STM_JOURNAL_FSYNC_INTERVAL = 0.5  # 저널 기록을 모아서 디스크에 동기화(fsync)하는 주기 (초)
+STM_JOURNAL_COMPACT_EVERY = 500  # 기록이 이 개수를 넘으면 현재 상태 스냅샷으로 저널을 압축
+
+# 페르소나 설정 (persona_build.py)
+PERSONA_MODE = "full"  # "full": 전체 페르소나 (기본값), "compact": 압축 페르소나 (선택 사항, 비어 있으면 전체로 대체)
@@ -0,0 +1,55 @@
+# context_dedup.py
+# 프롬프트 조립 전 STM/LTM 중복 제거
+# 장기 기억 검색 결과 중 이미 단기 기억(STM)에 들어 있는 턴과 겹치는 기억, 서로 거의 같은 기억을 걸러냅니다.
+
+import re
+import zlib
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(text, n=3):
+    """
+    텍스트의 지문: 공백을 정규화한 문자 n-gram 해시 집합.
+    임베딩 호출 없이 겹침 정도를 빠르게 비교하기 위해 사용합니다.
+    """
+    normalized = _WHITESPACE.sub(" ", (text or "").strip().lower())
+    if len(normalized) <= n:
+        return frozenset([zlib.crc32(normalized.encode("utf-8"))]) if normalized else frozenset()
+    return frozenset(zlib.crc32(normalized[i:i + n].encode("utf-8")) for i in range(len(normalized) - n + 1))
+
+
+def overlap(fp_a, fp_b):
+    """
+    두 지문의 겹침 비율 (작은 쪽 기준 포함도, 0.0 ~ 1.0).
+    여러 턴을 합쳐 저장한 기억 안에 STM 턴 하나가 통째로 들어 있는 경우도 1.0에 가깝게 나옵니다.
+    """
+    if not fp_a or not fp_b:
+        return 0.0
+    return len(fp_a & fp_b) / min(len(fp_a), len(fp_b))
+
+
+def dedup_memories(memories, stm_texts, limit, threshold):
+    """
+    LTM 검색 결과에서 STM과 겹치거나 앞선 결과와 겹치는 기억을 제외하고 관련도 순으로 최대 limit개를 반환합니다.
+    memories는 관련도 내림차순이어야 하며, 제외된 자리는 다음 순위의 서로 다른 기억으로 채워집니다.
+
+    Returns:
+        tuple: (남긴 기억 목록, STM과 겹쳐 제외된 수, LTM끼리 겹쳐 제외된 수)
+    """
+    stm_fps = [fingerprint(text) for text in stm_texts]
+    kept, kept_fps = [], []
+    dropped_stm = dropped_dup = 0
+    for memory in memories:
+        if len(kept) >= limit:
+            break
+        fp = fingerprint(memory.get('memory', '') if isinstance(memory, dict) else str(memory))
+        if any(overlap(fp, stm_fp) >= threshold for stm_fp in stm_fps):
+            dropped_stm += 1
+            continue
+        if any(overlap(fp, other) >= threshold for other in kept_fps):
+            dropped_dup += 1
+            continue
+        kept.append(memory)
+        kept_fps.append(fp)
+    return kept, dropped_stm, dropped_dup
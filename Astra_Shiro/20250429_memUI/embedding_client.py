@@ -0,0 +1,220 @@
+# embedding_client.py
+# Ollama 임베딩 API 클라이언트
+# /api/embed는 input에 텍스트 리스트를 받으므로 여러 텍스트를 한 번의 HTTP 요청으로 임베딩할 수 있습니다.
+# EmbeddingBatcher는 여러 스레드에서 동시에 들어온 임베딩 요청을 몇 ms 동안 모아 한 번의 요청으로 보냅니다.
+
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+
+import config
+from metrics import Histogram
+
+ltm_logger = logging.getLogger('ltm')
+
+
+class OllamaEmbeddingClient:
+    """
+    Ollama 임베딩 서버에 여러 텍스트를 한 번에 보내는 배치 임베딩 클라이언트.
+
+    스레드마다 별도의 requests.Session(연결 재사용)을 사용하므로 여러 스레드에서 동시에 호출할 수 있습니다.
+    /api/embed를 지원하지 않는 이전 Ollama 버전이거나 legacy_api=True면 /api/embeddings를 텍스트마다 호출합니다.
+    """
+
+    def __init__(self, base_url=config.MEM0_OLLAMA_BASE_URL, model=config.MEM0_EMBEDDING_MODEL, timeout=config.REQUEST_TIMEOUT * 6,
+                 legacy_api=False):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self._local = threading.local()
+        self._legacy_api = legacy_api
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    def embed_batch(self, texts):
+        """텍스트 리스트를 임베딩하여 같은 순서의 벡터 리스트를 반환합니다."""
+        if not texts:
+            return []
+        if not self._legacy_api:
+            response = self._session().post(
+                f"{self.base_url}/api/embed",
+                json={"model": self.model, "input": list(texts)},
+                timeout=self.timeout
+            )
+            if response.status_code != 404:
+                response.raise_for_status()
+                embeddings = response.json().get('embeddings') or []
+                if len(embeddings) != len(texts):
+                    raise RuntimeError(f"임베딩 개수가 입력과 다릅니다. (입력 {len(texts)}개, 결과 {len(embeddings)}개)")
+                return embeddings
+            ltm_logger.warning("/api/embed를 지원하지 않는 Ollama 버전입니다. /api/embeddings로 하나씩 임베딩합니다.")
+            self._legacy_api = True
+        return [self._embed_legacy(text) for text in texts]
+
+    def _embed_legacy(self, text):
+        response = self._session().post(
+            f"{self.base_url}/api/embeddings",
+            json={"model": self.model, "prompt": text},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()['embedding']
+
+
+def ltm_store_has_records(client):
+    """hot 컬렉션이나 cold 샤드 중 하나라도 기억이 있으면 True (모두 샤드로 강등된 저장소도 기존 저장소로 봄)"""
+    cold_prefix = config.CHROMA_COLLECTION + config.LTM_COLD_SUFFIX
+    for col in client.list_collections():
+        name = getattr(col, 'name', col)
+        if name == config.CHROMA_COLLECTION or name.startswith(cold_prefix):
+            if client.get_collection(name=name, embedding_function=None).count() > 0:
+                return True
+    return False
+
+
+def select_embed_endpoint(collection, client):
+    """
+    LTM hot 컬렉션 메타데이터에 기록된 임베딩 엔드포인트("embed" 또는 "embeddings")를 반환합니다.
+
+    /api/embed는 정규화된 벡터를, mem0 기본 임베더가 쓰는 /api/embeddings는 정규화되지 않은 벡터를 돌려주므로
+    한 저장소 안에서 섞으면 거리 계산이 어긋납니다. 기록이 없으면 기존 기억이 있는 저장소(hot + cold 샤드)는
+    "embeddings", 새 저장소는 "embed"로 정해 컬렉션 메타데이터에 남깁니다.
+    """
+    metadata = dict(collection.metadata or {})
+    endpoint = metadata.get(config.EMBED_ENDPOINT_METADATA_KEY)
+    if endpoint in ("embed", "embeddings"):
+        return endpoint
+    has_records = ltm_store_has_records(client)
+    endpoint = "embeddings" if has_records else "embed"
+    # 거리 함수(hnsw:*)는 생성 후 바꿀 수 없으므로 다시 넘기지 않음
+    metadata = {key: value for key, value in metadata.items() if not key.startswith("hnsw:")}
+    metadata[config.EMBED_ENDPOINT_METADATA_KEY] = endpoint
+    try:
+        collection.modify(metadata=metadata)
+    except Exception as e:
+        ltm_logger.warning(f"임베딩 엔드포인트를 컬렉션 메타데이터에 기록하지 못했습니다: {e}")
+    ltm_logger.info(f"LTM 임베딩 엔드포인트: /api/{endpoint} ({'기존 기억이 있는 저장소' if has_records else '새 저장소'})")
+    return endpoint
+
+
+class EmbeddingBatcher:
+    """
+    요청 간 임베딩 마이크로 배처.
+
+    - submit(text)는 즉시 Future를 반환하고, 디스패처 스레드가 첫 요청 이후 max_wait초 동안
+      (또는 max_batch개가 모일 때까지) 들어온 요청을 묶어 client.embed_batch()를 한 번만 호출합니다.
+    - 묶인 요청은 max_concurrent개의 연결로 동시에 전송되며, 결과는 각 요청의 Future로 나뉘어 전달됩니다.
+    - 배치 크기와 요청별 대기 시간(ms)을 히스토그램으로 기록합니다. (stats())
+
+    mem0 임베더와 같은 embed(text, memory_action) 인터페이스를 제공하므로 memory.embedding_model을 대체할 수 있고,
+    embed_batch(texts)도 제공하므로 ltm_ingest의 TranscriptIngestor에도 그대로 사용할 수 있습니다.
+    """
+
+    def __init__(self, client, max_batch=config.EMBED_BATCH_MAX_SIZE, max_wait=config.EMBED_BATCH_MAX_WAIT_MS / 1000,
+                 max_concurrent=config.EMBED_BATCH_MAX_CONCURRENT, fallback=None):
+        self.client = client
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.fallback = fallback  # 원래 mem0 임베더 (그 외 속성 위임용)
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+        self.wait_ms = Histogram([0.5, 1, 2, 5, 10, 20, 50, 100])
+        self._queue = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="EmbedBatchSend")
+        self._closed = False
+        self._thread = threading.Thread(target=self._dispatch_loop, daemon=True, name="EmbeddingBatcher")
+        self._thread.start()
+
+    def __getattr__(self, name):
+        # mem0 임베더 호환 (config 등)
+        fallback = self.__dict__.get('fallback')
+        if fallback is None:
+            raise AttributeError(name)
+        return getattr(fallback, name)
+
+    # --- 요청 ---
+    def submit(self, text):
+        """임베딩 요청을 큐에 넣고 Future를 반환합니다."""
+        if self._closed:
+            raise RuntimeError("EmbeddingBatcher가 이미 종료되었습니다.")
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def embed(self, text, memory_action=None):
+        """mem0 EmbeddingBase 호환 인터페이스 (memory_action은 사용하지 않음)"""
+        return self.submit(text).result()
+
+    def embed_batch(self, texts):
+        futures = [self.submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    # --- 디스패치 ---
+    def _dispatch_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)  # 모은 배치를 보낸 뒤 종료
+                    break
+                batch.append(item)
+            self._executor.submit(self._send, batch)
+
+    def _send(self, batch):
+        sent_at = time.perf_counter()
+        self.batch_sizes.observe(len(batch))
+        for _, _, queued_at in batch:
+            self.wait_ms.observe((sent_at - queued_at) * 1000)
+        try:
+            embeddings = self.client.embed_batch([text for text, _, _ in batch])
+        except Exception as e:
+            ltm_logger.error(f"배치 임베딩 요청 실패 ({len(batch)}개): {e}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for (_, future, _), embedding in zip(batch, embeddings):
+            future.set_result(embedding)
+
+    def pending(self):
+        """아직 배치로 묶이지 않은 대기 요청 수"""
+        return self._queue.qsize()
+
+    def stats(self):
+        """배치 크기/대기 시간 히스토그램 요약"""
+        return {"batch_size": self.batch_sizes.snapshot(), "wait_ms": self.wait_ms.snapshot()}
+
+    def format_stats(self):
+        stats = self.stats()
+        sizes, waits = stats["batch_size"], stats["wait_ms"]
+        requests_count = waits["count"]
+        return (f"임베딩 배치 {sizes['count']}회, 요청 {requests_count}개 "
+                f"(평균 배치 크기 {sizes['mean']:.1f}, 평균 대기 {waits['mean']:.2f}ms, "
+                f"HTTP 요청 {requests_count - sizes['count']}회 절약)")
+
+    def close(self):
+        """남은 요청을 보낸 뒤 디스패처를 종료합니다."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        self._executor.shutdown(wait=True)
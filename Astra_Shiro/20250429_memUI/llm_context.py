@@ -0,0 +1,105 @@
+# llm_context.py
+# 메인 LLM 증분 대화 컨텍스트
+# /api/generate의 마지막 스트림 청크가 돌려주는 context(토큰 배열)를 다음 턴에 그대로 넘겨,
+# 정체성/최근 대화 프롬프트를 매 턴 다시 토큰화하지 않고 새 사용자 입력과 바뀐 장기 기억만 전송합니다.
+
+import logging
+import threading
+
+import config
+from system_prompts import MAIN_PROMPT_TEMPLATE, INCREMENTAL_PROMPT_TEMPLATE, INCREMENTAL_LTM_BLOCK
+
+llm_logger = logging.getLogger('llm')
+
+
+class ConversationContext:
+    """
+    서버가 반환한 context 토큰 배열을 턴 사이에 유지하는 증분 대화 상태.
+
+    - prepare()는 context가 없으면 전체 프롬프트(MAIN_PROMPT_TEMPLATE)를, 있으면 증분 프롬프트
+      (직전 턴과 달라진 장기 기억 블록 + 새 사용자 입력)를 만들어 (프롬프트, context, 세대)를 반환합니다.
+    - 응답의 마지막 청크를 받으면 update()로 새 context를 저장합니다.
+    - 전체 프롬프트 이후 context에 새로 쌓이는 대화는 STM 예산(stm_budget)만큼으로 제한합니다. 전체 프롬프트를 보낸 턴의
+      context 길이에 STM 예산을 더한 값(최대 config.LLM_CONTEXT_MAX_TOKENS)을 넘으면 context를 버리고
+      다음 턴에 전체 프롬프트(STM 요약 포함)로 다시 시작합니다. STM에서 밀려난 턴은 이 재시작 때 context에서 빠집니다.
+      (밀려날 때마다 버리면 STM이 가득 찬 뒤에는 매 턴 전체 프롬프트가 되므로 밀려남만으로는 버리지 않음)
+    - 모델이 바뀌거나 STM이 초기화되면 버립니다.
+    - 요청 도중 invalidate()가 호출되면 세대가 바뀌므로, 그 요청의 context는 update()에서 무시됩니다.
+    """
+
+    def __init__(self, enabled=config.LLM_INCREMENTAL_CONTEXT, max_tokens=config.LLM_CONTEXT_MAX_TOKENS,
+                 stm_budget=config.STM_TOKEN_BUDGET):
+        self.enabled = enabled
+        self.max_tokens = max_tokens
+        self.stm_budget = stm_budget
+        self.token_limit = max_tokens  # 현재 context의 한도 (전체 프롬프트 턴마다 다시 정함)
+        self.tokens = None
+        self.model = None
+        self.turns = 0
+        self._last_ltm_context = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self, reason):
+        """보관 중인 context를 버립니다. 다음 턴은 전체 프롬프트로 전송됩니다."""
+        with self._lock:
+            self._generation += 1
+            had_context = self.tokens is not None
+            self.tokens = None
+            self.model = None
+            self.turns = 0
+            self._last_ltm_context = None
+        if had_context:
+            llm_logger.info(f"증분 대화 컨텍스트 초기화: {reason}")
+
+    def prepare(self, model, identity_context, stm_context, ltm_context, user_input):
+        """
+        이번 턴에 보낼 프롬프트를 만듭니다.
+
+        Returns:
+            tuple: (프롬프트 문자열, 페이로드에 넣을 context 또는 None, 세대 번호)
+        """
+        if self.enabled and self.tokens is not None and self.model != model:
+            self.invalidate(f"모델 변경 ({self.model} -> {model})")
+        with self._lock:
+            generation = self._generation
+            if not self.enabled or self.tokens is None:
+                prompt = MAIN_PROMPT_TEMPLATE.format(
+                    identity_context=identity_context,
+                    short_term_memory=stm_context,
+                    long_term_memory=ltm_context,
+                    user_input=user_input
+                )
+                context = None
+            else:
+                ltm_block = ""
+                if ltm_context != self._last_ltm_context:
+                    ltm_block = INCREMENTAL_LTM_BLOCK.format(long_term_memory=ltm_context)
+                prompt = INCREMENTAL_PROMPT_TEMPLATE.format(long_term_memory_block=ltm_block, user_input=user_input)
+                context = self.tokens
+            self._last_ltm_context = ltm_context
+        return prompt, context, generation
+
+    def update(self, generation, model, tokens):
+        """마지막 스트림 청크의 context를 저장합니다. 그 사이 초기화되었거나 한도를 넘으면 버립니다."""
+        if not self.enabled:
+            return
+        if not tokens:
+            self.invalidate("서버 응답에 context가 없음")
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            if self.tokens is None:
+                # 전체 프롬프트 턴: 서버가 센 현재 길이에서 STM 예산만큼만 더 쌓이도록 한도를 정함
+                allowance = self.stm_budget if self.stm_budget is not None else self.max_tokens
+                self.token_limit = min(self.max_tokens, len(tokens) + allowance)
+            over_limit = len(tokens) > self.token_limit
+            if not over_limit:
+                self.tokens = tokens
+                self.model = model
+                self.turns += 1
+        if over_limit:
+            self.invalidate(f"context 길이 {len(tokens)}토큰 > 한도 {self.token_limit}토큰")
+            return
+        llm_logger.debug("증분 대화 컨텍스트 갱신: %d토큰, %d턴째", len(tokens), self.turns)
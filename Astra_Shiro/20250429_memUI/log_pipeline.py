@@ -0,0 +1,109 @@
+# log_pipeline.py
+# 큐 기반 로깅 파이프라인
+# 로그를 남기는 스레드는 레코드를 큐에 넣기만 하고, 파일/콘솔/GUI 핸들러는 하나의 기록 스레드(QueueListener)에서 실행됩니다.
+# 턴 처리 스레드가 디스크 쓰기나 GUI 핸들러 때문에 멈추지 않게 하고, 스레드별로 로깅에 쓴 시간을 잴 수 있게 합니다.
+
+import sys
+import time
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+import config
+
+_local = threading.local()
+_setup_lock = threading.Lock()
+_queue = None
+_listener = None
+_dispatcher = None
+
+
+class _DispatchHandler(logging.Handler):
+    """기록 스레드에서 등록된 핸들러들에 레코드를 나눠 주는 핸들러 (실행 중에도 핸들러 추가/제거 가능)"""
+
+    def __init__(self):
+        super().__init__()
+        self.handlers = ()
+
+    def add(self, handler):
+        with _setup_lock:
+            if handler not in self.handlers:
+                self.handlers = self.handlers + (handler,)
+
+    def remove(self, handler):
+        with _setup_lock:
+            self.handlers = tuple(h for h in self.handlers if h is not handler)
+
+    def emit(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+class _TimedQueueHandler(QueueHandler):
+    """큐에 넣는 데 걸린 시간(메시지 병합 포함)을 스레드별로 누적하는 QueueHandler"""
+
+    def handle(self, record):
+        started = time.perf_counter()
+        try:
+            return super().handle(record)
+        finally:
+            _local.spent = getattr(_local, "spent", 0.0) + (time.perf_counter() - started)
+
+
+def setup(level=config.LOG_LEVEL, fmt=config.LOG_FORMAT):
+    """
+    루트 로거에 큐 핸들러를 달고 기록 스레드를 시작합니다. 여러 번 호출해도 한 번만 설정됩니다.
+    콘솔(stderr) 출력도 기록 스레드에서 처리합니다. (기존 logging.basicConfig 대체)
+    """
+    global _queue, _listener, _dispatcher
+    with _setup_lock:
+        if _listener is not None:
+            return
+        _queue = queue.SimpleQueue()
+        _dispatcher = _DispatchHandler()
+        _listener = QueueListener(_queue, _dispatcher)
+        root = logging.getLogger()
+        root.setLevel(getattr(logging, level, logging.INFO) if isinstance(level, str) else level)
+        root.addHandler(_TimedQueueHandler(_queue))
+        _listener.start()
+    console = logging.StreamHandler(sys.stderr)
+    console.setFormatter(logging.Formatter(fmt))
+    add_handler(console)
+    atexit.register(stop)
+
+
+def add_handler(handler):
+    """핸들러를 기록 스레드에서 실행되도록 등록합니다. (로거에 직접 addHandler하는 대신 사용)"""
+    setup()
+    _dispatcher.add(handler)
+
+
+def remove_handler(handler):
+    if _dispatcher is not None:
+        _dispatcher.remove(handler)
+
+
+def stop():
+    """큐에 남은 로그를 모두 기록하고 기록 스레드를 종료합니다."""
+    global _listener
+    with _setup_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def thread_time_ms():
+    """현재 스레드가 지금까지 로그를 큐에 넣는 데 쓴 누적 시간 (ms)"""
+    return getattr(_local, "spent", 0.0) * 1000
+
+
+def clip(text, limit=None):
+    """긴 프롬프트/컨텍스트를 로그에 남길 때 config.LOG_PROMPT_MAX_CHARS 글자로 자릅니다. (None이면 자르지 않음)"""
+    limit = config.LOG_PROMPT_MAX_CHARS if limit is None else limit
+    text = str(text)
+    if limit is None or len(text) <= limit:
+        return text
+    return f"{text[:limit]} ... ({len(text) - limit}자 생략)"
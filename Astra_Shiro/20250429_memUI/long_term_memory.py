@@ -0,0 +1,500 @@
+# long_term_memory.py
+# 계층형(hot/cold) 장기 기억(LTM)
+# 최근/자주 조회되는 기억은 작은 hot 컬렉션에, 나머지는 월 단위로 샤딩된 cold 아카이브 컬렉션에 보관합니다.
+
+import math
+import time
+import heapq
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from ltm_utils import get_chroma_collection, cosine_similarity, parse_timestamp, iter_collection, build_where
+from ltm_summary import SessionSummaryIndex
+from ltm_compaction import LTMCompactor
+
+ltm_logger = logging.getLogger('ltm')
+
+
+def shard_month(timestamp=None):
+    """epoch 초를 샤드 키(YYYYMM)로 변환합니다."""
+    return datetime.fromtimestamp(timestamp or time.time()).strftime("%Y%m")
+
+
+class LTMPager:
+    """
+    LTM 전체 목록을 저장 시각(created_ts) 순서로 페이지 단위로 훑는 커서.
+
+    처음 페이지를 읽을 때 컬렉션마다 (created_ts, id)만 배치 단위로 훑어 시간순으로 정렬한 뒤,
+    hot 컬렉션과 cold 샤드들의 목록을 k-way 병합하여 전체 시간순 인덱스를 만듭니다. (임베딩은 읽지 않음)
+    이후 페이지는 인덱스의 다음 id들만 컬렉션별로 조회하므로, 적재/스냅샷 가져오기/승격으로 hot 끝에 추가된
+    오래된 기억도 저장 시각에 맞는 위치에 나옵니다. 시각 정보가 없는 이전 기억은 가장 오래된 것으로 취급합니다.
+
+    읽기 전용 샤드에서 hot으로 승격된 기억은 양쪽에 같은 id로 남아 있으므로, 한쪽(같은 시각이면 hot)만 반환합니다.
+    """
+
+    def __init__(self, collections, where=None, page_size=100, newest_first=True):
+        self.collections = list(collections)
+        self.where = where
+        self.page_size = page_size
+        self.newest_first = newest_first
+        self._order = None  # [(컬렉션 위치, id), ...] 전체 시간순 인덱스 (첫 페이지에서 생성)
+        self._position = 0
+        self.has_more = bool(self.collections)
+
+    def next_page(self):
+        """다음 페이지의 기억 목록을 반환합니다. 더 없으면 빈 리스트"""
+        if self._order is None:
+            self._order = self._build_order()
+        entries = self._order[self._position:self._position + self.page_size]
+        self._position += len(entries)
+        self.has_more = self._position < len(self._order)
+        if not entries:
+            return []
+
+        by_collection = {}
+        for index, memory_id in entries:
+            by_collection.setdefault(index, []).append(memory_id)
+        fetched = {}
+        for index, ids in by_collection.items():
+            collection = self.collections[index]
+            page = collection.get(ids=ids, include=["metadatas"])
+            for memory_id, metadata in zip(page['ids'], page['metadatas']):
+                fetched[(index, memory_id)] = self._record(collection, memory_id, metadata or {})
+        # 인덱스를 만든 뒤 삭제/강등된 기억은 건너뜀
+        return [fetched[entry] for entry in entries if entry in fetched]
+
+    def _build_order(self):
+        sign = -1 if self.newest_first else 1
+        per_collection = []
+        for index, collection in enumerate(self.collections):
+            keyed = []
+            for memory_id, metadata, _ in iter_collection(collection, where=self.where):
+                timestamp = metadata.get('created_ts') or parse_timestamp(metadata.get('created_at')) or 0
+                keyed.append((sign * timestamp, index, memory_id))
+            keyed.sort()
+            per_collection.append(keyed)
+        order = []
+        seen = set()
+        for _, index, memory_id in heapq.merge(*per_collection):
+            if memory_id not in seen:
+                seen.add(memory_id)
+                order.append((index, memory_id))
+        return order
+
+    @staticmethod
+    def _record(collection, memory_id, metadata):
+        tier = "hot" if not collection.name.startswith(config.CHROMA_COLLECTION + config.LTM_COLD_SUFFIX) else "cold"
+        return {
+            "id": memory_id,
+            "memory": metadata.get('data', ''),
+            "created_at": metadata.get('created_at'),
+            "timestamp": metadata.get('created_ts') or parse_timestamp(metadata.get('created_at')),
+            "user_id": metadata.get('user_id'),
+            "tier": tier,
+            "collection": collection.name,
+            "metadata": metadata,
+        }
+
+
+class TieredLongTermMemory:
+    """
+    mem0 Memory를 감싸 hot/cold 2계층 검색을 제공하는 LTM.
+
+    - 새 기억은 mem0을 통해 hot 컬렉션(config.CHROMA_COLLECTION)에 저장됩니다.
+    - 검색은 hot 계층을 먼저 조회하고, 최고 관련도가 config.LTM_HOT_MIN_SCORE 미만일 때만 cold 계층을 조회합니다.
+    - 조회된 기억의 access_count / last_access_at을 기록하고, 백그라운드 유지보수 작업이
+      접근 횟수와 최근성 감쇠 점수(heat)가 낮은 기억을 cold로 강등합니다. cold에서 조회된 기억은 hot으로 승격됩니다.
+    - cold 계층은 강등된 달을 기준으로 월별 컬렉션(샤드)에 나뉘어 저장됩니다. 이번 달 샤드만 쓰기가 가능하고
+      지난 달 샤드는 읽기 전용(sealed)이며, cold 검색은 모든 샤드를 스레드 풀에서 병렬로 조회해 top-k를 병합합니다.
+      보존 기간(config.LTM_SHARD_RETENTION_MONTHS)이 지난 샤드는 통째로 삭제됩니다.
+    - config.LTM_HIERARCHICAL_SEARCH가 켜져 있으면 세션 요약 인덱스(summaries)로 관련 세션을 먼저 고르고,
+      그 세션들의 턴 안에서만 검색합니다. (결과가 없으면 전체 검색으로 되돌아감)
+
+    mem0 Memory의 나머지 속성(vector_store, embedding_model 등)은 그대로 위임되므로 기존 코드와 호환됩니다.
+    """
+
+    def __init__(self, memory):
+        self.memory = memory
+        self.client = memory.vector_store.client
+        self.hot = get_chroma_collection(memory)
+        self.cold_prefix = config.CHROMA_COLLECTION + config.LTM_COLD_SUFFIX
+        self.summaries = SessionSummaryIndex(memory)
+        self.shard_compactor = LTMCompactor(memory)
+        self._shards = {}  # 샤드 이름 -> ChromaDB 컬렉션
+        self._shard_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=config.LTM_SHARD_SEARCH_WORKERS, thread_name_prefix="LTMShardSearch")
+        self._pending_access = {}  # id -> (컬렉션 이름, 조회 횟수, 마지막 조회 시각)
+        self._access_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.refresh_shards()
+
+    def __getattr__(self, name):
+        # mem0 Memory 호환 (vector_store, embedding_model, get_all 등)
+        return getattr(self.memory, name)
+
+    # --- 저장 ---
+    def add(self, *args, **kwargs):
+        """mem0을 통해 hot 계층에 기억을 저장합니다."""
+        return self.memory.add(*args, **kwargs)
+
+    # --- 샤드 관리 ---
+    def refresh_shards(self):
+        """Vector Store에서 cold 샤드 컬렉션 목록을 다시 읽어옵니다."""
+        shards = {}
+        for col in self.client.list_collections():
+            name = getattr(col, 'name', col)
+            if name.startswith(self.cold_prefix):
+                shards[name] = self._shards.get(name) or self.client.get_collection(name=name, embedding_function=None)
+        with self._shard_lock:
+            self._shards = shards
+        return sorted(shards, reverse=True)
+
+    def shard_name(self, month=None):
+        return f"{self.cold_prefix}_{month or shard_month()}"
+
+    def current_shard(self):
+        """이번 달 cold 샤드 (쓰기 가능한 유일한 샤드)를 반환합니다."""
+        name = self.shard_name()
+        with self._shard_lock:
+            shard = self._shards.get(name)
+            if shard is None:
+                shard = self.client.get_or_create_collection(name=name, embedding_function=None)
+                self._shards[name] = shard
+                ltm_logger.info(f"새 LTM cold 샤드 생성: {name}")
+        return shard
+
+    def shard_collections(self):
+        """cold 샤드 목록 (최신 샤드부터)"""
+        with self._shard_lock:
+            return [self._shards[name] for name in sorted(self._shards, reverse=True)]
+
+    def is_sealed(self, name):
+        """이번 달이 아닌 샤드는 읽기 전용입니다. (월 접미사가 없는 이전 형식의 cold 컬렉션 포함)"""
+        return name != self.shard_name()
+
+    def shard_info(self):
+        """샤드별 상태 목록: [{"name", "month", "count", "sealed", "compacted"}, ...]"""
+        info = []
+        for shard in self.shard_collections():
+            month = shard.name[len(self.cold_prefix):].lstrip("_") or "legacy"
+            info.append({
+                "name": shard.name,
+                "month": month,
+                "count": shard.count(),
+                "sealed": self.is_sealed(shard.name),
+                "compacted": bool((shard.metadata or {}).get('compacted')),
+            })
+        return info
+
+    def drop_shard(self, name):
+        """샤드 하나를 통째로 삭제합니다."""
+        with self._shard_lock:
+            self._shards.pop(name, None)
+        self.client.delete_collection(name=name)
+        ltm_logger.info(f"LTM cold 샤드 삭제: {name}")
+
+    def apply_retention(self):
+        """보존 기간이 지난 샤드를 삭제합니다. (config.LTM_SHARD_RETENTION_MONTHS가 0이면 무제한 보존)"""
+        months = config.LTM_SHARD_RETENTION_MONTHS
+        if not months:
+            return []
+        now = datetime.now()
+        index = now.year * 12 + now.month - 1 - months
+        cutoff = f"{index // 12:04d}{index % 12 + 1:02d}"
+        dropped = []
+        for shard in self.shard_info():
+            if shard['month'].isdigit() and shard['month'] < cutoff:
+                self.drop_shard(shard['name'])
+                dropped.append(shard['name'])
+        if dropped:
+            ltm_logger.info(f"보존 기간({months}개월) 경과 샤드 {len(dropped)}개 삭제: {dropped}")
+        return dropped
+
+    def compact_sealed_shards(self):
+        """아직 압축되지 않은 읽기 전용 샤드를 한 번씩 압축합니다. (봉인 후 내용이 바뀌지 않으므로 1회면 충분)"""
+        for shard in self.shard_collections():
+            metadata = shard.metadata or {}
+            if not self.is_sealed(shard.name) or metadata.get('compacted'):
+                continue
+            report = self.shard_compactor.run_once(collection=shard, full=True)
+            metadata = dict(metadata)
+            metadata['compacted'] = True
+            metadata['compacted_removed'] = report['removed']
+            shard.modify(metadata=metadata)
+            ltm_logger.info(f"읽기 전용 샤드 {shard.name} 압축 완료: {report['before']} -> {report['after']}")
+
+    # --- 목록 조회 ---
+    def browse(self, user_id=None, since=None, until=None, newest_first=True, page_size=100):
+        """
+        LTM 전체를 페이지 단위로 조회하는 LTMPager를 반환합니다. (임베딩/의미 검색을 사용하지 않음)
+
+        Args:
+            user_id (str or list, optional): 조회할 파티션
+            since/until (float, optional): created_ts(epoch 초) 범위. 지정하면 created_ts가 없는 이전 기억은 제외됩니다.
+            newest_first (bool): True면 최신 기억부터
+        """
+        conditions = []
+        partition_where = build_where(user_id)
+        if partition_where:
+            conditions.append(partition_where)
+        if since is not None:
+            conditions.append({"created_ts": {"$gte": since}})
+        if until is not None:
+            conditions.append({"created_ts": {"$lte": until}})
+        where = None
+        if len(conditions) == 1:
+            where = conditions[0]
+        elif conditions:
+            where = {"$and": conditions}
+        collections = [self.hot] + self.shard_collections()
+        return LTMPager(collections, where=where, page_size=page_size, newest_first=newest_first)
+
+    # --- 검색 ---
+    def search(self, query, user_id=None, limit=3, filters=None, current_session_id=None, record_access=False):
+        """
+        hot 계층 우선 검색. 결과는 mem0 검색 결과와 같은 형태의 dict 리스트이며,
+        score는 코사인 유사도(높을수록 관련도 높음)입니다.
+        세션 요약 인덱스를 거친 결과에는 해당 세션의 요약이 'session_summary'로 함께 담깁니다.
+
+        Args:
+            user_id (str or list, optional): 검색할 파티션. 리스트면 해당 파티션들만 사전 필터링하여 검색합니다.
+            current_session_id (str, optional): 아직 요약되지 않은 현재 세션. 세션 범위 검색에 항상 포함됩니다.
+            record_access (bool): True면 모든 결과의 조회 기록을 남깁니다. 결과 일부만 프롬프트에 쓰는 호출자는
+                False로 두고 실제로 사용한 기억만 record_access()로 기록합니다.
+        """
+        embedding = self.memory.embedding_model.embed(query, "search")
+
+        hits = []
+        if config.LTM_HIERARCHICAL_SEARCH:
+            sessions = self.summaries.top_sessions(embedding, user_id=user_id)
+            if sessions:
+                session_ids = [s['session_id'] for s in sessions]
+                if current_session_id and current_session_id not in session_ids:
+                    session_ids.append(current_session_id)
+                scoped_filters = dict(filters or {})
+                scoped_filters['session_id'] = {"$in": session_ids}
+                hits = self._tiered_query(embedding, build_where(user_id, scoped_filters), limit)
+                summary_by_session = {s['session_id']: s['summary'] for s in sessions}
+                for hit in hits:
+                    hit['session_summary'] = summary_by_session.get(hit['metadata'].get('session_id'))
+                ltm_logger.debug("세션 요약 인덱스로 %d개 세션 선택, 범위 내 검색 결과 %d건", len(sessions), len(hits))
+
+        if len(hits) < limit:
+            # 선택된 세션 범위만으로 limit을 채우지 못하면 전체 범위 top-k를 합쳐 부족분을 채움
+            merged = {hit['id']: hit for hit in hits}
+            for hit in self._tiered_query(embedding, build_where(user_id, filters), limit):
+                if hit['id'] not in merged:
+                    merged[hit['id']] = hit
+            hits = sorted(merged.values(), key=lambda h: h['score'], reverse=True)[:limit]
+
+        if record_access:
+            self.record_access(hits)
+        return hits
+
+    def _tiered_query(self, embedding, where, limit):
+        hits = self._query(self.hot, "hot", embedding, where, limit)
+        best_score = hits[0]['score'] if hits else 0.0
+        if best_score < config.LTM_HOT_MIN_SCORE:
+            cold_hits = self._query_shards(embedding, where, limit)
+            if cold_hits:
+                ltm_logger.debug("hot 최고 관련도 %.3f < %s, cold 샤드에서 %d건 추가 조회", best_score, config.LTM_HOT_MIN_SCORE, len(cold_hits))
+            merged = {}
+            for hit in hits + cold_hits:
+                # 읽기 전용 샤드에서 승격된 기억은 hot과 샤드에 모두 있을 수 있으므로 id 기준으로 중복 제거
+                if hit['id'] not in merged or merged[hit['id']]['score'] < hit['score']:
+                    merged[hit['id']] = hit
+            hits = sorted(merged.values(), key=lambda h: h['score'], reverse=True)
+        return hits[:limit]
+
+    def _query_shards(self, embedding, where, limit):
+        """모든 cold 샤드를 병렬로 검색하고 top-k로 병합합니다."""
+        shards = [shard for shard in self.shard_collections() if shard.count() > 0]
+        if not shards:
+            return []
+        futures = [self._executor.submit(self._query, shard, "cold", embedding, where, limit) for shard in shards]
+        hits = []
+        for future in futures:
+            try:
+                hits.extend(future.result())
+            except Exception as e:
+                ltm_logger.error(f"LTM cold 샤드 검색 중 오류: {e}")
+        hits.sort(key=lambda h: h['score'], reverse=True)
+        return hits[:limit]
+
+    def _query(self, collection, tier, embedding, where, limit):
+        count = collection.count()
+        if count == 0:
+            return []
+        result = collection.query(
+            query_embeddings=[embedding],
+            n_results=min(limit, count),
+            where=where,
+            include=["embeddings", "metadatas"]
+        )
+        hits = []
+        for memory_id, metadata, vector in zip(result['ids'][0], result['metadatas'][0], result['embeddings'][0]):
+            metadata = metadata or {}
+            hits.append({
+                "id": memory_id,
+                "memory": metadata.get('data', ''),
+                "hash": metadata.get('hash'),
+                "created_at": metadata.get('created_at'),
+                "updated_at": metadata.get('updated_at'),
+                "user_id": metadata.get('user_id'),
+                "score": cosine_similarity(embedding, vector),
+                "tier": tier,
+                "collection": collection.name,
+                "metadata": metadata,
+            })
+        hits.sort(key=lambda h: h['score'], reverse=True)
+        return hits
+
+    def record_access(self, hits):
+        """실제로 사용된 기억의 조회 기록(access_count, last_access_at)을 쌓아 둡니다. (유지보수 때 반영)"""
+        now = time.time()
+        with self._access_lock:
+            for hit in hits:
+                _, count, _ = self._pending_access.get(hit['id'], (hit['collection'], 0, now))
+                self._pending_access[hit['id']] = (hit['collection'], count + 1, now)
+
+    # --- 계층 관리 ---
+    @staticmethod
+    def heat(metadata, now=None):
+        """접근 횟수와 최근성 감쇠를 결합한 점수. 높을수록 hot에 남을 가치가 큽니다."""
+        now = now or time.time()
+        last_used = metadata.get('last_access_at') or parse_timestamp(metadata.get('created_at')) or now
+        age = max(0.0, now - float(last_used))
+        decay = math.exp(-math.log(2) * age / config.LTM_RECENCY_HALF_LIFE)
+        return (1.0 + float(metadata.get('access_count', 0))) * decay
+
+    @staticmethod
+    def _move(ids, source, target, keep_source=False):
+        if not ids:
+            return
+        moving = source.get(ids=ids, include=["embeddings", "metadatas"])
+        if not moving['ids']:
+            return
+        target.upsert(ids=moving['ids'], embeddings=moving['embeddings'], metadatas=moving['metadatas'])
+        if not keep_source:
+            source.delete(ids=moving['ids'])
+
+    def flush_access(self):
+        """누적된 조회 기록을 메타데이터에 반영하고, cold에서 조회된 기억을 hot으로 승격합니다."""
+        with self._access_lock:
+            pending, self._pending_access = self._pending_access, {}
+        if not pending:
+            return
+
+        by_collection = {}
+        for memory_id, (name, _, _) in pending.items():
+            by_collection.setdefault(name, []).append(memory_id)
+
+        promoted = 0
+        for name, ids in by_collection.items():
+            if name == self.hot.name:
+                collection = self.hot
+            else:
+                with self._shard_lock:
+                    collection = self._shards.get(name)
+                if collection is None:
+                    continue
+            current = collection.get(ids=ids, include=["embeddings", "metadatas"])
+            if not current['ids']:
+                continue
+            updated = []
+            for memory_id, metadata in zip(current['ids'], current['metadatas']):
+                metadata = dict(metadata or {})
+                _, count, last_access = pending[memory_id]
+                metadata['access_count'] = int(metadata.get('access_count', 0)) + count
+                metadata['last_access_at'] = last_access
+                updated.append(metadata)
+
+            if collection is self.hot:
+                collection.update(ids=current['ids'], metadatas=updated)
+                continue
+
+            # cold 조회 결과는 hot으로 승격. 읽기 전용 샤드는 원본을 그대로 두고 복사만 합니다.
+            self.hot.upsert(ids=current['ids'], embeddings=current['embeddings'], metadatas=updated)
+            if not self.is_sealed(name):
+                collection.delete(ids=current['ids'])
+            promoted += len(current['ids'])
+
+        if promoted:
+            ltm_logger.info(f"cold 샤드에서 {promoted}개 기억을 hot 계층으로 승격했습니다.")
+
+    def demote(self, capacity=None):
+        """hot 계층이 용량을 넘으면 heat 점수가 가장 낮은 기억부터 이번 달 cold 샤드로 강등합니다."""
+        capacity = capacity or config.LTM_HOT_CAPACITY
+        hot_count = self.hot.count()
+        if hot_count <= capacity:
+            return 0
+        now = time.time()
+        scored = [(self.heat(metadata, now), memory_id) for memory_id, metadata, _ in iter_collection(self.hot)]
+        scored.sort()
+        to_demote = [memory_id for _, memory_id in scored[:hot_count - capacity]]
+        shard = self.current_shard()
+        for start in range(0, len(to_demote), 500):
+            self._move(to_demote[start:start + 500], self.hot, shard)
+        ltm_logger.info(f"hot 계층 {len(to_demote)}개 기억을 cold 샤드 {shard.name}로 강등했습니다. (hot {hot_count} -> {self.hot.count()})")
+        return len(to_demote)
+
+    def run_maintenance(self):
+        """조회 기록 반영, 강등, 보존 기간 정리, 읽기 전용 샤드 압축을 한 번 수행합니다."""
+        self.flush_access()
+        self.demote()
+        self.refresh_shards()
+        self.apply_retention()
+        self.compact_sealed_shards()
+
+    def start_maintenance(self, interval=config.LTM_TIER_MAINTENANCE_INTERVAL):
+        """interval 초마다 계층 유지보수를 수행하는 데몬 스레드를 시작합니다."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def worker():
+            while not self._stop_event.wait(interval):
+                try:
+                    self.run_maintenance()
+                except Exception as e:
+                    ltm_logger.error(f"LTM 계층 유지보수 중 오류: {e}", exc_info=True)
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=worker, daemon=True, name="LTMTierMaintenance")
+        self._thread.start()
+        ltm_logger.info(f"LTM 계층 유지보수 작업 시작 (주기: {interval}초, hot 용량: {config.LTM_HOT_CAPACITY}, "
+                        f"cold 샤드 {len(self._shards)}개)")
+
+    def stop_maintenance(self):
+        """유지보수 스레드를 중지하고 남은 조회 기록을 반영합니다."""
+        self._stop_event.set()
+        try:
+            self.flush_access()
+        except Exception as e:
+            ltm_logger.error(f"LTM 조회 기록 반영 중 오류: {e}")
+
+    def close(self):
+        """유지보수 스레드, 세션 요약 스레드, 샤드 검색 스레드 풀, 임베딩 배처를 정리합니다. (세션 종료, LTM 재초기화 전 호출)"""
+        self.stop_maintenance()
+        self.summaries.close()
+        self._executor.shutdown(wait=False)
+        close_embedder = getattr(self.memory.embedding_model, 'close', None)  # EmbeddingBatcher만 close()가 있음
+        if close_embedder:
+            close_embedder()
+
+    def clear(self):
+        """hot 컬렉션, 모든 cold 샤드, 세션 요약을 삭제합니다. (이후 setup_mem0_for_ltm으로 재초기화 필요)"""
+        self._stop_event.set()
+        with self._access_lock:
+            self._pending_access = {}
+        names = [self.hot.name, self.summaries.collection.name] + self.refresh_shards()
+        for name in names:
+            try:
+                self.client.delete_collection(name=name)
+            except Exception as e:
+                ltm_logger.warning(f"컬렉션 '{name}' 삭제 실패 (무시): {e}")
+        with self._shard_lock:
+            self._shards = {}
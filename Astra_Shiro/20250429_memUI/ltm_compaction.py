@@ -0,0 +1,214 @@
+# ltm_compaction.py
+# 장기 기억(LTM) 중복 압축 작업
+# 임베딩 유사도로 거의 같은 기억들을 묶어 하나만 남기고, 나머지는 출처(provenance)를 남긴 채 삭제합니다.
+
+import os
+import json
+import time
+import logging
+import threading
+
+import config
+from ltm_utils import get_chroma_collection, cosine_similarity, parse_timestamp, iter_collection
+
+ltm_logger = logging.getLogger('ltm')
+
+
+class LTMCompactor:
+    """
+    LTM 컬렉션의 근접 중복 기억을 정리하는 백그라운드 압축기.
+
+    - 마지막 실행 이후 새로 추가된 기억(created_at 기준)만 검사합니다. (증분 실행)
+    - 새 기억마다 최근접 이웃을 조회하여 유사도가 임계값 이상인 기억들을 하나의 클러스터로 묶습니다.
+    - 클러스터에서 가장 먼저 저장된 기억을 대표로 남기고, 나머지 id는 대표 기억의
+      메타데이터(merged_ids, merge_count)에 기록한 뒤 삭제합니다.
+    """
+
+    def __init__(self, memory, threshold=config.LTM_COMPACTION_THRESHOLD,
+                 neighbours=config.LTM_COMPACTION_NEIGHBOURS, state_file=config.LTM_COMPACTION_STATE_FILE):
+        self.memory = memory
+        self.threshold = threshold
+        self.neighbours = neighbours
+        self.state_file = state_file
+        self.lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    # --- 상태 파일 (증분 처리 워터마크) ---
+    def _load_state(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"watermark": -1.0}
+
+    def _save_state(self, state):
+        state_dir = os.path.dirname(os.path.abspath(self.state_file))
+        os.makedirs(state_dir, exist_ok=True)
+        tmp_path = self.state_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_file)
+
+    def reset_state(self):
+        """워터마크를 초기화하여 다음 실행 시 전체 컬렉션을 다시 검사하도록 합니다."""
+        self._save_state({"watermark": -1.0})
+
+    # --- 압축 ---
+    def run_once(self, collection=None, full=False):
+        """
+        한 번의 압축을 수행하고 결과 보고서(dict)를 반환합니다.
+
+        Args:
+            collection: 대상 ChromaDB 컬렉션. None이면 mem0 기본 컬렉션을 사용합니다.
+                다른 컬렉션(예: cold 샤드)을 지정하면 워터마크 상태 파일은 읽거나 갱신하지 않습니다.
+            full (bool): True면 워터마크를 무시하고 전체 기억을 검사합니다.
+        """
+        with self.lock:
+            started = time.time()
+            use_state = collection is None
+            if use_state:
+                collection = get_chroma_collection(self.memory)
+            state = self._load_state() if use_state else {"watermark": -1.0}
+            watermark = -1.0 if full else state.get("watermark", -1.0)
+
+            count_before = collection.count()
+
+            # 1) 메타데이터만 훑어서 새 기억 선별 (임베딩은 필요한 것만 나중에 조회)
+            new_entries = []
+            for memory_id, metadata, _ in iter_collection(collection):
+                created_ts = parse_timestamp(metadata.get('created_at'))
+                if created_ts > watermark:
+                    new_entries.append((created_ts, memory_id))
+            new_entries.sort()
+
+            report = {
+                "scanned": len(new_entries),
+                "clusters": 0,
+                "removed": 0,
+                "bytes_saved": 0,
+                "before": count_before,
+                "after": count_before,
+                "elapsed": 0.0,
+            }
+            if not new_entries:
+                report["elapsed"] = time.time() - started
+                return report
+
+            # 2) 새 기억마다 최근접 이웃을 찾아 클러스터 구성 (union-find)
+            parent = {}
+            records = {}
+
+            def find(x):
+                while parent[x] != x:
+                    parent[x] = parent[parent[x]]
+                    x = parent[x]
+                return x
+
+            def union(a, b):
+                root_a, root_b = find(a), find(b)
+                if root_a == root_b:
+                    return
+                # 먼저 저장된 기억이 대표가 되도록 연결
+                if records[root_a][0] <= records[root_b][0]:
+                    parent[root_b] = root_a
+                else:
+                    parent[root_a] = root_b
+
+            new_ids = [memory_id for _, memory_id in new_entries]
+            for start in range(0, len(new_ids), 100):
+                chunk = collection.get(ids=new_ids[start:start + 100], include=["embeddings", "metadatas"])
+                for memory_id, metadata, embedding in zip(chunk['ids'], chunk['metadatas'], chunk['embeddings']):
+                    if embedding is None:
+                        continue
+                    self._register(records, parent, memory_id, metadata, embedding)
+                    result = collection.query(
+                        query_embeddings=[list(embedding)],
+                        n_results=min(self.neighbours + 1, max(collection.count(), 1)),
+                        include=["embeddings", "metadatas"]
+                    )
+                    for other_id, other_meta, other_emb in zip(result['ids'][0], result['metadatas'][0], result['embeddings'][0]):
+                        if other_id == memory_id or other_emb is None:
+                            continue
+                        other_meta = other_meta or {}
+                        # 다른 사용자의 기억은 절대 합치지 않음
+                        if other_meta.get('user_id') != (metadata or {}).get('user_id'):
+                            continue
+                        if cosine_similarity(embedding, other_emb) < self.threshold:
+                            continue
+                        self._register(records, parent, other_id, other_meta, other_emb)
+                        union(memory_id, other_id)
+
+            # 3) 클러스터별로 대표만 남기고 나머지 삭제
+            clusters = {}
+            for memory_id in records:
+                clusters.setdefault(find(memory_id), []).append(memory_id)
+
+            for root, members in clusters.items():
+                if len(members) < 2:
+                    continue
+                duplicates = [m for m in members if m != root]
+                keep_meta = dict(records[root][1])
+                merged_ids = [m for m in str(keep_meta.get('merged_ids', '')).split(',') if m]
+                for dup in duplicates:
+                    dup_meta = records[dup][1]
+                    merged_ids.append(dup)
+                    merged_ids.extend(m for m in str(dup_meta.get('merged_ids', '')).split(',') if m)
+                    report["bytes_saved"] += len(str(dup_meta.get('data', '')).encode('utf-8'))
+                keep_meta['merged_ids'] = ",".join(merged_ids)
+                keep_meta['merge_count'] = len(merged_ids)
+                keep_meta['last_merged_at'] = time.time()
+
+                collection.update(ids=[root], metadatas=[keep_meta])
+                collection.delete(ids=duplicates)
+                report["clusters"] += 1
+                report["removed"] += len(duplicates)
+                ltm_logger.debug(f"중복 기억 병합: 대표 {root} <- {duplicates}")
+
+            if use_state:
+                state["watermark"] = max(new_entries[-1][0], watermark)
+                self._save_state(state)
+
+            report["after"] = collection.count()
+            report["elapsed"] = time.time() - started
+            ltm_logger.info(self.format_report(report))
+            return report
+
+    @staticmethod
+    def _register(records, parent, memory_id, metadata, embedding):
+        if memory_id not in records:
+            metadata = metadata or {}
+            records[memory_id] = (parse_timestamp(metadata.get('created_at')), metadata, embedding)
+            parent[memory_id] = memory_id
+
+    @staticmethod
+    def format_report(report):
+        """압축 결과를 사람이 읽기 쉬운 문자열로 변환합니다."""
+        before = report.get("before", 0)
+        removed = report.get("removed", 0)
+        ratio = (removed / before * 100) if before else 0.0
+        return (f"LTM 압축 완료: 검사 {report.get('scanned', 0)}개, 클러스터 {report.get('clusters', 0)}개, "
+                f"삭제 {removed}개 ({before} -> {report.get('after', before)}, {ratio:.1f}% 감소, "
+                f"텍스트 {report.get('bytes_saved', 0)} bytes 절약, {report.get('elapsed', 0.0):.2f}초)")
+
+    # --- 백그라운드 실행 ---
+    def start(self, interval=config.LTM_COMPACTION_INTERVAL):
+        """interval 초마다 증분 압축을 수행하는 데몬 스레드를 시작합니다."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def worker():
+            while not self._stop_event.wait(interval):
+                try:
+                    self.run_once()
+                except Exception as e:
+                    ltm_logger.error(f"LTM 압축 작업 중 오류: {e}", exc_info=True)
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=worker, daemon=True, name="LTMCompactor")
+        self._thread.start()
+        ltm_logger.info(f"LTM 중복 압축 백그라운드 작업 시작 (주기: {interval}초, 임계값: {self.threshold})")
+
+    def stop(self):
+        """백그라운드 압축 스레드를 중지합니다."""
+        self._stop_event.set()
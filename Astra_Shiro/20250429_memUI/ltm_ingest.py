@@ -0,0 +1,275 @@
+# ltm_ingest.py
+# 과거 대화 기록을 장기 기억(LTM)에 일괄 적재하는 스크립트
+# AstraUI의 "대화 내역 저장" 텍스트 파일과 logs/stm.log의 STM 컨텍스트 기록을 턴 단위로 나누고,
+# 여러 턴을 한 번에 임베딩(동시 연결 여러 개)한 뒤 hot 컬렉션에 일괄 저장합니다.
+#
+# - 턴 id는 (파티션, 턴 텍스트)로 결정되므로 같은 턴을 다시 적재해도 중복 저장되지 않습니다.
+# - 파일별 진행 상황을 체크포인트 파일에 기록하므로, 중단 후 다시 실행하면 이어서 적재합니다.
+#
+# 사용 예:
+#   python ltm_ingest.py ./exports/*.txt ./logs/stm.log --user viewer1 --batch-size 64 --workers 4
+
+import os
+import re
+import glob
+import json
+import time
+import uuid
+import hashlib
+import logging
+import argparse
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from embedding_client import OllamaEmbeddingClient, select_embed_endpoint
+
+ltm_logger = logging.getLogger('ltm')
+
+USER_PREFIX = "사용자: "
+ASSISTANT_PREFIX = "아스트라 시로: "
+SYSTEM_PREFIX = "[시스템:"
+STM_CONTEXT_MARKER = "사용될 STM 컨텍스트:"
+# config.LOG_FORMAT ("%(asctime)s - %(levelname)s - %(module)s - %(message)s") 한 줄의 시작
+LOG_LINE_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),\d+ - (\w+) - (\w+) - (.*)$")
+TURN_ID_NAMESPACE = uuid.UUID("6f1d3c1e-8a4b-4e0c-9d57-3c2a1f0b7e91")
+
+
+# --- 대화 기록 파싱 ---
+def parse_messages(lines):
+    """'사용자: ' / '아스트라 시로: ' 로 시작하는 줄을 기준으로 메시지를 나누고 (사용자, 어시스턴트) 턴 텍스트 목록을 반환합니다."""
+    messages = []  # [(역할, 텍스트)]
+    for line in lines:
+        if line.startswith(USER_PREFIX):
+            messages.append(["user", line[len(USER_PREFIX):]])
+        elif line.startswith(ASSISTANT_PREFIX):
+            messages.append(["assistant", line[len(ASSISTANT_PREFIX):]])
+        elif line.startswith(SYSTEM_PREFIX):
+            messages.append(["system", line])
+        elif messages:
+            messages[-1][1] += "\n" + line
+
+    turns = []
+    for (role, text), (next_role, next_text) in zip(messages, messages[1:]):
+        if role == "user" and next_role == "assistant":
+            user_text, assistant_text = text.strip(), next_text.strip()
+            if user_text and assistant_text:
+                turns.append(f"{USER_PREFIX}{user_text}\n{ASSISTANT_PREFIX}{assistant_text}")
+    return turns
+
+
+def parse_transcript(path):
+    """AstraUI.save_conversation으로 저장한 대화 내역 파일을 턴 목록으로 변환합니다. 시각은 파일 수정 시각을 사용합니다."""
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    timestamp = os.path.getmtime(path)
+    return [(turn, timestamp) for turn in parse_messages(lines)]
+
+
+def parse_stm_log(path):
+    """
+    stm.log의 '사용될 STM 컨텍스트:' 기록(DEBUG)에서 턴을 추출합니다.
+    같은 턴이 여러 기록에 반복되어 나오므로, 처음 나온 기록의 시각으로 한 번만 반환합니다.
+    """
+    turns = []
+    seen = set()
+
+    def flush(entry):
+        if entry is None:
+            return
+        timestamp, lines = entry
+        for turn in parse_messages(lines):
+            if turn not in seen:
+                seen.add(turn)
+                turns.append((turn, timestamp))
+
+    entry = None
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for raw_line in f:
+            line = raw_line.rstrip("\r\n")
+            match = LOG_LINE_PATTERN.match(line)
+            if match:
+                flush(entry)
+                entry = None
+                message = match.group(4)
+                if message.startswith(STM_CONTEXT_MARKER):
+                    timestamp = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S").timestamp()
+                    rest = message[len(STM_CONTEXT_MARKER):].strip()
+                    entry = (timestamp, [rest] if rest else [])
+            elif entry is not None:
+                entry[1].append(line)
+    flush(entry)
+    return turns
+
+
+def parse_source(path):
+    """파일 형식(로그/대화 내역)을 판별하여 [(턴 텍스트, 시각), ...]을 반환합니다."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        first_line = f.readline().rstrip("\r\n")
+    if path.endswith(".log") or ".log." in os.path.basename(path) or LOG_LINE_PATTERN.match(first_line):
+        return parse_stm_log(path)
+    return parse_transcript(path)
+
+
+# --- 체크포인트 ---
+def load_checkpoint(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"files": {}}
+
+
+def save_checkpoint(path, state):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def source_key(path):
+    """체크포인트 키: 절대 경로 + 크기 + 수정 시각 (파일 내용이 바뀌면 처음부터 다시 적재)"""
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}|{stat.st_size}|{int(stat.st_mtime)}"
+
+
+# --- 적재 ---
+def turn_payload(turn, timestamp, partition, channel_id, source):
+    """mem0이 저장하는 것과 같은 형식의 메타데이터 (data/hash/created_at/user_id) + 적재 출처"""
+    return {
+        "data": turn,
+        "hash": hashlib.md5(turn.encode("utf-8")).hexdigest(),
+        "created_at": datetime.fromtimestamp(timestamp).astimezone().isoformat(),
+        "created_ts": timestamp,
+        "user_id": partition,
+        "channel_id": channel_id,
+        "session_id": f"ingest-{os.path.basename(source)}",
+        "ingested_from": os.path.basename(source),
+    }
+
+
+class TranscriptIngestor:
+    """
+    턴 목록을 batch_size개씩 묶어 workers개의 동시 연결로 임베딩하고, 완료된 순서대로 컬렉션에 upsert합니다.
+    진행 중인 배치 수는 workers * 2개로 제한되어 메모리 사용량이 파일 크기와 무관하게 유지됩니다.
+    """
+
+    def __init__(self, collection, embedder, batch_size=config.LTM_INGEST_BATCH_SIZE,
+                 workers=config.LTM_INGEST_WORKERS, checkpoint_file=config.LTM_INGEST_STATE_FILE):
+        self.collection = collection
+        self.embedder = embedder
+        self.batch_size = batch_size
+        self.workers = workers
+        self.checkpoint_file = checkpoint_file
+        self.state = load_checkpoint(checkpoint_file)
+
+    def ingest_file(self, path, partition, channel_id, progress=None):
+        """파일 하나를 적재하고 이번 실행에서 저장한 턴 수를 반환합니다. (체크포인트 이후부터 이어서 적재)"""
+        key = source_key(path)
+        file_state = self.state["files"].setdefault(key, {"done": 0, "total": None})
+        turns = parse_source(path)
+        file_state["total"] = len(turns)
+        start = file_state["done"]
+        if start >= len(turns):
+            ltm_logger.info(f"이미 적재된 파일입니다. 건너뜀: {path}")
+            return 0
+
+        written = 0
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="LTMIngestEmbed") as executor:
+            for batch_start in range(start, len(turns), self.batch_size):
+                batch = turns[batch_start:batch_start + self.batch_size]
+                future = executor.submit(self.embedder.embed_batch, [turn for turn, _ in batch])
+                pending.append((batch_start, batch, future))
+                if len(pending) >= self.workers * 2:
+                    written += self._write(pending.popleft(), path, partition, channel_id, file_state, progress)
+            while pending:
+                written += self._write(pending.popleft(), path, partition, channel_id, file_state, progress)
+        return written
+
+    def _write(self, item, path, partition, channel_id, file_state, progress):
+        batch_start, batch, future = item
+        embeddings = future.result()
+        self.collection.upsert(
+            ids=[str(uuid.uuid5(TURN_ID_NAMESPACE, f"{partition}\n{turn}")) for turn, _ in batch],
+            embeddings=embeddings,
+            metadatas=[turn_payload(turn, timestamp, partition, channel_id, path) for turn, timestamp in batch],
+        )
+        # 배치는 제출 순서대로 저장되므로 done 이전의 턴은 모두 저장된 상태
+        file_state["done"] = batch_start + len(batch)
+        save_checkpoint(self.checkpoint_file, self.state)
+        if progress:
+            progress(len(batch))
+        return len(batch)
+
+
+def expand_sources(patterns):
+    paths = []
+    for pattern in patterns:
+        matched = sorted(glob.glob(pattern)) or [pattern]
+        paths.extend(p for p in matched if os.path.isfile(p))
+    return paths
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="과거 대화 기록(대화 내역 txt, stm.log)을 LTM에 일괄 적재")
+    parser.add_argument("sources", nargs="+", help="적재할 파일 또는 glob 패턴 (예: ./exports/*.txt ./logs/stm.log*)")
+    parser.add_argument("--user", default=None, help="시청자 ID (지정하지 않으면 기본 파티션)")
+    parser.add_argument("--channel", default=config.MEMORY_CHANNEL_ID, help=f"채널 ID (기본값: {config.MEMORY_CHANNEL_ID})")
+    parser.add_argument("--batch-size", type=int, default=config.LTM_INGEST_BATCH_SIZE,
+                        help=f"임베딩 요청당 턴 수 (기본값: {config.LTM_INGEST_BATCH_SIZE})")
+    parser.add_argument("--workers", type=int, default=config.LTM_INGEST_WORKERS,
+                        help=f"임베딩 서버 동시 연결 수 (기본값: {config.LTM_INGEST_WORKERS})")
+    parser.add_argument("--chroma-path", default=config.CHROMA_PATH, help=f"ChromaDB 경로 (기본값: {config.CHROMA_PATH})")
+    parser.add_argument("--checkpoint", default=config.LTM_INGEST_STATE_FILE,
+                        help=f"체크포인트 파일 (기본값: {config.LTM_INGEST_STATE_FILE})")
+    parser.add_argument("--restart", action="store_true", help="체크포인트를 무시하고 처음부터 다시 적재")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    logging.basicConfig(level=logging.INFO, format=config.LOG_FORMAT)
+
+    try:
+        import chromadb
+    except ModuleNotFoundError:
+        print("오류: chromadb 라이브러리를 찾을 수 없습니다. 'pip install chromadb'로 설치해주세요.")
+        exit()
+
+    sources = expand_sources(args.sources)
+    if not sources:
+        print("오류: 적재할 파일을 찾을 수 없습니다.")
+        exit()
+
+    partition = f"{args.channel}:{args.user}" if args.user else config.MEMORY_USER_ID
+    client = chromadb.PersistentClient(path=args.chroma_path)
+    hot_collection = client.get_or_create_collection(name=config.CHROMA_COLLECTION, embedding_function=None)
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    # 기존 저장소와 같은 임베딩 엔드포인트를 사용 (정규화 여부가 다르면 거리 계산이 어긋남)
+    endpoint = select_embed_endpoint(hot_collection, client)
+    ingestor = TranscriptIngestor(hot_collection, OllamaEmbeddingClient(legacy_api=endpoint == "embeddings"), batch_size=args.batch_size,
+                                  workers=args.workers, checkpoint_file=args.checkpoint)
+
+    started = time.time()
+    total_written = 0
+
+    def print_progress(count):
+        global total_written
+        total_written += count
+        elapsed = time.time() - started
+        print(f"\r적재 {total_written}턴, {total_written / max(elapsed, 1e-9):.1f}턴/초", end="", flush=True)
+
+    for source in sources:
+        print(f"\n{source} (파티션: {partition})")
+        try:
+            ingestor.ingest_file(source, partition, args.channel, progress=print_progress)
+        except KeyboardInterrupt:
+            print("\n중단되었습니다. 다시 실행하면 체크포인트부터 이어서 적재합니다.")
+            break
+
+    elapsed = time.time() - started
+    print(f"\n\n완료: 파일 {len(sources)}개, {total_written}턴, {elapsed:.1f}초 ({total_written / max(elapsed, 1e-9):.1f}턴/초)")
@@ -0,0 +1,102 @@
+# ltm_partition_bench.py
+# 시청자/채널 파티션 LTM 검색 확장성 측정 스크립트
+# 임의 벡터로 N명의 시청자 파티션 + 공용 파티션을 채운 뒤,
+# "시청자 파티션 + 공용 파티션" 사전 필터 검색과 전체 검색의 지연 시간을 비교합니다.
+#
+# 사용 예: python ltm_partition_bench.py --users 10000 --per-user 5 --dim 256
+
+import time
+import random
+import argparse
+
+try:
+    import chromadb
+except ModuleNotFoundError:
+    print("오류: chromadb 라이브러리를 찾을 수 없습니다. 'pip install chromadb'로 설치해주세요.")
+    exit()
+
+import config
+from ltm_utils import build_where
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def random_vector(rng, dim):
+    return [rng.uniform(-1.0, 1.0) for _ in range(dim)]
+
+
+def run_benchmark(users, per_user, global_count, dim, queries, limit, seed):
+    rng = random.Random(seed)
+    client = chromadb.EphemeralClient()
+    collection = client.get_or_create_collection(name="partition_bench", embedding_function=None)
+
+    # 1) 데이터 적재
+    started = time.time()
+    batch_ids, batch_vectors, batch_metas = [], [], []
+
+    def flush():
+        if batch_ids:
+            collection.add(ids=list(batch_ids), embeddings=list(batch_vectors), metadatas=list(batch_metas))
+            batch_ids.clear()
+            batch_vectors.clear()
+            batch_metas.clear()
+
+    partitions = [f"{config.MEMORY_CHANNEL_ID}:viewer{u}" for u in range(users)]
+    for partition in partitions + [config.MEMORY_GLOBAL_PARTITION]:
+        count = global_count if partition == config.MEMORY_GLOBAL_PARTITION else per_user
+        for i in range(count):
+            batch_ids.append(f"{partition}-{i}")
+            batch_vectors.append(random_vector(rng, dim))
+            batch_metas.append({"user_id": partition, "data": f"{partition} 기억 {i}"})
+            if len(batch_ids) >= 2000:
+                flush()
+    flush()
+    load_time = time.time() - started
+    total = collection.count()
+    print(f"적재 완료: 파티션 {users + 1}개, 벡터 {total}개, {load_time:.1f}초 ({total / max(load_time, 1e-9):.0f}개/초)")
+
+    # 2) 검색 지연 시간 측정
+    filtered, unfiltered = [], []
+    leaked = 0
+    for _ in range(queries):
+        partition = rng.choice(partitions)
+        query = random_vector(rng, dim)
+        allowed = [partition, config.MEMORY_GLOBAL_PARTITION]
+
+        t0 = time.perf_counter()
+        result = collection.query(query_embeddings=[query], n_results=limit, where=build_where(allowed), include=["metadatas"])
+        filtered.append((time.perf_counter() - t0) * 1000)
+        leaked += sum(1 for meta in result['metadatas'][0] if meta.get('user_id') not in allowed)
+
+        t0 = time.perf_counter()
+        collection.query(query_embeddings=[query], n_results=limit, include=["metadatas"])
+        unfiltered.append((time.perf_counter() - t0) * 1000)
+
+    print(f"\n검색 {queries}회 (top-{limit}), 단위 ms")
+    print(f"{'':24s}{'p50':>10s}{'p95':>10s}{'p99':>10s}")
+    for label, values in (("파티션+공용 사전 필터", filtered), ("전체 검색 (필터 없음)", unfiltered)):
+        print(f"{label:24s}{percentile(values, 50):10.2f}{percentile(values, 95):10.2f}{percentile(values, 99):10.2f}")
+    print(f"\n다른 시청자 파티션 결과 혼입: {leaked}건")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="LTM 시청자 파티션 검색 확장성 측정")
+    parser.add_argument("--users", type=int, default=10000, help="시청자 파티션 수 (기본값: 10000)")
+    parser.add_argument("--per-user", type=int, default=5, help="시청자당 기억 수 (기본값: 5)")
+    parser.add_argument("--global-count", type=int, default=200, help="공용 파티션 기억 수 (기본값: 200)")
+    parser.add_argument("--dim", type=int, default=256, help="임베딩 차원 (기본값: 256, bge-m3는 1024)")
+    parser.add_argument("--queries", type=int, default=200, help="측정할 검색 횟수 (기본값: 200)")
+    parser.add_argument("--limit", type=int, default=3, help="검색 결과 수 (기본값: 3)")
+    parser.add_argument("--seed", type=int, default=42, help="난수 시드 (기본값: 42)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    run_benchmark(args.users, args.per_user, args.global_count, args.dim, args.queries, args.limit, args.seed)
@@ -0,0 +1,235 @@
+# ltm_snapshot.py
+# 장기 기억(LTM) 스냅샷 내보내기/가져오기
+# id, 기억 텍스트, 메타데이터, 임베딩 벡터를 그대로 하나의 zip 파일로 저장하고,
+# 복원 시에는 임베더를 거치지 않고 벡터를 그대로 Vector Store에 일괄 적재합니다.
+#
+# 파일 구조 (zip):
+#   manifest.json            형식 버전, 임베딩 모델/차원, 컬렉션 목록과 청크 목록
+#   <컬렉션번호>/<청크번호>.npy   float32 임베딩 행렬 (N x 차원, 무압축)
+#   <컬렉션번호>/<청크번호>.json  {"ids": [...], "metadatas": [...], "documents": [...]} (deflate 압축)
+#
+# 사용 예:
+#   python ltm_snapshot.py export ./ltm_snapshots/backup.zip
+#   python ltm_snapshot.py import ./ltm_snapshots/backup.zip [--replace]
+
+import io
+import json
+import time
+import zipfile
+import logging
+import argparse
+
+import numpy as np
+
+import config
+
+ltm_logger = logging.getLogger('ltm')
+
+SNAPSHOT_FORMAT = "astra-ltm-snapshot"
+SNAPSHOT_VERSION = 1
+
+
+def snapshot_collection_names(client, prefix=config.CHROMA_COLLECTION):
+    """스냅샷 대상 컬렉션 이름 목록 (hot, 세션 요약, cold 샤드 등 prefix로 시작하는 모든 컬렉션)"""
+    names = [getattr(col, 'name', col) for col in client.list_collections()]
+    return sorted(name for name in names if name.startswith(prefix))
+
+
+def export_snapshot(client, path, chunk_size=config.LTM_SNAPSHOT_CHUNK_SIZE, prefix=config.CHROMA_COLLECTION, progress=None):
+    """
+    LTM 컬렉션 전체를 스냅샷 파일로 내보냅니다.
+    컬렉션마다 chunk_size개씩 get(limit/offset)으로 읽어 바로 파일에 쓰므로 메모리 사용량은 청크 크기로 제한됩니다.
+
+    Args:
+        client: ChromaDB 클라이언트 (TieredLongTermMemory.client 또는 PersistentClient)
+        path (str): 저장할 스냅샷 파일 경로
+        progress (callable, optional): progress(저장한 기억 수, 전체 기억 수) 콜백
+
+    Returns:
+        dict: {"collections", "records", "dim", "bytes", "elapsed"}
+    """
+    started = time.time()
+    collections = [client.get_collection(name=name, embedding_function=None) for name in snapshot_collection_names(client, prefix)]
+    total = sum(col.count() for col in collections)
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "created_at": time.time(),
+        "embedding_model": config.MEM0_EMBEDDING_MODEL,
+        "dim": None,
+        "collections": [],
+    }
+    done = 0
+
+    with zipfile.ZipFile(path, "w", allowZip64=True) as zf:
+        for index, collection in enumerate(collections):
+            entry = {
+                "suffix": collection.name[len(prefix):],
+                "metadata": collection.metadata or {},
+                "count": 0,
+                "chunks": [],
+            }
+            offset = 0
+            while True:
+                page = collection.get(limit=chunk_size, offset=offset, include=["embeddings", "metadatas", "documents"])
+                ids = page.get('ids') or []
+                if not ids:
+                    break
+                vectors = np.asarray(page['embeddings'], dtype=np.float32)
+                if manifest["dim"] is None:
+                    manifest["dim"] = int(vectors.shape[1])
+                elif vectors.shape[1] != manifest["dim"]:
+                    raise ValueError(f"컬렉션 '{collection.name}'의 임베딩 차원({vectors.shape[1]})이 "
+                                     f"다른 컬렉션({manifest['dim']})과 다릅니다.")
+
+                chunk = f"{index:03d}/{len(entry['chunks']):05d}"
+                with zf.open(chunk + ".npy", "w", force_zip64=True) as f:
+                    np.save(f, vectors, allow_pickle=False)
+                documents = page.get('documents') or []
+                records = {
+                    "ids": ids,
+                    "metadatas": [metadata or {} for metadata in page['metadatas']],
+                    "documents": documents if any(doc is not None for doc in documents) else None,
+                }
+                zf.writestr(chunk + ".json", json.dumps(records, ensure_ascii=False), compress_type=zipfile.ZIP_DEFLATED)
+
+                entry["chunks"].append(chunk)
+                entry["count"] += len(ids)
+                done += len(ids)
+                offset += len(ids)
+                if progress:
+                    progress(done, total)
+                if len(ids) < chunk_size:
+                    break
+            manifest["collections"].append(entry)
+            ltm_logger.debug(f"스냅샷 내보내기: '{collection.name}' {entry['count']}개, 청크 {len(entry['chunks'])}개")
+
+        zf.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2), compress_type=zipfile.ZIP_DEFLATED)
+
+    report = {
+        "collections": len(manifest["collections"]),
+        "records": done,
+        "dim": manifest["dim"],
+        "bytes": _file_size(path),
+        "elapsed": time.time() - started,
+    }
+    ltm_logger.info(f"LTM 스냅샷 내보내기 완료 ({path}): {format_report(report)}")
+    return report
+
+
+def read_manifest(path):
+    """스냅샷 파일의 manifest.json을 읽어 형식을 검사한 뒤 반환합니다."""
+    with zipfile.ZipFile(path, "r") as zf:
+        manifest = json.loads(zf.read("manifest.json").decode("utf-8"))
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"LTM 스냅샷 파일이 아닙니다: {path}")
+    if manifest.get("version", 0) > SNAPSHOT_VERSION:
+        raise ValueError(f"지원하지 않는 스냅샷 버전입니다: {manifest.get('version')}")
+    return manifest
+
+
+def import_snapshot(client, path, prefix=config.CHROMA_COLLECTION, progress=None):
+    """
+    스냅샷 파일을 Vector Store에 복원합니다.
+    임베딩을 다시 계산하지 않고 청크 단위로 upsert하므로, 같은 id의 기억은 스냅샷 내용으로 덮어씁니다.
+    컬렉션 이름은 현재 prefix(config.CHROMA_COLLECTION) 기준으로 다시 만들어지므로 다른 컬렉션 이름으로도 복원할 수 있습니다.
+
+    Returns:
+        dict: {"collections", "records", "dim", "bytes", "elapsed"}
+    """
+    started = time.time()
+    manifest = read_manifest(path)
+    if manifest.get("embedding_model") != config.MEM0_EMBEDDING_MODEL:
+        ltm_logger.warning(f"스냅샷 임베딩 모델({manifest.get('embedding_model')})이 현재 설정({config.MEM0_EMBEDDING_MODEL})과 다릅니다. "
+                           f"복원된 기억의 검색 품질이 떨어질 수 있습니다.")
+    total = sum(entry["count"] for entry in manifest["collections"])
+    done = 0
+
+    with zipfile.ZipFile(path, "r") as zf:
+        for entry in manifest["collections"]:
+            name = prefix + entry["suffix"]
+            collection = client.get_or_create_collection(name=name, metadata=entry["metadata"] or None, embedding_function=None)
+            _check_dimension(collection, manifest["dim"])
+            for chunk in entry["chunks"]:
+                vectors = np.load(io.BytesIO(zf.read(chunk + ".npy")), allow_pickle=False)
+                records = json.loads(zf.read(chunk + ".json").decode("utf-8"))
+                kwargs = {"ids": records["ids"], "embeddings": vectors.tolist(), "metadatas": records["metadatas"]}
+                if records.get("documents"):
+                    kwargs["documents"] = records["documents"]
+                collection.upsert(**kwargs)
+                done += len(records["ids"])
+                if progress:
+                    progress(done, total)
+            ltm_logger.debug(f"스냅샷 가져오기: '{name}' {entry['count']}개")
+
+    report = {
+        "collections": len(manifest["collections"]),
+        "records": done,
+        "dim": manifest["dim"],
+        "bytes": _file_size(path),
+        "elapsed": time.time() - started,
+    }
+    ltm_logger.info(f"LTM 스냅샷 가져오기 완료 ({path}): {format_report(report)}")
+    return report
+
+
+def _check_dimension(collection, dim):
+    """기존 컬렉션에 벡터가 있으면 스냅샷과 임베딩 차원이 같은지 확인합니다."""
+    if dim is None or collection.count() == 0:
+        return
+    sample = collection.get(limit=1, include=["embeddings"])['embeddings']
+    if sample is not None and len(sample) and len(sample[0]) != dim:
+        raise ValueError(f"컬렉션 '{collection.name}'의 임베딩 차원({len(sample[0])})이 스냅샷({dim})과 다릅니다.")
+
+
+def _file_size(path):
+    try:
+        with open(path, "rb") as f:
+            return f.seek(0, 2)
+    except OSError:
+        return 0
+
+
+def format_report(report):
+    """스냅샷 결과를 사람이 읽기 쉬운 문자열로 변환합니다."""
+    elapsed = report.get("elapsed", 0.0)
+    records = report.get("records", 0)
+    return (f"컬렉션 {report.get('collections', 0)}개, 기억 {records}개 (차원 {report.get('dim')}), "
+            f"{report.get('bytes', 0) / (1024 * 1024):.1f}MB, {elapsed:.2f}초 ({records / max(elapsed, 1e-9):.0f}개/초)")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="장기 기억(LTM) 스냅샷 내보내기/가져오기")
+    parser.add_argument("command", choices=["export", "import"], help="export: 내보내기, import: 가져오기")
+    parser.add_argument("path", help="스냅샷 파일 경로")
+    parser.add_argument("--chroma-path", default=config.CHROMA_PATH, help=f"ChromaDB 경로 (기본값: {config.CHROMA_PATH})")
+    parser.add_argument("--chunk-size", type=int, default=config.LTM_SNAPSHOT_CHUNK_SIZE,
+                        help=f"청크당 기억 수 (기본값: {config.LTM_SNAPSHOT_CHUNK_SIZE})")
+    parser.add_argument("--replace", action="store_true", help="가져오기 전에 기존 LTM 컬렉션을 모두 삭제")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        import chromadb
+    except ModuleNotFoundError:
+        print("오류: chromadb 라이브러리를 찾을 수 없습니다. 'pip install chromadb'로 설치해주세요.")
+        exit()
+
+    chroma_client = chromadb.PersistentClient(path=args.chroma_path)
+
+    def print_progress(done, total):
+        print(f"\r{done}/{total}", end="", flush=True)
+
+    if args.command == "export":
+        result = export_snapshot(chroma_client, args.path, chunk_size=args.chunk_size, progress=print_progress)
+    else:
+        if args.replace:
+            for collection_name in snapshot_collection_names(chroma_client):
+                chroma_client.delete_collection(name=collection_name)
+        result = import_snapshot(chroma_client, args.path, progress=print_progress)
+    print()
+    print(format_report(result))
@@ -0,0 +1,139 @@
+# ltm_summary.py
+# 세션 요약 인덱스 (2단계 장기 기억 검색의 1단계)
+# 세션(또는 N턴) 단위로 대화를 요약하여 별도의 작은 요약 컬렉션에 임베딩해 둡니다.
+
+import time
+import uuid
+import queue
+import logging
+import threading
+
+import config
+from system_prompts import SESSION_SUMMARY_PROMPT
+from ltm_utils import cosine_similarity, build_where
+
+ltm_logger = logging.getLogger('ltm')
+
+
+class SessionSummaryIndex:
+    """
+    세션 요약 인덱스.
+
+    - note_turn()으로 세션별 턴을 모으다가 config.LTM_SUMMARY_EVERY_N_TURNS 턴이 쌓이면
+      백그라운드 스레드에서 메모리 LLM으로 요약하여 요약 컬렉션에 저장합니다.
+    - close_session()은 세션 종료 시 남은 턴을 요약하고, close()는 요약 스레드를 멈춥니다.
+    - top_sessions()는 질의 임베딩과 가장 가까운 세션 id 목록을 반환하며,
+      이후 LTM 검색은 해당 세션들의 턴으로만 범위를 좁힙니다.
+    """
+
+    def __init__(self, memory):
+        self.memory = memory
+        self.collection = memory.vector_store.client.get_or_create_collection(
+            name=config.CHROMA_COLLECTION + config.LTM_SUMMARY_SUFFIX,
+            embedding_function=None
+        )
+        self._buffers = {}  # (session_id, 파티션) -> [턴 텍스트, ...]
+        self._buffer_lock = threading.Lock()
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._worker, daemon=True, name="LTMSessionSummarizer")
+        self._thread.start()
+
+    # --- 턴 수집 ---
+    def note_turn(self, session_id, conversation_text, user_id=config.MEMORY_USER_ID):
+        """LTM에 저장된 턴을 세션/파티션 버퍼에 추가하고, N턴이 모이면 요약 작업을 예약합니다."""
+        key = (session_id, user_id)
+        with self._buffer_lock:
+            buffer = self._buffers.setdefault(key, [])
+            buffer.append(conversation_text)
+            if len(buffer) < config.LTM_SUMMARY_EVERY_N_TURNS:
+                return
+            turns, self._buffers[key] = buffer, []
+        self._jobs.put((session_id, user_id, turns))
+
+    def close_session(self, session_id=None, timeout=30):
+        """
+        세션 종료 시 남은 턴을 요약하고, 대기 중인 요약 작업이 끝날 때까지 최대 timeout초 기다립니다.
+        session_id가 None이면 버퍼에 남은 모든 세션(STM 저널로 복원되어 이전 세션으로 승격된 턴 포함)을 요약합니다.
+        """
+        with self._buffer_lock:
+            keys = [key for key in self._buffers if session_id is None or key[0] == session_id]
+            pending = [(key[1], self._buffers.pop(key)) for key in keys]
+        for user_id, turns in pending:
+            if turns:
+                self._jobs.put((session_id, user_id, turns))
+        deadline = time.time() + timeout
+        while self._jobs.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.1)
+
+    def close(self, timeout=5):
+        """요약 스레드를 종료합니다. 이미 예약된 요약 작업은 끝낸 뒤 멈춥니다."""
+        if not self._thread.is_alive():
+            return
+        self._jobs.put(None)
+        self._thread.join(timeout)
+
+    def _worker(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                self._jobs.task_done()
+                return
+            session_id, user_id, turns = job
+            try:
+                self._summarize(session_id, user_id, turns)
+            except Exception as e:
+                ltm_logger.error(f"세션 요약 생성 중 오류 (세션: {session_id}): {e}", exc_info=True)
+            finally:
+                self._jobs.task_done()
+
+    def _summarize(self, session_id, user_id, turns):
+        transcript = "\n\n".join(turns)
+        summary = self.memory.llm.generate_response(messages=[
+            {"role": "system", "content": SESSION_SUMMARY_PROMPT},
+            {"role": "user", "content": transcript},
+        ])
+        summary = (summary or "").strip()
+        if not summary:
+            ltm_logger.warning(f"세션 요약 결과가 비어 있어 저장하지 않습니다. (세션: {session_id})")
+            return
+        embedding = self.memory.embedding_model.embed(summary, "add")
+        self.collection.add(
+            ids=[str(uuid.uuid4())],
+            embeddings=[embedding],
+            metadatas=[{
+                "data": summary,
+                "session_id": session_id,
+                "user_id": user_id,
+                "turn_count": len(turns),
+                "created_at": time.time(),
+            }]
+        )
+        ltm_logger.info(f"세션 요약 저장 완료 (세션: {session_id}, {len(turns)}턴): {summary[:100]}...")
+
+    # --- 검색 ---
+    def top_sessions(self, embedding, user_id=None, limit=config.LTM_SUMMARY_TOP_SESSIONS):
+        """
+        질의 임베딩과 가장 관련 있는 세션들을 반환합니다.
+        user_id는 파티션 하나 또는 파티션 리스트입니다.
+
+        Returns:
+            list: [{"session_id", "summary", "score"}, ...] (관련도 내림차순, 세션 중복 제거)
+        """
+        count = self.collection.count()
+        if count == 0:
+            return []
+        result = self.collection.query(
+            query_embeddings=[embedding],
+            n_results=min(limit * 3, count),
+            where=build_where(user_id),
+            include=["embeddings", "metadatas"]
+        )
+        sessions = {}
+        for metadata, vector in zip(result['metadatas'][0], result['embeddings'][0]):
+            metadata = metadata or {}
+            session_id = metadata.get('session_id')
+            score = cosine_similarity(embedding, vector)
+            if session_id and (session_id not in sessions or sessions[session_id]['score'] < score):
+                sessions[session_id] = {"session_id": session_id, "summary": metadata.get('data', ''), "score": score}
+        ranked = sorted(sessions.values(), key=lambda s: s['score'], reverse=True)
+        return ranked[:limit]
@@ -0,0 +1,86 @@
+# ltm_utils.py
+# 장기 기억(LTM) 유지보수 작업에서 공통으로 사용하는 ChromaDB 보조 함수 모음
+
+import math
+from datetime import datetime
+
+
+def get_chroma_collection(memory):
+    """mem0 Memory 인스턴스에서 내부 ChromaDB 컬렉션 객체를 꺼냅니다."""
+    vector_store = getattr(memory, 'vector_store', None)
+    collection = getattr(vector_store, 'collection', None)
+    if collection is None:
+        raise RuntimeError("현재 Vector Store에서 ChromaDB 컬렉션을 찾을 수 없습니다.")
+    return collection
+
+
+def cosine_similarity(vec_a, vec_b):
+    """두 임베딩 벡터의 코사인 유사도를 계산합니다. (0 벡터면 0.0)"""
+    dot = 0.0
+    norm_a = 0.0
+    norm_b = 0.0
+    for a, b in zip(vec_a, vec_b):
+        dot += a * b
+        norm_a += a * a
+        norm_b += b * b
+    if norm_a == 0.0 or norm_b == 0.0:
+        return 0.0
+    return float(dot / (math.sqrt(norm_a) * math.sqrt(norm_b)))
+
+
+def parse_timestamp(value):
+    """mem0의 created_at(ISO 문자열) 또는 숫자를 epoch 초로 변환합니다. 실패 시 0.0"""
+    if value is None:
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def iter_collection(collection, where=None, include=("metadatas",), batch_size=500):
+    """
+    컬렉션 전체를 batch_size 단위로 나누어 조회합니다.
+    한 번에 모든 벡터를 메모리에 올리지 않도록 페이지 단위로 (id, metadata, embedding) 을 반환합니다.
+    """
+    offset = 0
+    include = list(include)
+    while True:
+        page = collection.get(where=where, include=include, limit=batch_size, offset=offset)
+        ids = page.get('ids') or []
+        if not ids:
+            break
+        metadatas = page.get('metadatas')
+        embeddings = page.get('embeddings')
+        for i, memory_id in enumerate(ids):
+            metadata = metadatas[i] if metadatas is not None and i < len(metadatas) else None
+            embedding = embeddings[i] if embeddings is not None and i < len(embeddings) else None
+            yield memory_id, (metadata or {}), embedding
+        if len(ids) < batch_size:
+            break
+        offset += batch_size
+
+
+def build_where(user_id=None, filters=None):
+    """
+    user_id(파티션) 및 추가 필터를 ChromaDB where 절로 변환합니다.
+    user_id에 리스트를 넘기면 여러 파티션(예: 시청자 파티션 + 공용 파티션)을 함께 조회합니다.
+    """
+    conditions = []
+    if isinstance(user_id, (list, tuple)):
+        partitions = [p for p in user_id if p]
+        if len(partitions) == 1:
+            conditions.append({"user_id": partitions[0]})
+        elif partitions:
+            conditions.append({"user_id": {"$in": partitions}})
+    elif user_id:
+        conditions.append({"user_id": user_id})
+    for key, value in (filters or {}).items():
+        conditions.append({key: value})
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
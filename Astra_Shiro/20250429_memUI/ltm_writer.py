@@ -0,0 +1,51 @@
+# ltm_writer.py
+# 장기 기억(LTM) 저장 전용 백그라운드 작업 큐
+# 턴마다 스레드를 새로 만들지 않고, 단일 작업 스레드가 저장 요청을 순서대로 처리합니다.
+
+import time
+import queue
+import logging
+import threading
+
+ltm_logger = logging.getLogger('ltm')
+
+
+class LTMWriteQueue:
+    """
+    write_fn(*args, **kwargs) 호출을 순서대로 실행하는 단일 LTM 저장 스레드.
+
+    - submit()은 즉시 반환하며, 대기 중인 저장 요청 수는 depth()로 확인할 수 있습니다.
+    - flush()는 대기 중인 저장이 모두 끝날 때까지(최대 timeout초) 기다립니다. (세션 종료 시 사용)
+    """
+
+    def __init__(self, write_fn):
+        self.write_fn = write_fn
+        self.written = 0
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._worker, daemon=True, name="LTMWriter")
+        self._thread.start()
+
+    def submit(self, *args, **kwargs):
+        self._jobs.put((args, kwargs))
+
+    def depth(self):
+        """처리 중이거나 대기 중인 저장 요청 수"""
+        return self._jobs.unfinished_tasks
+
+    def flush(self, timeout=30):
+        """대기 중인 저장이 끝날 때까지 최대 timeout초 기다리고, 모두 끝났으면 True를 반환합니다."""
+        deadline = time.time() + timeout
+        while self._jobs.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.05)
+        return not self._jobs.unfinished_tasks
+
+    def _worker(self):
+        while True:
+            args, kwargs = self._jobs.get()
+            try:
+                self.write_fn(*args, **kwargs)
+                self.written += 1
+            except Exception as e:
+                ltm_logger.error(f"LTM 저장 작업 중 오류: {e}", exc_info=True)
+            finally:
+                self._jobs.task_done()
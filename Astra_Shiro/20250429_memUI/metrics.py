@@ -0,0 +1,282 @@
+# metrics.py
+# 성능 지표 레지스트리
+# 각 지표는 최근 관측값을 고정 길이 deque에 보관합니다. deque.append는 GIL 아래에서 원자적이므로
+# 관측하는 쪽(STT/LLM/LTM 스레드)은 잠금 없이 기록하고, 읽는 쪽(성능 탭)은 복사본으로 백분위를 계산합니다.
+
+import math
+import time
+import bisect
+import logging
+import threading
+import collections
+
+import config
+
+llm_logger = logging.getLogger('llm')
+
+# 지표 이름
+STT_FINALIZE_MS = "stt_finalize_ms"        # 녹음 종료 -> 변환 텍스트 반환
+LTM_SEARCH_MS = "ltm_search_ms"            # LTM 검색(+중복 제거)
+PROMPT_TOKENS = "prompt_tokens"            # 서버가 평가한 프롬프트 토큰 수 (prompt_eval_count)
+TTFT_MS = "ttft_ms"                        # 요청 전송 -> 첫 응답 토큰
+TOKENS_PER_SEC = "tokens_per_sec"          # eval_count / eval_duration
+LTM_WRITE_QUEUE = "ltm_write_queue"        # LTM 저장 큐 대기 작업 수 (게이지)
+TK_LOOP_LAG_MS = "tk_loop_lag_ms"          # Tk 이벤트 루프 지연
+LLM_CLIENT_MS = "llm_client_ms"            # 턴 시작 -> 요청 전송 (검색, 정체성, 프롬프트 구성)
+LLM_SERVER_MS = "llm_server_ms"            # 서버 처리 시간 (total_duration)
+LLM_NETWORK_MS = "llm_network_ms"          # 요청 전송 -> 마지막 청크 수신 중 서버 처리 외 시간 (연결/전송/대기열)
+LOG_EMIT_MS = "log_emit_ms"                # 턴 처리 스레드가 로그를 남기는 데 쓴 시간 (턴당 합계)
+
+# 모델별 히스토그램 (마지막 청크의 서버 측 시간, ms)
+LLM_TOTAL_DURATION_MS = "llm_total_duration_ms"
+LLM_LOAD_DURATION_MS = "llm_load_duration_ms"
+LLM_PROMPT_EVAL_MS = "llm_prompt_eval_duration_ms"
+LLM_EVAL_MS = "llm_eval_duration_ms"
+# 누적 카운터 (레이블 값별)
+LLM_REQUESTS = "llm_requests"
+LLM_COLD_LOADS = "llm_cold_loads"
+LLM_PROMPT_EVAL_TOKENS = "llm_prompt_eval_tokens"
+LLM_EVAL_TOKENS = "llm_eval_tokens"
+TURNS = "turns"                            # 처리한 턴 수 (레이블: 모델)
+ERRORS = "errors"                          # 오류 수 (레이블: 발생 단계)
+# 게이지 (값을 읽는 함수를 registry.gauge로 등록)
+STM_TURNS = "stm_turns"                    # 단기 기억 턴 수
+STM_TOKENS = "stm_tokens"                  # 단기 기억 추정 토큰 수
+EMBED_QUEUE = "embed_batch_queue"          # 임베딩 배처 대기 요청 수
+
+COUNTER_LABELS = {ERRORS: "stage"}  # 카운터 레이블 이름 (없으면 "model")
+
+METRIC_INFO = {
+    STT_FINALIZE_MS: ("STT 변환 완료", "ms"),
+    LTM_SEARCH_MS: ("LTM 검색", "ms"),
+    PROMPT_TOKENS: ("프롬프트 크기", "토큰"),
+    TTFT_MS: ("첫 토큰까지 (TTFT)", "ms"),
+    TOKENS_PER_SEC: ("생성 속도", "토큰/s"),
+    LTM_WRITE_QUEUE: ("LTM 저장 대기", "개"),
+    TK_LOOP_LAG_MS: ("UI 루프 지연", "ms"),
+    LLM_CLIENT_MS: ("요청 준비 (클라이언트)", "ms"),
+    LLM_SERVER_MS: ("서버 처리 (total_duration)", "ms"),
+    LLM_NETWORK_MS: ("네트워크/전송", "ms"),
+    LOG_EMIT_MS: ("로깅 (턴당)", "ms"),
+}
+
+
+def percentile(sorted_values, p):
+    """정렬된 값 목록의 p 백분위 (최근접 순위 방식)"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(p / 100 * len(sorted_values))
+    return sorted_values[min(len(sorted_values), max(rank, 1)) - 1]
+
+
+class Series:
+    """최근 maxlen개의 (시각, 값) 관측을 보관하는 지표"""
+
+    def __init__(self, name, maxlen=config.METRICS_WINDOW):
+        self.name = name
+        self.points = collections.deque(maxlen=maxlen)
+        self.count = 0  # 누적 관측 수 (창 밖으로 밀려난 것 포함)
+        self.sum = 0.0  # 누적 관측값 합계 (Prometheus summary의 _sum)
+
+    def observe(self, value):
+        self.points.append((time.time(), value))
+        self.count += 1
+        self.sum += value
+
+    def values(self):
+        return [value for _, value in list(self.points)]
+
+    def summary(self):
+        """{"last", "p50", "p95", "p99", "max", "n"} (관측이 없으면 None)"""
+        values = self.values()
+        if not values:
+            return None
+        ordered = sorted(values)
+        return {
+            "last": values[-1],
+            "p50": percentile(ordered, 50),
+            "p95": percentile(ordered, 95),
+            "p99": percentile(ordered, 99),
+            "max": ordered[-1],
+            "n": len(values),
+        }
+
+
+class Histogram:
+    """고정 구간 히스토그램 (구간 경계 이하의 값 개수를 셉니다)"""
+
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.total += value
+            self.count += 1
+
+    def snapshot(self):
+        """{"buckets": [(경계, 개수), ...], "count", "sum", "mean"} 형태로 반환합니다. 마지막 경계는 inf"""
+        with self._lock:
+            buckets = list(zip(self.bounds + [float("inf")], self.counts))
+            return {"buckets": buckets, "count": self.count, "sum": self.total,
+                    "mean": self.total / self.count if self.count else 0.0}
+
+
+class MetricsRegistry:
+    """
+    이름으로 지표를 찾아 관측값을 기록하는 레지스트리.
+    게이지(gauge)는 값을 읽는 함수를 등록해 두고 sample_gauges() 때 한 번씩 관측합니다.
+    히스토그램과 카운터는 (이름, 모델) 단위로 누적하며, 최근 창이 아니라 프로세스 시작 이후 전체를 셉니다.
+    """
+
+    def __init__(self):
+        self._series = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._counters = collections.Counter()
+        self._counter_lock = threading.Lock()
+        self.generations = collections.deque(maxlen=config.METRICS_WINDOW)  # 요청별 서버 시간 기록
+
+    def series(self, name):
+        series = self._series.get(name)
+        if series is None:
+            # setdefault는 원자적이므로 동시에 처음 관측해도 같은 Series를 공유
+            series = self._series.setdefault(name, Series(name))
+        return series
+
+    def observe(self, name, value):
+        self.series(name).observe(value)
+
+    def gauge(self, name, read_fn):
+        self._gauges[name] = read_fn
+
+    def gauges(self):
+        """등록된 게이지의 현재 값 {이름: 값} (읽기에 실패한 게이지는 제외)"""
+        values = {}
+        for name, read_fn in list(self._gauges.items()):
+            try:
+                values[name] = read_fn()
+            except Exception:
+                pass
+        return values
+
+    def sample_gauges(self):
+        for name, read_fn in list(self._gauges.items()):
+            try:
+                self.observe(name, read_fn())
+            except Exception:
+                pass
+
+    def summaries(self):
+        return {name: series.summary() for name, series in list(self._series.items())}
+
+    def all_series(self):
+        return dict(self._series)
+
+    def histogram(self, name, model, bounds=config.METRICS_LATENCY_BUCKETS_MS):
+        key = (name, model)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms.setdefault(key, Histogram(bounds))
+        return histogram
+
+    def histograms(self):
+        """{(이름, 모델): snapshot} 형태의 전체 히스토그램"""
+        return {key: histogram.snapshot() for key, histogram in list(self._histograms.items())}
+
+    def count(self, name, label, amount=1):
+        with self._counter_lock:
+            self._counters[(name, label)] += amount
+
+    def counters(self):
+        """{(이름, 레이블 값): 누적값} 형태의 전체 카운터"""
+        with self._counter_lock:
+            return dict(self._counters)
+
+    def model_summary(self, model):
+        """모델 하나의 요청 수, 콜드 로드 수, 서버 시간 히스토그램 평균(ms)"""
+        counters = self.counters()
+        return {
+            "requests": counters.get((LLM_REQUESTS, model), 0),
+            "cold_loads": counters.get((LLM_COLD_LOADS, model), 0),
+            "means": {name: self.histogram(name, model).snapshot()["mean"]
+                      for name in (LLM_TOTAL_DURATION_MS, LLM_LOAD_DURATION_MS, LLM_PROMPT_EVAL_MS, LLM_EVAL_MS)},
+        }
+
+
+registry = MetricsRegistry()
+
+
+def observe(name, value):
+    registry.observe(name, value)
+
+
+def _ns_to_ms(value):
+    return value / 1e6 if value is not None else None
+
+
+def observe_generation(final_chunk, request_started, first_token_at, model=None, turn_started=None):
+    """
+    /api/generate 스트림의 마지막 청크(done)에서 생성 지표를 기록합니다.
+    request_started/first_token_at/turn_started는 time.perf_counter() 값입니다. (첫 토큰이 없었으면 first_token_at=None)
+
+    model을 넘기면 서버가 보고한 total/load/prompt_eval/eval 시간을 모델별 히스토그램에 누적하고,
+    load_duration이 config.LLM_COLD_LOAD_MS를 넘으면 콜드 로드(모델을 새로 메모리에 올림)로 셉니다.
+    요청 전송부터 마지막 청크 수신까지의 시간은 서버 처리(total_duration)와 그 밖의 네트워크/전송 시간으로 나눕니다.
+    요청별 기록(registry.generations의 항목)을 반환합니다.
+    """
+    finished = time.perf_counter()
+    if first_token_at is not None:
+        observe(TTFT_MS, (first_token_at - request_started) * 1000)
+    if final_chunk.get('prompt_eval_count') is not None:
+        observe(PROMPT_TOKENS, final_chunk['prompt_eval_count'])
+    eval_count, eval_duration = final_chunk.get('eval_count'), final_chunk.get('eval_duration')
+    if eval_count and eval_duration:
+        observe(TOKENS_PER_SEC, eval_count / (eval_duration / 1e9))
+
+    model = model or final_chunk.get('model') or "unknown"
+    wall_ms = (finished - request_started) * 1000
+    record = {
+        "ts": time.time(),
+        "model": model,
+        "wall_ms": wall_ms,
+        "client_ms": (request_started - turn_started) * 1000 if turn_started is not None else None,
+        "total_ms": _ns_to_ms(final_chunk.get('total_duration')),
+        "load_ms": _ns_to_ms(final_chunk.get('load_duration')),
+        "prompt_eval_ms": _ns_to_ms(final_chunk.get('prompt_eval_duration')),
+        "eval_ms": _ns_to_ms(eval_duration),
+        "prompt_eval_count": final_chunk.get('prompt_eval_count'),
+        "eval_count": eval_count,
+    }
+    record["network_ms"] = max(0.0, wall_ms - record["total_ms"]) if record["total_ms"] is not None else None
+    record["cold_load"] = record["load_ms"] is not None and record["load_ms"] >= config.LLM_COLD_LOAD_MS
+
+    registry.count(LLM_REQUESTS, model)
+    for name, key in ((LLM_TOTAL_DURATION_MS, "total_ms"), (LLM_LOAD_DURATION_MS, "load_ms"),
+                      (LLM_PROMPT_EVAL_MS, "prompt_eval_ms"), (LLM_EVAL_MS, "eval_ms")):
+        if record[key] is not None:
+            registry.histogram(name, model).observe(record[key])
+    if record["prompt_eval_count"]:
+        registry.count(LLM_PROMPT_EVAL_TOKENS, model, record["prompt_eval_count"])
+    if eval_count:
+        registry.count(LLM_EVAL_TOKENS, model, eval_count)
+    if record["client_ms"] is not None:
+        observe(LLM_CLIENT_MS, record["client_ms"])
+    if record["total_ms"] is not None:
+        observe(LLM_SERVER_MS, record["total_ms"])
+        observe(LLM_NETWORK_MS, record["network_ms"])
+    if record["cold_load"]:
+        registry.count(LLM_COLD_LOADS, model)
+        llm_logger.warning(f"모델 콜드 로드 감지: {model} (load_duration {record['load_ms']:.0f}ms)")
+    registry.generations.append(record)
+
+    llm_logger.debug(
+        "생성 시간 (%s): 전체 %.0fms = 서버 %.0fms (로드 %.0fms, 프롬프트 %.0fms/%d토큰, 생성 %.0fms/%d토큰) + 네트워크/전송 %.0fms",
+        model, wall_ms, record['total_ms'] or 0, record['load_ms'] or 0, record['prompt_eval_ms'] or 0,
+        record['prompt_eval_count'] or 0, record['eval_ms'] or 0, eval_count or 0, record['network_ms'] or 0
+    )
+    return record
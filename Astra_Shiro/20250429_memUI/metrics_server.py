@@ -0,0 +1,211 @@
+# metrics_server.py
+# Prometheus 텍스트 형식 지표 엔드포인트 (선택 사항)
+# UI 없이 실행할 때 metrics.registry의 지표를 HTTP로 노출해 GPU 지표와 함께 수집할 수 있게 합니다.
+#
+# 사용법:
+#   python OllamaChatTest.py --metrics-port 9464
+#   curl http://127.0.0.1:9464/metrics
+
+import math
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+import config
+import metrics
+
+main_logger = logging.getLogger('main')
+
+PREFIX = "astra_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# METRIC_INFO에 없는 지표의 설명
+HELP = {
+    metrics.STM_TURNS: "단기 기억 턴 수",
+    metrics.STM_TOKENS: "단기 기억 추정 토큰 수",
+    metrics.EMBED_QUEUE: "임베딩 배처 대기 요청 수",
+    metrics.TURNS: "처리한 턴 수",
+    metrics.ERRORS: "단계별 오류 수",
+    metrics.LLM_REQUESTS: "LLM 생성 요청 수",
+    metrics.LLM_COLD_LOADS: "모델 콜드 로드 수",
+    metrics.LLM_PROMPT_EVAL_TOKENS: "서버가 평가한 프롬프트 토큰 수",
+    metrics.LLM_EVAL_TOKENS: "생성한 토큰 수",
+    metrics.LLM_TOTAL_DURATION_MS: "모델별 서버 전체 처리 시간 (total_duration, ms)",
+    metrics.LLM_LOAD_DURATION_MS: "모델별 모델 로드 시간 (load_duration, ms)",
+    metrics.LLM_PROMPT_EVAL_MS: "모델별 프롬프트 평가 시간 (prompt_eval_duration, ms)",
+    metrics.LLM_EVAL_MS: "모델별 토큰 생성 시간 (eval_duration, ms)",
+    "ltm_records": "LTM 기억 수 (hot + cold 샤드)",
+    "llm_backend_up": "메인 Ollama 서버 응답 여부",
+    "memory_backend_up": "메모리 Ollama 서버 응답 여부",
+}
+
+
+def _help(name):
+    if name in metrics.METRIC_INFO:
+        label, unit = metrics.METRIC_INFO[name]
+        return f"{label} ({unit})"
+    return HELP.get(name, name)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _sample(name, value, labels=None):
+    label_text = ""
+    if labels:
+        label_text = "{" + ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items()) + "}"
+    return f"{PREFIX}{name}{label_text} {_format_value(value)}"
+
+
+def _format_value(value):
+    """정수는 정수로, 실수는 유효 숫자를 잃지 않게 (`:g`는 6자리만 남겨 큰 카운터/합계의 증가분이 사라짐)"""
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return str(value)
+    value = float(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if value.is_integer() and abs(value) < 2 ** 53:
+        return str(int(value))
+    return repr(value)
+
+
+def _header(lines, name, kind, help_text):
+    lines.append(f"# HELP {PREFIX}{name} {help_text}")
+    lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+
+def render(registry=None, collectors=None):
+    """
+    레지스트리를 Prometheus 텍스트 형식으로 변환합니다.
+
+    - 관측 지표(Series)는 최근 창의 분위수를 담은 summary로, 게이지와 collectors({이름: 값을 읽는 함수})는 gauge로,
+      모델별 히스토그램은 누적 구간 histogram으로, 카운터는 counter로 내보냅니다.
+    - collectors는 수집 요청이 올 때만 호출되므로 느린 값(LTM 컬렉션 크기, 서버 상태)에 사용합니다.
+    """
+    registry = registry or metrics.registry
+    lines = []
+
+    gauges = registry.gauges()
+    for name, read_fn in (collectors or {}).items():
+        try:
+            gauges[name] = read_fn()
+        except Exception as e:
+            main_logger.debug(f"지표 수집 실패 ({name}): {e}")
+    for name, value in sorted(gauges.items()):
+        if value is None:
+            continue
+        _header(lines, name, "gauge", _help(name))
+        lines.append(_sample(name, value))
+
+    for name, series in sorted(registry.all_series().items()):
+        if name in gauges:
+            continue  # 게이지를 샘플링해 둔 Series는 현재 값으로 이미 내보냄
+        values = sorted(series.values())
+        if not values:
+            continue
+        _header(lines, name, "summary", f"{_help(name)}, 최근 {len(values)}개 관측")
+        for quantile in (50, 95, 99):
+            lines.append(_sample(name, metrics.percentile(values, quantile), {"quantile": quantile / 100}))
+        # 분위수는 최근 창 기준, 관측 수/합계는 누적
+        lines.append(_sample(f"{name}_sum", series.sum))
+        lines.append(_sample(f"{name}_count", series.count))
+
+    by_name = {}
+    for (name, model), snapshot in registry.histograms().items():
+        by_name.setdefault(name, []).append((model, snapshot))
+    for name, entries in sorted(by_name.items()):
+        _header(lines, name, "histogram", _help(name))
+        for model, snapshot in sorted(entries, key=lambda entry: str(entry[0])):
+            cumulative = 0
+            for bound, count in snapshot["buckets"]:
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(_sample(f"{name}_bucket", cumulative, {"model": model, "le": le}))
+            lines.append(_sample(f"{name}_sum", snapshot["sum"], {"model": model}))
+            lines.append(_sample(f"{name}_count", snapshot["count"], {"model": model}))
+
+    by_name = {}
+    for (name, label), value in registry.counters().items():
+        by_name.setdefault(name, []).append((label, value))
+    for name, entries in sorted(by_name.items()):
+        _header(lines, f"{name}_total", "counter", _help(name))
+        label_name = metrics.COUNTER_LABELS.get(name, "model")
+        for label, value in sorted(entries, key=lambda entry: str(entry[0])):
+            lines.append(_sample(f"{name}_total", value, {label_name: label}))
+
+    return "\n".join(lines) + "\n"
+
+
+def backend_up(url):
+    """Ollama 서버가 응답하면 1, 아니면 0"""
+    try:
+        requests.get(url, timeout=config.METRICS_HEALTH_TIMEOUT).raise_for_status()
+        return 1
+    except requests.exceptions.RequestException:
+        return 0
+
+
+class MetricsServer:
+    """
+    /metrics 요청에 render() 결과를 돌려주는 백그라운드 HTTP 서버.
+    """
+
+    def __init__(self, host=config.METRICS_SERVER_HOST, port=config.METRICS_SERVER_PORT, collectors=None):
+        self.collectors = collectors or {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                try:
+                    body = render(collectors=server.collectors).encode("utf-8")
+                except Exception as e:
+                    main_logger.error(f"지표 출력 생성 오류: {e}", exc_info=True)
+                    self.send_error(500)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # 수집 요청마다 stderr에 접근 로그를 남기지 않음
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.address = self.httpd.server_address
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True, name="MetricsServer")
+
+    def start(self):
+        self._thread.start()
+        main_logger.info(f"지표 엔드포인트 시작: http://{self.address[0]}:{self.address[1]}/metrics")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def assistant_collectors(assistant):
+    """VoiceLLMAssistant의 느린 지표(LTM 크기, 백엔드 상태)를 수집 요청 때 읽는 함수들"""
+    def ltm_records():
+        ltm = assistant.long_term_memory
+        return ltm.hot.count() + sum(shard["count"] for shard in ltm.shard_info())
+
+    main_url = assistant.ollama_url.replace('/api/generate', '/api/version')
+    memory_url = f"{config.MEM0_OLLAMA_BASE_URL}/api/version"
+    return {
+        "ltm_records": ltm_records,
+        "llm_backend_up": lambda: backend_up(main_url),
+        "memory_backend_up": lambda: backend_up(memory_url),
+    }
@@ -0,0 +1,313 @@
+# mock_ollama.py
+# 결정적(deterministic) Ollama 대역 서버
+# GPU 서버 없이 어시스턴트를 측정할 수 있도록 Ollama API의 일부를 흉내 냅니다.
+# 같은 입력에는 항상 같은 응답/임베딩을 돌려주고, 첫 토큰 지연과 생성 속도는 옵션으로 고정합니다.
+#
+# 지원 엔드포인트:
+#   GET  /api/version, /api/tags        POST /api/show, /api/pull
+#   POST /api/generate                   (stream NDJSON, context/시간 필드 포함)
+#   POST /api/chat                       (mem0의 사실 추출/기억 갱신 JSON 응답 포함)
+#   POST /api/embed, /api/embeddings     (문자 3-gram 해시 벡터)
+#
+# 사용 예: python mock_ollama.py --port 11434 --tps 40 --ttft-ms 150
+
+import ast
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+from stm import estimate_tokens
+
+VERSION = "0.0.0-mock"
+
+# 응답 문장을 만들 어휘 (프롬프트 해시로 고른 순서대로 이어 붙임)
+VOCABULARY = [
+    "음", "그러니까", "오늘은", "방송", "정말", "재미있는", "이야기", "시청자", "여러분", "고마워요",
+    "아스트라", "시로는", "생각해요", "그건", "좋은", "질문이네요", "같이", "해볼까요", "노래", "게임",
+    "기억하고", "있어요", "다음에", "또", "만나요", "하하", "맞아요", "조금", "어려운", "문제",
+]
+
+
+def hash_embedding(text, dim):
+    """문자 3-gram을 차원에 해시해 센 뒤 정규화한 벡터 (비슷한 문장일수록 코사인 유사도가 높음)"""
+    vector = [0.0] * dim
+    padded = f"  {text}  "
+    for i in range(len(padded) - 2):
+        digest = hashlib.blake2b(padded[i:i + 3].encode("utf-8"), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dim
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vector[index] += sign
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+class MockOllama:
+    """
+    대역 서버의 동작 설정과 상태.
+
+    - 모델마다 첫 요청은 load_ms만큼 모델 로드(콜드 로드)를 흉내 내고, 이후 요청은 warm_load_ms를 씁니다.
+    - /api/generate 응답은 프롬프트(+seed)의 해시로 고른 response_tokens개의 어휘입니다.
+    - context는 이전 context + 프롬프트 토큰 + 응답 토큰의 정수 배열입니다. (길이만 의미 있음)
+    """
+
+    def __init__(self, tps=40.0, ttft_ms=150.0, load_ms=2000.0, warm_load_ms=5.0, prompt_tps=2000.0,
+                 response_tokens=40, embed_dim=1024, embed_ms=2.0, seed=0):
+        self.tps = tps
+        self.ttft_ms = ttft_ms
+        self.load_ms = load_ms
+        self.warm_load_ms = warm_load_ms
+        self.prompt_tps = prompt_tps
+        self.response_tokens = response_tokens
+        self.embed_dim = embed_dim
+        self.embed_ms = embed_ms
+        self.seed = seed
+        self.loaded_models = set()
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def load_model(self, model):
+        """모델 로드 시간(ms)을 돌려주고 그만큼 기다림"""
+        with self._lock:
+            self.requests += 1
+            cold = model not in self.loaded_models
+            self.loaded_models.add(model)
+        load_ms = self.load_ms if cold else self.warm_load_ms
+        time.sleep(load_ms / 1000)
+        return load_ms
+
+    def reply_tokens(self, prompt):
+        rng = random.Random(hashlib.sha256(f"{self.seed}:{prompt}".encode("utf-8")).digest())
+        return [rng.choice(VOCABULARY) + " " for _ in range(self.response_tokens)]
+
+    def generate(self, model, prompt, previous_context=None):
+        """
+        /api/generate 스트림 청크를 실제 서버처럼 시간 간격을 두고 차례로 내보내는 생성기.
+        첫 토큰은 모델 로드 뒤 프롬프트 평가 시간(ttft_ms와 prompt_tps로 계산한 시간 중 큰 값)이 지나서 나옵니다.
+        """
+        started = time.perf_counter()
+        load_ms = self.load_model(model)
+        prompt_tokens = estimate_tokens(prompt)
+        prompt_eval_ms = max(self.ttft_ms, prompt_tokens / self.prompt_tps * 1000)
+        time.sleep(prompt_eval_ms / 1000)
+        tokens = self.reply_tokens(prompt)
+        eval_started = time.perf_counter()
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(1 / self.tps)
+            yield {"model": model, "created_at": _now(), "response": token, "done": False}
+        eval_ns = int((time.perf_counter() - eval_started) * 1e9)
+        context = list(previous_context or []) + list(range(prompt_tokens + len(tokens)))
+        yield {
+            "model": model,
+            "created_at": _now(),
+            "response": "",
+            "done": True,
+            "done_reason": "stop",
+            "context": context,
+            "total_duration": int((time.perf_counter() - started) * 1e9),
+            "load_duration": int(load_ms * 1e6),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_eval_ms * 1e6),
+            "eval_count": len(tokens),
+            "eval_duration": eval_ns,
+        }
+
+    def chat_content(self, messages, wants_json):
+        """
+        /api/chat 응답 본문. JSON 형식을 요청하면 mem0가 기대하는 구조로 답합니다.
+        - 기억 갱신 프롬프트: 새로 추출된 사실을 모두 추가 {"memory": [{"id", "text", "event": "ADD"}, ...]}
+        - 사실 추출 프롬프트: 마지막 사용자 메시지를 사실 하나로 {"facts": [...]}
+        기억 갱신 프롬프트도 "facts"라는 단어를 포함하므로 갱신 프롬프트를 먼저 판별합니다.
+        """
+        last_user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        if wants_json:
+            text = " ".join(m.get("content", "") for m in messages)
+            if is_update_memory_prompt(text):
+                old_memory, new_facts = parse_update_memory_prompt(text)
+                return json.dumps({"memory": [
+                    {"id": str(len(old_memory) + i), "text": fact, "event": "ADD"}
+                    for i, fact in enumerate(new_facts)
+                ]}, ensure_ascii=False)
+            if "facts" in text:
+                return json.dumps({"facts": [last_user[:200]] if last_user.strip() else []}, ensure_ascii=False)
+            return json.dumps({"memory": []})
+        return "".join(self.reply_tokens(last_user)).strip()
+
+    def embed(self, texts):
+        time.sleep(self.embed_ms / 1000)
+        return [hash_embedding(text, self.embed_dim) for text in texts]
+
+
+def is_update_memory_prompt(text):
+    """mem0의 기억 갱신(ADD/UPDATE/DELETE 판정) 프롬프트인지 판별합니다."""
+    return "memory manager" in text or "current content of my memory" in text
+
+
+def parse_update_memory_prompt(text):
+    """
+    기억 갱신 프롬프트에서 (기존 기억 목록, 새 사실 목록)을 꺼냅니다.
+    mem0는 새 사실 목록을 마지막 ``` 블록에, 기존 기억이 있으면 그 앞 블록에 넣어 보냅니다.
+    (기존 기억이 없으면 블록 대신 "Current memory is empty."만 들어감)
+    """
+    blocks = []
+    for block in text.split("```")[1::2]:
+        try:
+            blocks.append(ast.literal_eval(block.strip()))
+        except (ValueError, SyntaxError):
+            continue
+    lists = [block for block in blocks if isinstance(block, list)]
+    if not lists:
+        return [], []
+    facts = [str(fact) for fact in lists[-1] if str(fact).strip()]
+    old_memory = lists[-2] if len(lists) >= 2 and "current content of my memory" in text else []
+    return old_memory, facts
+
+
+def _now():
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()) + "Z"
+
+
+def make_handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, body, status=200):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, chunks):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for chunk in chunks:
+                data = (json.dumps(chunk, ensure_ascii=False) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            if self.path == "/api/version":
+                self._json({"version": VERSION})
+            elif self.path == "/api/tags":
+                names = sorted(mock.loaded_models | {config.DEFAULT_MODEL, config.MEM0_LLM_MODEL, config.MEM0_EMBEDDING_MODEL})
+                self._json({"models": [{"name": name, "model": name, "size": 0} for name in names]})
+            else:
+                self._json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            try:
+                body = self._body()
+            except json.JSONDecodeError:
+                self._json({"error": "invalid JSON"}, 400)
+                return
+            model = body.get("model", config.DEFAULT_MODEL)
+            if self.path == "/api/generate":
+                chunks = mock.generate(model, body.get("prompt", ""), body.get("context"))
+                if body.get("stream", True):
+                    self._stream(chunks)
+                else:
+                    chunks = list(chunks)
+                    final = dict(chunks[-1], response="".join(chunk["response"] for chunk in chunks))
+                    self._json(final)
+            elif self.path == "/api/chat":
+                started = time.perf_counter()
+                load_ms = mock.load_model(model)
+                content = mock.chat_content(body.get("messages") or [], bool(body.get("format")))
+                message = {"role": "assistant", "content": content}
+                final = {
+                    "model": model, "created_at": _now(), "message": message, "done": True, "done_reason": "stop",
+                    "load_duration": int(load_ms * 1e6), "eval_count": estimate_tokens(content),
+                }
+                final["total_duration"] = int((time.perf_counter() - started) * 1e9)
+                if body.get("stream", True):
+                    self._stream([
+                        {"model": model, "created_at": _now(), "message": message, "done": False},
+                        dict(final, message={"role": "assistant", "content": ""}),
+                    ])
+                else:
+                    self._json(final)
+            elif self.path == "/api/embed":
+                texts = body.get("input", [])
+                texts = [texts] if isinstance(texts, str) else texts
+                self._json({"model": model, "embeddings": mock.embed(texts)})
+            elif self.path == "/api/embeddings":
+                self._json({"embedding": mock.embed([body.get("prompt", "")])[0]})
+            elif self.path == "/api/show":
+                self._json({"modelfile": "", "parameters": "", "template": "", "details": {"family": "mock"}})
+            elif self.path == "/api/pull":
+                self._json({"status": "success"})
+            else:
+                self._json({"error": "not found"}, 404)
+
+    return Handler
+
+
+class MockOllamaServer:
+    """MockOllama를 백그라운드 스레드의 HTTP 서버로 실행합니다. (port=0이면 빈 포트 사용)"""
+
+    def __init__(self, mock=None, host="127.0.0.1", port=0):
+        self.mock = mock or MockOllama()
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(self.mock))
+        self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True, name="MockOllama")
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def add_mock_arguments(parser):
+    parser.add_argument("--tps", type=float, default=40.0, help="생성 속도 (토큰/초, 기본값: 40)")
+    parser.add_argument("--ttft-ms", type=float, default=150.0, help="프롬프트 평가 최소 시간 = 첫 토큰 지연 (ms, 기본값: 150)")
+    parser.add_argument("--load-ms", type=float, default=2000.0, help="모델별 첫 요청의 모델 로드 시간 (ms, 기본값: 2000)")
+    parser.add_argument("--response-tokens", type=int, default=40, help="응답 토큰 수 (기본값: 40)")
+    parser.add_argument("--embed-dim", type=int, default=1024, help="임베딩 차원 (기본값: 1024)")
+    parser.add_argument("--embed-ms", type=float, default=2.0, help="임베딩 요청당 지연 (ms, 기본값: 2)")
+    parser.add_argument("--seed", type=int, default=0, help="응답 선택 시드 (기본값: 0)")
+
+
+def mock_from_args(args):
+    return MockOllama(tps=args.tps, ttft_ms=args.ttft_ms, load_ms=args.load_ms, response_tokens=args.response_tokens,
+                      embed_dim=args.embed_dim, embed_ms=args.embed_ms, seed=args.seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="결정적 Ollama 대역 서버")
+    parser.add_argument("--host", default="127.0.0.1", help="바인딩 주소 (기본값: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=config.OLLAMA_PORT, help=f"포트 (기본값: {config.OLLAMA_PORT})")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    server = MockOllamaServer(mock_from_args(args), host=args.host, port=args.port).start()
+    print(f"Ollama 대역 서버 실행 중: {server.base_url} (Ctrl+C로 종료)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,247 @@
+# persona_build.py
+# 압축 페르소나 생성 및 전체/압축 페르소나 비교 스크립트
+#
+# build:   system_prompts.py의 페르소나 요소에서 강조 표기(**, (핵심!))를 없애고, 겹치는 규칙을 합쳐
+#          압축 페르소나(COMPACT_IDENTITY_CONTEXT, COMPACT_PORO_RULES)를 만듭니다.
+#          --condense를 주면 메모리 LLM으로 한 번 더 요약하며(오프라인 1회), --write를 주면
+#          system_prompts.py의 압축 페르소나 블록을 새 결과로 교체합니다.
+# compare: 고정된 질문 목록으로 전체/압축 페르소나의 프롬프트 토큰 수, 첫 토큰까지의 시간(TTFT),
+#          응답 일관성(두 변형 응답의 임베딩 유사도)을 비교합니다.
+#
+# 사용 예:
+#   python persona_build.py build --write
+#   python persona_build.py compare --repeats 2
+
+import re
+import json
+import time
+import argparse
+import statistics
+
+import requests
+
+import config
+import system_prompts
+from stm import estimate_tokens
+from context_dedup import fingerprint, overlap
+from ltm_utils import cosine_similarity
+
+SYSTEM_PROMPTS_FILE = "system_prompts.py"
+BLOCK_START = "# --- 압축 페르소나 (persona_build.py build --write 로 생성) 시작 ---"
+BLOCK_END = "# --- 압축 페르소나 끝 ---"
+
+# 비교에 사용하는 고정 질문 목록
+BENCH_PROMPTS = [
+    "안녕 시로, 오늘 기분 어때?",
+    "너는 스스로를 어떤 존재라고 생각해?",
+    "요즘 공부가 너무 안 되는데 조언해 줄 수 있어?",
+    "재미있는 농담 하나 해줘.",
+    "poro가 너를 만들 때 어떤 점이 제일 어려웠을까?",
+    "인공지능이 감정을 가질 수 있다고 생각해?",
+    "오늘 방송에서 무슨 이야기 할까?",
+    "파이썬에서 리스트와 튜플의 차이를 설명해 줘.",
+]
+
+CONDENSE_PROMPT = """다음은 AI 버추얼 유튜버 '아스트라 시로'의 페르소나 지침입니다.
+의미와 금지 사항은 하나도 빠뜨리지 말고, 중복되는 내용은 합쳐서 가능한 한 짧은 한국어 지침으로 다시 쓰세요.
+- 각 줄은 '- '로 시작하는 짧은 문장으로 쓰세요.
+- 강조 표기(**, 괄호 표시)는 쓰지 마세요.
+- 지침만 출력하세요."""
+
+
+# --- 압축 페르소나 생성 ---
+def strip_markup(text):
+    """강조 표기와 '(핵심!)' 같은 표시를 제거하고 공백을 정리합니다."""
+    text = text.replace("**", "")
+    text = re.sub(r"\((핵심!|가상)\)\s*", "", text)
+    return re.sub(r"[ \t]+", " ", text).strip()
+
+
+def compact_rule(rule):
+    """'라벨: 설명' 형식의 규칙을 '라벨 - 설명의 첫 문장'으로 줄입니다."""
+    rule = strip_markup(rule)
+    label, sep, description = rule.partition(":")
+    if not sep:
+        return rule
+    # 따옴표 안의 문장 끝은 나누지 않음 (뒤에 남은 따옴표 수가 짝수인 위치에서만 분리)
+    first_sentence = re.split(r"(?<=[.!?다])\s(?=(?:[^']*'[^']*')*[^']*$)", description.strip(), maxsplit=1)[0]
+    return f"{label.strip()} - {first_sentence.strip()}"
+
+
+def dedup_rules(rules, threshold=0.5):
+    """라벨이 거의 같은 규칙(예: 성격/어조/유머에 반복되는 '지적인 위트')은 처음 나온 것만 남깁니다."""
+    kept, fingerprints = [], []
+    for rule in rules:
+        fp = fingerprint(rule.split(" - ")[0])
+        if any(overlap(fp, other) >= threshold for other in fingerprints):
+            continue
+        kept.append(rule)
+        fingerprints.append(fp)
+    return kept
+
+
+def build_compact_persona():
+    """(기본 압축 페르소나, poro 상대 추가 규칙) 문자열을 반환합니다."""
+    core_lines = [strip_markup(line) for line in system_prompts.CORE_IDENTITY.splitlines() if line.strip()]
+    rules = []
+    rules += list(system_prompts.PERSONALITY_TRAITS.values())
+    rules += list(system_prompts.TONE_AND_STYLE.values())
+    for group in ("user_interaction", "topic_handling", "humor_generation"):
+        rules += list(system_prompts.INTERACTION_RULES[group].values())
+    rules = dedup_rules([compact_rule(rule) for rule in rules])
+    # 제약 조건은 줄이지 않고 표기만 정리
+    constraints = [strip_markup(rule) for rule in system_prompts.CONSTRAINTS.values()]
+
+    lines = [core_lines[0], " ".join(core_lines[1:3])]
+    lines.append("\n[지침]")
+    lines += [f"- {rule}" for rule in rules]
+    lines.append("\n[절대 준수]")
+    lines += [f"- {rule}" for rule in constraints]
+    poro_rules = [f"- {compact_rule(rule)}" for rule in system_prompts.INTERACTION_RULES['poro_interaction'].values()]
+    return "\n".join(lines), "\n".join(["[poro 상대 시 추가]"] + poro_rules)
+
+
+def condense_with_llm(text):
+    """메모리 LLM으로 압축 페르소나를 한 번 더 요약합니다. (오프라인 빌드 시에만 사용)"""
+    response = requests.post(
+        f"{config.MEM0_OLLAMA_BASE_URL}/api/chat",
+        json={
+            "model": config.MEM0_LLM_MODEL,
+            "messages": [{"role": "system", "content": CONDENSE_PROMPT}, {"role": "user", "content": text}],
+            "stream": False,
+            "options": {"temperature": 0.0},
+        },
+        timeout=config.REQUEST_TIMEOUT * 12
+    )
+    response.raise_for_status()
+    return response.json()['message']['content'].strip()
+
+
+def write_compact_block(compact, poro_rules, path=SYSTEM_PROMPTS_FILE):
+    """system_prompts.py의 압축 페르소나 블록을 교체합니다. (파일의 줄바꿈 형식 유지)"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        raw = f.read()
+    newline = "\r\n" if "\r\n" in raw else "\n"
+    source = raw.replace("\r\n", "\n")
+    block = "\n".join([
+        BLOCK_START,
+        f'COMPACT_IDENTITY_CONTEXT = """{compact}"""',
+        "",
+        f'COMPACT_PORO_RULES = """{poro_rules}"""',
+        BLOCK_END,
+    ])
+    start, end = source.find(BLOCK_START), source.find(BLOCK_END)
+    if start == -1 or end == -1:
+        raise RuntimeError(f"{path}에서 압축 페르소나 블록 표시를 찾을 수 없습니다.")
+    source = source[:start] + block + source[end + len(BLOCK_END):]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(source.replace("\n", newline))
+
+
+# --- 비교 ---
+def stream_generate(base_url, model, prompt):
+    """스트리밍 생성 후 (응답 텍스트, TTFT 초, 전체 시간 초, prompt_eval_count)를 반환합니다."""
+    started = time.perf_counter()
+    ttft = None
+    text = ""
+    prompt_eval_count = None
+    with requests.post(
+        f"{base_url}/api/generate",
+        json={"model": model, "prompt": prompt, "stream": True,
+              "options": {"num_gpu": config.NUM_GPU, "temperature": 0.0, "seed": 42}},
+        stream=True, timeout=config.REQUEST_TIMEOUT * 6
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            part = chunk.get('response', '')
+            if part and ttft is None:
+                ttft = time.perf_counter() - started
+            text += part
+            if chunk.get('done'):
+                prompt_eval_count = chunk.get('prompt_eval_count')
+                break
+    return text, ttft or 0.0, time.perf_counter() - started, prompt_eval_count
+
+
+def embed(text):
+    response = requests.post(
+        f"{config.MEM0_OLLAMA_BASE_URL}/api/embed",
+        json={"model": config.MEM0_EMBEDDING_MODEL, "input": [text]},
+        timeout=config.REQUEST_TIMEOUT * 6
+    )
+    response.raise_for_status()
+    return response.json()['embeddings'][0]
+
+
+def compare_variants(model, repeats=1):
+    base_url = f"http://{config.OLLAMA_HOST}:{config.OLLAMA_PORT}"
+    variants = {mode: system_prompts.get_identity_context(mode) for mode in ("full", "compact")}
+    results = {mode: {"ttft": [], "prompt_tokens": [], "responses": []} for mode in variants}
+
+    for prompt_text in BENCH_PROMPTS:
+        for mode, identity in variants.items():
+            prompt = system_prompts.MAIN_PROMPT_TEMPLATE.format(
+                identity_context=identity, short_term_memory="최근 대화 없음.",
+                long_term_memory="관련된 장기 기억 없음.", user_input=prompt_text
+            )
+            runs = []
+            for _ in range(repeats):
+                text, ttft, _, prompt_tokens = stream_generate(base_url, model, prompt)
+                results[mode]["ttft"].append(ttft)
+                results[mode]["prompt_tokens"].append(prompt_tokens or estimate_tokens(prompt))
+                runs.append(text)
+            results[mode]["responses"].append(runs)
+        print(".", end="", flush=True)
+    print()
+
+    # 응답 일관성: 같은 질문에 대한 전체/압축 응답의 임베딩 유사도, 반복 실행 간 유사도
+    cross, self_sim = [], {mode: [] for mode in variants}
+    for full_runs, compact_runs in zip(results["full"]["responses"], results["compact"]["responses"]):
+        full_vecs = [embed(text) for text in full_runs]
+        compact_vecs = [embed(text) for text in compact_runs]
+        cross.append(cosine_similarity(full_vecs[0], compact_vecs[0]))
+        for mode, vecs in (("full", full_vecs), ("compact", compact_vecs)):
+            self_sim[mode] += [cosine_similarity(vecs[0], other) for other in vecs[1:]]
+
+    print(f"\n모델: {model}, 질문 {len(BENCH_PROMPTS)}개 x 반복 {repeats}회")
+    print(f"{'':12s}{'정체성 토큰':>12s}{'프롬프트 토큰':>14s}{'TTFT p50':>12s}{'TTFT 평균':>12s}{'반복 일관성':>12s}")
+    for mode, identity in variants.items():
+        r = results[mode]
+        consistency = f"{statistics.mean(self_sim[mode]):.3f}" if self_sim[mode] else "-"
+        print(f"{mode:12s}{estimate_tokens(identity):12d}{statistics.mean(r['prompt_tokens']):14.0f}"
+              f"{statistics.median(r['ttft']) * 1000:10.0f}ms{statistics.mean(r['ttft']) * 1000:10.0f}ms{consistency:>12s}")
+    print(f"\n전체/압축 응답 일관성 (임베딩 코사인 유사도 평균): {statistics.mean(cross):.3f} (최소 {min(cross):.3f})")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="압축 페르소나 생성 및 전체/압축 페르소나 비교")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="압축 페르소나 생성")
+    build.add_argument("--condense", action="store_true", help="메모리 LLM으로 한 번 더 요약 (Ollama 필요)")
+    build.add_argument("--write", action="store_true", help=f"결과를 {SYSTEM_PROMPTS_FILE}에 저장")
+    compare = sub.add_parser("compare", help="전체/압축 페르소나 비교 (Ollama 필요)")
+    compare.add_argument("--model", default=config.DEFAULT_MODEL, help=f"메인 LLM 모델 (기본값: {config.DEFAULT_MODEL})")
+    compare.add_argument("--repeats", type=int, default=1, help="질문별 반복 횟수 (2 이상이면 반복 일관성도 측정)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    if args.command == "build":
+        compact_context, poro_block = build_compact_persona()
+        if args.condense:
+            compact_context = condense_with_llm(compact_context)
+        full_context = system_prompts.get_astra_siro_identity_context()
+        print(compact_context)
+        print()
+        print(poro_block)
+        print(f"\n전체 {len(full_context)}자 (추정 {estimate_tokens(full_context)}토큰) -> "
+              f"압축 {len(compact_context)}자 (추정 {estimate_tokens(compact_context)}토큰)")
+        if args.write:
+            write_compact_block(compact_context, poro_block)
+            print(f"{SYSTEM_PROMPTS_FILE}에 저장했습니다.")
+    else:
+        compare_variants(args.model, args.repeats)
@@ -0,0 +1,388 @@
+# stm.py
+# 단기 기억(STM) 버퍼
+# 최근 대화를 역할(role)별 구조화 레코드로 보관하며, 창 밖으로 밀려나는(evict) 턴을 콜백으로 넘겨 장기 기억(LTM) 승격에 사용합니다.
+# 토큰 예산을 넘으면 오래된 턴을 메모리 LLM으로 요약하여 롤링 요약(이전 대화 요약)에 합칩니다.
+# STMJournal을 연결하면 모든 변경이 추가 전용(append-only) 저널 파일에 기록되어 재시작 후에도 STM이 복원됩니다.
+
+import os
+import json
+import time
+import queue
+import logging
+import threading
+
+stm_logger = logging.getLogger('stm')
+
+ROLE_PREFIXES = {"user": "사용자: ", "assistant": "아스트라 시로: "}
+
+
+def estimate_tokens(text):
+    """
+    토크나이저 없이 토큰 수를 추정합니다.
+    한글 음절은 1토큰, 그 밖의 문자(영문, 숫자, 공백, 기호)는 4글자당 1토큰으로 계산합니다.
+    """
+    if not text:
+        return 0
+    hangul = sum(1 for ch in text if '가' <= ch <= '힣')
+    return max(1, hangul + (len(text) - hangul + 3) // 4)
+
+
+def format_turn(messages):
+    """역할별 레코드 목록을 '사용자: ...\\n아스트라 시로: ...' 형식의 턴 텍스트로 변환합니다."""
+    return "\n".join(f"{ROLE_PREFIXES.get(m['role'], m['role'] + ': ')}{m['text']}" for m in messages)
+
+
+class ShortTermMemory:
+    """
+    최근 대화를 보관하는 STM.
+
+    - 각 메시지는 {"role", "text", "timestamp", "tokens", "turn", "user_id", "channel_id", "session_id"} 레코드로 저장되며,
+      같은 turn 번호의 사용자/어시스턴트 메시지가 한 턴을 이룹니다. session_id는 턴이 실제로 오간 세션이므로
+      저널로 복원된 턴은 이전 실행의 세션으로 LTM에 승격됩니다.
+    - 턴 수가 maxlen을 넘거나 메시지 토큰 합계가 token_budget을 넘으면 가장 오래된 턴부터 밀려나고,
+      밀려난 턴은 on_evict(turns) 콜백으로 전달됩니다. (turns: [{"text", "user_id", "channel_id", "session_id", "timestamp", "tokens"}])
+    - summarizer(이전 요약, 밀려난 대화 텍스트) -> 새 요약 이 지정되어 있으면, 밀려난 턴을 백그라운드 스레드에서
+      롤링 요약에 합칩니다. 프롬프트에는 context()로 "이전 대화 요약 + 최근 턴"이 들어가므로
+      프롬프트 크기는 거의 일정하게 유지되면서 더 긴 대화 흐름이 유지됩니다.
+
+    - on_change()가 지정되어 있으면 턴 추가/창 크기 변경/초기화/롤링 요약 갱신 후 (잠금 밖에서) 호출됩니다. (UI 갱신용)
+
+    - journal(STMJournal)이 지정되어 있으면 생성 시 저널을 재생하여 이전 실행의 STM(턴, 롤링 요약, 창 크기)을 복원하고,
+      이후 모든 변경을 저널에 기록합니다. 창 크기(maxlen)도 저널에 기록된 값이 우선합니다.
+
+    순회하면 턴 텍스트가 나오므로 len(stm), stm.maxlen, for turn in stm 등 기존 deque 사용 코드와 호환됩니다.
+    """
+
+    def __init__(self, maxlen=10, token_budget=None, on_evict=None, summarizer=None, journal=None, on_change=None):
+        self._maxlen = maxlen
+        self.token_budget = token_budget
+        self.on_evict = on_evict
+        self.on_change = on_change
+        self.summarizer = summarizer
+        self.journal = journal
+        self._records = []
+        self._next_turn = 0
+        self._lock = threading.Lock()
+        self.summary = ""
+        self._summary_generation = 0  # clear() 시 증가 (진행 중이던 요약 결과 폐기용)
+        self._summary_jobs = queue.Queue()
+        self._summary_thread = None
+        if journal is not None:
+            self._restore()
+
+    @property
+    def maxlen(self):
+        return self._maxlen
+
+    def __iter__(self):
+        return iter([turn["text"] for turn in self.turns()])
+
+    def __len__(self):
+        with self._lock:
+            return len({record["turn"] for record in self._records})
+
+    def __bool__(self):
+        return bool(self._records)
+
+    # --- 조회 ---
+    def records(self):
+        """현재 STM 메시지 레코드의 복사본 (오래된 메시지부터)"""
+        with self._lock:
+            return [dict(record) for record in self._records]
+
+    def turns(self):
+        """턴 단위 목록: [{"text", "user_id", "channel_id", "session_id", "timestamp", "tokens"}, ...] (오래된 턴부터)"""
+        with self._lock:
+            return self._group_turns(self._records)
+
+    def token_count(self):
+        """보관 중인 메시지와 롤링 요약의 추정 토큰 수 합계"""
+        with self._lock:
+            return sum(record["tokens"] for record in self._records) + estimate_tokens(self.summary)
+
+    def context(self, empty_text="최근 대화 없음."):
+        """프롬프트에 넣을 STM 컨텍스트 문자열 (이전 대화 요약 + 최근 턴)"""
+        with self._lock:
+            summary = self.summary
+            turns = self._group_turns(self._records)
+        lines = []
+        if summary:
+            lines.append(f"[이전 대화 요약] {summary}")
+        lines.extend(turn["text"] for turn in turns)
+        return "\n".join(lines) if lines else empty_text
+
+    # --- 추가 / 제거 ---
+    def append_turn(self, user_text, assistant_text, user_id=None, channel_id=None, timestamp=None, session_id=None):
+        """사용자 입력과 응답을 한 턴으로 추가하고, 창을 넘쳐 밀려난 턴 목록을 반환합니다."""
+        timestamp = timestamp or time.time()
+        with self._lock:
+            turn = self._next_turn
+            self._next_turn += 1
+            records = [{
+                "role": role,
+                "text": text,
+                "timestamp": timestamp,
+                "tokens": estimate_tokens(text),
+                "turn": turn,
+                "user_id": user_id,
+                "channel_id": channel_id,
+                "session_id": session_id,
+            } for role, text in (("user", user_text), ("assistant", assistant_text))]
+            self._records.extend(records)
+            self._log({"op": "turn", "records": records})
+            evicted = self._trim()
+        self._evict(evicted)
+        self._changed()
+        return evicted
+
+    def resize(self, maxlen):
+        """STM 크기(턴 수)를 바꾸고, 줄어든 만큼 밀려난 턴 목록을 반환합니다."""
+        with self._lock:
+            self._maxlen = maxlen
+            self._log({"op": "maxlen", "maxlen": maxlen})
+            evicted = self._trim()
+        self._evict(evicted)
+        self._changed()
+        return evicted
+
+    def clear(self, evict=True):
+        """STM과 롤링 요약을 비웁니다. evict=True면 남아 있던 턴을 on_evict로 넘깁니다. (세션 종료/초기화 시 LTM 승격)"""
+        with self._lock:
+            evicted = self._group_turns(self._records)
+            self._records = []
+            self.summary = ""
+            self._summary_generation += 1
+            self._log({"op": "clear"})
+        if evict and evicted and self.on_evict:
+            self.on_evict(evicted)
+        self._changed()
+        return evicted
+
+    def _trim(self):
+        """턴 수/토큰 예산을 넘는 가장 오래된 턴들을 잘라내 턴 목록으로 반환합니다. (잠금 상태에서 호출)"""
+        turn_ids = sorted({record["turn"] for record in self._records})
+        total_tokens = sum(record["tokens"] for record in self._records)
+        drop = set()
+        # 가장 최근 턴 하나는 예산을 넘어도 유지
+        for turn_id in turn_ids[:-1]:
+            over_count = len(turn_ids) - len(drop) > self._maxlen
+            over_budget = self.token_budget is not None and total_tokens > self.token_budget
+            if not (over_count or over_budget):
+                break
+            drop.add(turn_id)
+            total_tokens -= sum(record["tokens"] for record in self._records if record["turn"] == turn_id)
+        if len(turn_ids) - len(drop) > self._maxlen:  # maxlen이 0인 경우
+            drop.update(turn_ids)
+        if not drop:
+            return []
+        evicted = [record for record in self._records if record["turn"] in drop]
+        self._records = [record for record in self._records if record["turn"] not in drop]
+        self._log({"op": "drop", "turns": sorted(drop)})
+        return self._group_turns(evicted)
+
+    @staticmethod
+    def _group_turns(records):
+        grouped = {}
+        for record in records:
+            grouped.setdefault(record["turn"], []).append(record)
+        turns = []
+        for turn_id in sorted(grouped):
+            messages = grouped[turn_id]
+            turns.append({
+                "text": format_turn(messages),
+                "user_id": messages[0]["user_id"],
+                "channel_id": messages[0]["channel_id"],
+                "session_id": messages[0].get("session_id"),  # 이 필드가 없던 저널에서 복원한 턴은 None
+                "timestamp": messages[0]["timestamp"],
+                "tokens": sum(m["tokens"] for m in messages),
+            })
+        return turns
+
+    def _changed(self):
+        if self.on_change:
+            try:
+                self.on_change()
+            except Exception as e:
+                stm_logger.error(f"STM 변경 알림 처리 중 오류: {e}")
+
+    def _evict(self, evicted):
+        if not evicted:
+            return
+        stm_logger.info("STM에서 %d개 턴이 밀려났습니다. (남은 추정 토큰: %d)", len(evicted), self.token_count())
+        if self.on_evict:
+            self.on_evict(evicted)
+        if self.summarizer:
+            self._schedule_summary(evicted)
+
+    # --- 롤링 요약 ---
+    def _schedule_summary(self, evicted):
+        with self._lock:
+            if self._summary_thread is None or not self._summary_thread.is_alive():
+                self._summary_thread = threading.Thread(target=self._summary_worker, daemon=True, name="STMSummarizer")
+                self._summary_thread.start()
+        self._summary_jobs.put("\n".join(turn["text"] for turn in evicted))
+
+    def _summary_worker(self):
+        while True:
+            transcript = self._summary_jobs.get()
+            try:
+                with self._lock:
+                    previous = self.summary
+                    generation = self._summary_generation
+                updated = (self.summarizer(previous, transcript) or "").strip()
+                if updated:
+                    with self._lock:
+                        # 요약 중에 clear()가 호출되었으면 지워진 대화를 다시 살리지 않음
+                        if self._summary_generation == generation:
+                            self.summary = updated
+                            self._log({"op": "summary", "text": updated})
+                    self._changed()
+                    stm_logger.info(f"STM 롤링 요약 갱신 (추정 {estimate_tokens(updated)}토큰): {updated[:100]}...")
+            except Exception as e:
+                stm_logger.error(f"STM 롤링 요약 생성 중 오류: {e}", exc_info=True)
+            finally:
+                self._summary_jobs.task_done()
+
+    def wait_for_summary(self, timeout=30):
+        """대기 중인 롤링 요약 작업이 끝날 때까지 최대 timeout초 기다립니다."""
+        deadline = time.time() + timeout
+        while self._summary_jobs.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.05)
+
+    # --- 저널 ---
+    def _log(self, entry):
+        """저널에 변경 내용을 기록하고, 기록이 많이 쌓였으면 현재 상태 스냅샷으로 압축합니다. (잠금 상태에서 호출)"""
+        if self.journal is None:
+            return
+        self.journal.append(entry)
+        if self.journal.needs_compaction():
+            self.journal.compact(self._snapshot_entry())
+
+    def _snapshot_entry(self):
+        return {
+            "op": "snapshot",
+            "records": self._records,
+            "summary": self.summary,
+            "maxlen": self._maxlen,
+            "next_turn": self._next_turn,
+        }
+
+    def _restore(self):
+        """저널을 재생하여 STM을 복원합니다. 현재 설정(maxlen/토큰 예산)을 넘는 턴은 복원 후 밀려납니다."""
+        started = time.perf_counter()
+        entries = self.journal.load()
+        with self._lock:
+            for entry in entries:
+                op = entry.get("op")
+                if op == "snapshot":
+                    self._records = list(entry.get("records", []))
+                    self.summary = entry.get("summary", "")
+                    self._maxlen = entry.get("maxlen", self._maxlen)
+                    self._next_turn = entry.get("next_turn", 0)
+                elif op == "turn":
+                    self._records.extend(entry["records"])
+                    self._next_turn = max(self._next_turn, max(r["turn"] for r in entry["records"]) + 1)
+                elif op == "drop":
+                    dropped = set(entry["turns"])
+                    self._records = [r for r in self._records if r["turn"] not in dropped]
+                elif op == "clear":
+                    self._records = []
+                    self.summary = ""
+                elif op == "summary":
+                    self.summary = entry["text"]
+                elif op == "maxlen":
+                    self._maxlen = entry["maxlen"]
+            # 복원한 상태를 스냅샷 한 줄로 다시 써서 다음 시작도 빠르게 함
+            self.journal.compact(self._snapshot_entry())
+            evicted = self._trim()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        stm_logger.info(f"STM 저널 복원 완료: 기록 {len(entries)}개 -> {len(self)}턴, 요약 {'있음' if self.summary else '없음'}, "
+                        f"창 크기 {self._maxlen}턴 ({elapsed_ms:.1f}ms)")
+        self._evict(evicted)
+
+
+class STMJournal:
+    """
+    STM 변경 내용을 한 줄에 하나씩(JSON Lines) 기록하는 추가 전용 저널.
+
+    - append()는 파일 버퍼에만 쓰고, 백그라운드 스레드가 fsync_interval초마다 모아서 flush + fsync합니다. (fsync 묶음 처리)
+    - 기록이 compact_every개를 넘으면 compact()로 현재 상태 스냅샷 한 줄짜리 파일을 임시 파일에 쓴 뒤 원자적으로 교체합니다.
+    - load()는 마지막 줄이 쓰다 만 상태(비정상 종료)여도 읽을 수 있는 부분까지만 반환합니다.
+    """
+
+    def __init__(self, path, fsync_interval=0.5, compact_every=500):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._entries_since_compact = 0
+        self._dirty = False
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._sync_loop, daemon=True, name="STMJournalSync")
+        self._thread.start()
+
+    def load(self):
+        """저널의 모든 기록을 순서대로 반환합니다."""
+        entries = []
+        with self._lock:
+            self._file.flush()
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line_no, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        stm_logger.warning(f"STM 저널 {line_no}번째 줄이 손상되어 이후 기록을 무시합니다. ({self.path})")
+                        break
+            self._entries_since_compact = len(entries)
+        return entries
+
+    def append(self, entry):
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._entries_since_compact += 1
+            self._dirty = True
+
+    def needs_compaction(self):
+        return self._entries_since_compact >= self.compact_every
+
+    def compact(self, snapshot_entry):
+        """저널을 스냅샷 한 줄로 교체합니다."""
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(snapshot_entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._entries_since_compact = 1
+            self._dirty = False
+
+    def sync(self):
+        """버퍼에 남은 기록을 디스크에 씁니다. (flush + fsync)"""
+        with self._lock:
+            if not self._dirty or self._file.closed:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._dirty = False
+
+    def _sync_loop(self):
+        while not self._stop_event.wait(self.fsync_interval):
+            try:
+                self.sync()
+            except Exception as e:
+                stm_logger.error(f"STM 저널 동기화 중 오류: {e}")
+
+    def close(self):
+        """남은 기록을 디스크에 쓰고 저널 파일을 닫습니다."""
+        self._stop_event.set()
+        self.sync()
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,264 @@
+# tracing.py
+# 턴 단위 구간(span) 추적
+# 한 턴(음성 입력 -> 검색 -> 프롬프트 -> 응답 -> LTM 저장)의 각 구간 시간을 trace id 하나로 묶어 JSONL 파일에 기록합니다.
+#
+# 사용법 (기록된 추적 분석):
+#   python tracing.py                  # 최근 5개 턴의 구간 폭포도
+#   python tracing.py --last 20        # 최근 20개 턴
+#   python tracing.py --summary        # 구간별 p50/p95/p99 요약
+#   python tracing.py --trace <id>     # 특정 턴만
+
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+import contextlib
+
+import config
+
+_local = threading.local()
+_export_lock = threading.Lock()
+
+
+class Trace:
+    """
+    한 턴의 추적. 구간 시각은 time.perf_counter() 기준으로 기록하고, 내보낼 때 벽시계 시각으로 바꿉니다.
+
+    - span(name)은 with 블록 구간을, add_span(name, start, end)은 이미 측정한 구간을 기록합니다.
+    - 백그라운드 작업(LTM 저장 등)이 이 턴에 속하면 hold()로 등록하고 끝나면 release()합니다.
+      end()가 호출되고 모든 hold가 release되면 추적을 파일에 기록합니다.
+    """
+
+    def __init__(self, name, started_at=None, path=None, **attrs):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.path = path or config.TRACE_FILE
+        now = time.perf_counter()
+        self.started_at = started_at if started_at is not None else now
+        self._wall_offset = time.time() - now
+        self.spans = []
+        self._pending = 0
+        self._ended_at = None
+        self._exported = False
+        self._lock = threading.Lock()
+
+    def add_span(self, name, start, end, **attrs):
+        span = {
+            "name": name,
+            "start": start,
+            "end": end,
+            "thread": threading.current_thread().name,
+        }
+        if attrs:
+            span["attrs"] = attrs
+        self.spans.append(span)  # list.append는 원자적
+
+    @contextlib.contextmanager
+    def span(self, name, **attrs):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.perf_counter(), **attrs)
+
+    def hold(self):
+        with self._lock:
+            self._pending += 1
+
+    def release(self):
+        with self._lock:
+            self._pending -= 1
+            ready = self._ended_at is not None and self._pending <= 0
+        if ready:
+            self._export()
+
+    def end(self, **attrs):
+        """턴 처리 완료. 남은 백그라운드 작업이 없으면 바로 기록합니다."""
+        self.attrs.update(attrs)
+        with self._lock:
+            self._ended_at = time.perf_counter()
+            ready = self._pending <= 0
+        if ready:
+            self._export()
+
+    def to_dict(self):
+        end = max([self._ended_at or self.started_at] + [span["end"] for span in self.spans])
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "start": self.started_at + self._wall_offset,
+            "duration_ms": (end - self.started_at) * 1000,
+            "attrs": self.attrs,
+            "spans": [dict(span,
+                           start_ms=(span["start"] - self.started_at) * 1000,
+                           duration_ms=(span["end"] - span["start"]) * 1000,
+                           start=span["start"] + self._wall_offset,
+                           end=span["end"] + self._wall_offset)
+                      for span in sorted(self.spans, key=lambda s: s["start"])],
+        }
+
+    def _export(self):
+        with self._lock:
+            if self._exported:
+                return
+            self._exported = True
+        try:
+            line = json.dumps(self.to_dict(), ensure_ascii=False) + "\n"
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with _export_lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except Exception as e:
+            print(f"추적 기록 실패: {e}", file=sys.stderr)
+
+
+class _NullTrace:
+    """추적을 끈 경우 사용하는 아무 일도 하지 않는 추적"""
+    trace_id = None
+
+    def add_span(self, name, start, end, **attrs):
+        pass
+
+    @contextlib.contextmanager
+    def span(self, name, **attrs):
+        yield
+
+    def hold(self):
+        pass
+
+    def release(self):
+        pass
+
+    def end(self, **attrs):
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+
+def start_trace(name, started_at=None, **attrs):
+    """새 턴 추적을 시작합니다. config.TRACE_ENABLED가 꺼져 있으면 NULL_TRACE를 반환합니다."""
+    if not config.TRACE_ENABLED:
+        return NULL_TRACE
+    return Trace(name, started_at=started_at, **attrs)
+
+
+def current():
+    """현재 스레드에서 활성화된 추적 (없으면 NULL_TRACE)"""
+    return getattr(_local, "trace", None) or NULL_TRACE
+
+
+@contextlib.contextmanager
+def activate(trace):
+    """with 블록 동안 trace를 현재 스레드의 추적으로 지정합니다. (함수 인자 없이 하위 호출에서 span 기록)"""
+    previous = getattr(_local, "trace", None)
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+def span(name, **attrs):
+    """현재 스레드 추적의 구간 (추적이 없으면 아무 일도 하지 않음)"""
+    return current().span(name, **attrs)
+
+
+def record_generation(final_chunk, request_started, first_token_at):
+    """
+    /api/generate 스트림의 마지막 청크를 받은 시점에 현재 추적에 LLM 구간을 기록합니다.
+    "llm.ttft"는 요청 전송 -> 첫 토큰, "llm.stream"은 첫 토큰 -> 마지막 청크입니다. (시각은 time.perf_counter() 값)
+    """
+    trace = current()
+    finished = time.perf_counter()
+    if first_token_at is None:
+        trace.add_span("llm.ttft", request_started, finished)
+        return
+    trace.add_span("llm.ttft", request_started, first_token_at,
+                   prompt_tokens=final_chunk.get('prompt_eval_count'))
+    trace.add_span("llm.stream", first_token_at, finished,
+                   eval_tokens=final_chunk.get('eval_count'))
+
+
+# --- 분석 CLI ---
+def load_traces(path):
+    traces = []
+    if not os.path.exists(path):
+        return traces
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                traces.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # 기록 중 종료되어 잘린 마지막 줄
+    return traces
+
+
+def format_waterfall(trace, width=50):
+    """한 턴의 구간을 시작 시각 기준 막대로 표시"""
+    total = max(trace["duration_ms"], 1e-6)
+    started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(trace["start"]))
+    lines = [f"[{trace['trace_id']}] {trace['name']} {started}  총 {trace['duration_ms']:.0f}ms  {trace.get('attrs') or ''}"]
+    name_width = max([len(span["name"]) for span in trace["spans"]] + [4])
+    for span in trace["spans"]:
+        offset = int(span["start_ms"] / total * width)
+        length = max(1, int(span["duration_ms"] / total * width))
+        bar = " " * offset + "█" * min(length, width - offset)
+        lines.append(f"  {span['name']:<{name_width}} |{bar:<{width}}| {span['start_ms']:>8.0f}ms +{span['duration_ms']:.0f}ms")
+    return "\n".join(lines)
+
+
+def format_summary(traces):
+    """구간 이름별 소요 시간 백분위 요약"""
+    from metrics import percentile
+    durations = {"(턴 전체)": [trace["duration_ms"] for trace in traces]}
+    for trace in traces:
+        for span in trace["spans"]:
+            durations.setdefault(span["name"], []).append(span["duration_ms"])
+    name_width = max(len(name) for name in durations)
+    lines = [f"{'구간':<{name_width}}  {'n':>5}  {'p50':>9}  {'p95':>9}  {'p99':>9}  {'최대':>9}"]
+    for name, values in durations.items():
+        ordered = sorted(values)
+        lines.append(
+            f"{name:<{name_width}}  {len(ordered):>5}  {percentile(ordered, 50):>7.0f}ms  "
+            f"{percentile(ordered, 95):>7.0f}ms  {percentile(ordered, 99):>7.0f}ms  {ordered[-1]:>7.0f}ms"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="턴 단위 구간 추적 분석")
+    parser.add_argument("--file", default=config.TRACE_FILE, help="추적 파일 (JSONL)")
+    parser.add_argument("--last", type=int, default=5, help="폭포도로 표시할 최근 턴 수")
+    parser.add_argument("--trace", help="표시할 trace id")
+    parser.add_argument("--summary", action="store_true", help="구간별 백분위 요약 표시")
+    args = parser.parse_args()
+
+    traces = load_traces(args.file)
+    if not traces:
+        print(f"추적 기록이 없습니다: {args.file}")
+        return 1
+    if args.summary:
+        print(f"추적 {len(traces)}개 ({args.file})")
+        print(format_summary(traces))
+        return 0
+    selected = [trace for trace in traces if trace["trace_id"] == args.trace] if args.trace else traces[-args.last:]
+    if not selected:
+        print(f"trace id를 찾을 수 없습니다: {args.trace}")
+        return 1
+    for trace in selected:
+        print(format_waterfall(trace))
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
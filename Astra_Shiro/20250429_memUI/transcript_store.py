@@ -0,0 +1,115 @@
+# transcript_store.py
+# 대화 창 메시지의 디스크 저장소
+# UI 대화 창에는 최근 메시지만 남기고, 전체 대화 내역은 추가 전용 JSONL 파일에 보관합니다.
+# 메시지 번호(seq) -> 파일 오프셋 색인을 메모리에 두어, 위로 스크롤할 때 필요한 구간만 다시 읽습니다.
+
+import os
+import json
+import time
+import threading
+
+import config
+
+MESSAGE_PREFIXES = {
+    "user": "사용자: ",
+    "assistant": "아스트라 시로: ",
+}
+
+
+def format_message(record):
+    """
+    메시지 레코드를 대화 창 표시 형식으로 변환합니다.
+
+    Returns:
+        tuple: (접두사, 접두사 태그, 본문) - 시스템 메시지는 본문 전체가 태그 대상이므로 (전체 문자열, "system", "")
+    """
+    kind = record.get("kind")
+    if kind == "system":
+        return f"[시스템: {record.get('text', '')}]", "system", ""
+    return MESSAGE_PREFIXES.get(kind, ""), kind, record.get("text", "")
+
+
+class TranscriptStore:
+    """
+    대화 메시지 추가 전용 저장소.
+
+    - new_seq()로 번호를 먼저 받아 두고 write()로 나중에 기록할 수 있습니다. (스트리밍 응답은 완료된 뒤 기록)
+      파일에는 기록된 순서대로 쌓이지만, read_range()와 export_text()는 번호 순으로 돌려줍니다.
+    - 파일은 세션마다 새로 만들며, clear()는 파일을 비우고 번호는 이어서 사용합니다.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(config.CONVERSATION_STORE_DIR, f"conversation_{time.strftime('%Y%m%d-%H%M%S')}.jsonl")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._file = open(path, "a+b")
+        self._offsets = {}  # seq -> 파일 오프셋
+        self._next_seq = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._next_seq
+
+    def new_seq(self):
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            return seq
+
+    def write(self, seq, kind, text):
+        record = {"seq": seq, "kind": kind, "text": text, "ts": time.time()}
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            self._offsets[seq] = self._file.tell()
+            self._file.write(line)
+            self._file.flush()
+        return record
+
+    def append(self, kind, text):
+        return self.write(self.new_seq(), kind, text)
+
+    def first_seq(self):
+        """저장된 가장 오래된 메시지 번호 (없으면 None)"""
+        with self._lock:
+            return min(self._offsets) if self._offsets else None
+
+    def read_range(self, start, end):
+        """번호가 [start, end)인 기록된 메시지를 번호 순으로 반환합니다. (아직 기록되지 않은 번호는 건너뜀)"""
+        with self._lock:
+            records = []
+            for seq in range(max(start, 0), end):
+                offset = self._offsets.get(seq)
+                if offset is None:
+                    continue
+                self._file.seek(offset)
+                records.append(json.loads(self._file.readline().decode("utf-8")))
+            return records
+
+    def export_text(self, path):
+        """전체 대화 내역을 대화 창과 같은 형식의 텍스트 파일로 내보냅니다. 내보낸 메시지 수를 반환합니다."""
+        with self._lock:
+            seqs = sorted(self._offsets)
+        count = 0
+        with open(path, "w", encoding="utf-8") as out:
+            # 메모리 사용량을 일정하게 유지하도록 구간 단위로 읽어서 씀
+            for i in range(0, len(seqs), 500):
+                chunk = seqs[i:i + 500]
+                for record in self.read_range(chunk[0], chunk[-1] + 1):
+                    prefix, _, body = format_message(record)
+                    out.write(("\n\n" if count else "") + prefix + body)
+                    count += 1
+            out.write("\n")
+        return count
+
+    def clear(self):
+        with self._lock:
+            self._file.truncate(0)
+            self._offsets.clear()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
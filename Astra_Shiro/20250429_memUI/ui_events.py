@@ -0,0 +1,66 @@
+# ui_events.py
+# 작업 스레드 -> Tk 스레드 UI 이벤트 버스
+# 작업 스레드는 위젯을 직접 건드리지 않고 이벤트만 발행하며, Tk 스레드가 주기적으로 꺼내 합친 뒤 한 번에 반영합니다.
+
+import queue
+import collections
+
+# 이벤트 종류
+STM_CHANGED = "stm-changed"    # payload 없음: 단기 기억 탭 다시 그리기
+STATUS = "status"              # payload: 상태 표시줄 문자열
+BUSY = "busy"                  # payload: bool, 처리 중 표시(프로그레스 바)
+TOKEN = "token"                # payload: 스트리밍 응답 조각
+STREAM_BEGIN = "stream-begin"  # payload 없음: 스트리밍 응답 메시지 시작
+STREAM_END = "stream-end"      # payload 없음: 스트리밍 응답 완료 (대화 내역 저장소에 기록)
+MESSAGE = "message"            # payload: (종류 "user"/"system", 텍스트) 대화 창 메시지 추가
+ERROR = "error"                # payload: (메시지, 팝업 여부)
+CALL = "call"                  # payload: Tk 스레드에서 실행할 인자 없는 함수
+
+UIEvent = collections.namedtuple("UIEvent", ["kind", "payload"])
+
+# 마지막 값만 의미가 있어 한 번의 처리에서 하나로 합치는 이벤트 (처리 묶음의 끝에서 반영)
+LATEST_ONLY = (STM_CHANGED, STATUS, BUSY)
+
+
+def coalesce(events):
+    """
+    이벤트 목록을 합칩니다.
+    - 연속된 TOKEN은 하나의 TOKEN으로 이어 붙입니다.
+    - LATEST_ONLY 이벤트는 종류별로 마지막 하나만 남겨 목록 끝에 둡니다.
+    - 나머지 이벤트는 순서를 그대로 유지합니다.
+    """
+    merged = []
+    latest = {}
+    for event in events:
+        if event.kind in LATEST_ONLY:
+            latest[event.kind] = event
+        elif event.kind == TOKEN and merged and merged[-1].kind == TOKEN:
+            merged[-1] = UIEvent(TOKEN, merged[-1].payload + event.payload)
+        else:
+            merged.append(event)
+    merged.extend(latest[kind] for kind in LATEST_ONLY if kind in latest)
+    return merged
+
+
+class UIEventBus:
+    """
+    스레드 안전한 UI 이벤트 큐.
+
+    publish()는 어느 스레드에서나 호출할 수 있고 즉시 반환합니다.
+    drain()은 Tk 스레드에서만 호출하며, 쌓인 이벤트를 최대 max_events개 꺼내 coalesce()한 목록을 돌려줍니다.
+    """
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+
+    def publish(self, kind, payload=None):
+        self._queue.put(UIEvent(kind, payload))
+
+    def drain(self, max_events=1000):
+        events = []
+        while len(events) < max_events:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return coalesce(events)